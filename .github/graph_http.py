@@ -0,0 +1,173 @@
+# graph_http.py — pooled keep-alive HTTP client for Graph API calls.
+# One TLS handshake per connection instead of per post; Graph usage headers
+# (X-App-Usage / X-Page-Usage / X-Business-Use-Case-Usage) drive an adaptive
+# throttle so we slow down before Facebook starts rejecting calls.
+import json, time, queue, select, threading, http.client
+from urllib.parse import urlsplit
+
+class UsageThrottle:
+    """
+    Graph reports usage as percentages of the rate limit. Under SOFT% we go
+    full speed; between SOFT and HARD we add a growing delay; at HARD we
+    pause, honoring estimated_time_to_regain_access when Graph sends it.
+    """
+    SOFT, HARD = 75.0, 95.0
+
+    def __init__(self, max_delay=10.0, hard_pause=60.0):
+        self.max_delay = max_delay
+        self.hard_pause = hard_pause
+        self.usage = 0.0
+        self._pause_until = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _parse(value):
+        try:
+            data = json.loads(value)
+        except (TypeError, ValueError):
+            return 0.0, 0
+        blocks = []
+        if isinstance(data, dict) and any(isinstance(v, list) for v in data.values()):
+            for v in data.values():  # business use case: {id: [{...}, ...]}
+                blocks += [b for b in v if isinstance(b, dict)]
+        elif isinstance(data, dict):
+            blocks = [data]
+        pct, regain = 0.0, 0
+        for b in blocks:
+            for k in ("call_count", "total_time", "total_cputime"):
+                try:
+                    pct = max(pct, float(b.get(k, 0) or 0))
+                except (TypeError, ValueError):
+                    pass
+            try:
+                regain = max(regain, int(b.get("estimated_time_to_regain_access", 0) or 0))
+            except (TypeError, ValueError):
+                pass
+        return pct, regain
+
+    def observe(self, headers):
+        pct, regain = 0.0, 0
+        for name in ("X-App-Usage", "X-Page-Usage", "X-Business-Use-Case-Usage"):
+            p, r = self._parse(headers.get(name))
+            pct, regain = max(pct, p), max(regain, r)
+        with self._lock:
+            self.usage = pct
+            now = time.monotonic()
+            if regain:
+                self._pause_until = max(self._pause_until, now + regain * 60)
+            elif pct >= self.HARD:
+                self._pause_until = max(self._pause_until, now + self.hard_pause)
+            elif pct >= self.SOFT:
+                frac = (pct - self.SOFT) / (self.HARD - self.SOFT)
+                self._pause_until = max(self._pause_until, now + frac * self.max_delay)
+
+    def wait(self):
+        with self._lock:
+            delay = self._pause_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+class OutcomeUnknown(Exception):
+    """The request went out but no answer came back; it may or may not have taken effect."""
+
+def _dropped(conn):
+    """True when the server has closed an idle keep-alive socket (it reads as EOF, or anything at all)."""
+    if conn.sock is None:
+        return True
+    try:
+        readable, _, _ = select.select([conn.sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    return bool(readable)
+
+class HttpPool:
+    """
+    Keep-alive connections per (scheme, host, port), at most `size` per host.
+    Callers borrow a connection, fully read the response, and hand it back.
+    Idle connections the server has closed are dropped before use, and a
+    reused one that fails while the request is being written is retried once
+    on a fresh socket. Once the request is out, a missing answer raises
+    OutcomeUnknown and is never re-sent: a POST may already be live.
+    """
+    def __init__(self, size=4, connect_timeout=10.0, read_timeout=60.0, throttle=None):
+        self.size = size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.throttle = throttle or UsageThrottle()
+        self._idle = {}
+        self._slots = {}
+        self._lock = threading.Lock()
+        self.connects = 0
+
+    def _host_state(self, key):
+        with self._lock:
+            if key not in self._idle:
+                self._idle[key] = queue.LifoQueue()
+                self._slots[key] = threading.BoundedSemaphore(self.size)
+            return self._idle[key], self._slots[key]
+
+    def _connect(self, scheme, host, port):
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        conn = cls(host, port, timeout=self.connect_timeout)
+        conn.connect()
+        conn.sock.settimeout(self.read_timeout)
+        self.connects += 1
+        return conn
+
+    def _checkout(self, idle, scheme, host, port):
+        """(connection, reused): an idle one the server hasn't closed, else a new one."""
+        while True:
+            try:
+                conn = idle.get_nowait()
+            except queue.Empty:
+                return self._connect(scheme, host, port), False
+            if not _dropped(conn):
+                return conn, True
+            conn.close()
+
+    def request(self, method, url, body=None, headers=None):
+        """Returns (status, headers, body_bytes)."""
+        parts = urlsplit(url)
+        scheme = parts.scheme or "https"
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, parts.hostname, port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        idle, slots = self._host_state(key)
+
+        self.throttle.wait()
+        with slots:
+            for attempt in (0, 1):
+                conn, reused = self._checkout(idle, scheme, parts.hostname, port)
+                try:
+                    conn.request(method, path, body=body, headers=headers or {})
+                except (ConnectionError, http.client.CannotSendRequest):
+                    conn.close()
+                    if reused and attempt == 0:
+                        continue  # died before the request was written; safe to send on a fresh one
+                    raise
+                except Exception:
+                    conn.close()
+                    raise
+                try:
+                    resp = conn.getresponse()
+                    data = resp.read()
+                except (OSError, http.client.HTTPException) as e:
+                    conn.close()
+                    raise OutcomeUnknown(f"{method} {parts.hostname}{parts.path}: sent, no answer ({e!r})") from e
+                if resp.will_close:
+                    conn.close()
+                else:
+                    idle.put(conn)
+                self.throttle.observe(resp.headers)
+                return resp.status, resp.headers, data
+
+    def close(self):
+        with self._lock:
+            for idle in self._idle.values():
+                while True:
+                    try:
+                        idle.get_nowait().close()
+                    except queue.Empty:
+                        break
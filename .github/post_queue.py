@@ -0,0 +1,244 @@
+# post_queue.py — durable, indexed post queue for the Facebook autoposter.
+#
+# .github/autoposter/index.json holds one record per queued item:
+#   priority, scheduled_at, idempotency key, and per-destination delivery
+#   state (pending → inflight → sent | failed), with exponential-backoff retries.
+# A heap over (due time, -priority) picks the next item in O(log n). Each run
+# lists the queue folder once; only files the index doesn't know yet are opened.
+#
+# Crash safety: a delivery is saved as "inflight" — and committed + pushed by
+# post_to_fb.py — *before* the Graph call. If a run dies mid-post, the next
+# run (a fresh checkout) finds it inflight and parks it as "unknown" instead
+# of retrying — it may already be live, so we never double-post. A post
+# that went out but got no answer (timeout, dropped connection) is parked
+# the same way; only clean error answers are retried with backoff.
+# `python .github/post_to_fb.py retry <item> [alias]` re-arms it.
+import os, json, time, heapq, random, hashlib, tempfile
+from datetime import datetime
+
+PENDING, INFLIGHT, SENT, FAILED, UNKNOWN, SKIPPED = (
+    "pending", "inflight", "sent", "failed", "unknown", "skipped")
+TERMINAL = {SENT, FAILED, SKIPPED}
+
+MAX_ATTEMPTS = int(os.environ.get("AUTOPOSTER_MAX_ATTEMPTS", "5"))
+BACKOFF_BASE = float(os.environ.get("AUTOPOSTER_BACKOFF_BASE", "300"))  # 5 min
+BACKOFF_CAP = 6 * 3600.0
+
+def _atomic_json(path, obj):
+    """temp file -> fsync -> rename; a failed write leaves the old index and no temp file."""
+    folder = os.path.dirname(path) or "."
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".index-", suffix=".tmp", dir=folder)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(obj, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, 0o644)  # mkstemp makes 0600; the index is committed like any other file
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+def _when(value, default):
+    """scheduled_at may be epoch seconds or an ISO-8601 string."""
+    if value in (None, ""):
+        return default
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return default
+
+def idempotency_key(payload):
+    """The payload's own `id` if set, else a hash of what would be posted."""
+    if payload.get("id"):
+        return str(payload["id"])
+    body = {k: payload.get(k, "") for k in ("message", "link", "image_url", "video_url")}
+    return "sha256:" + hashlib.sha256(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest()
+
+def backoff(attempts):
+    delay = min(BACKOFF_CAP, BACKOFF_BASE * (2 ** max(0, attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+class PostQueue:
+    def __init__(self, root=".github/autoposter", default_targets=()):
+        self.root = root
+        self.default_targets = list(default_targets)
+        self.queue_dir = os.path.join(root, "queue")
+        self.index_path = os.path.join(root, "index.json")
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+        self.index.setdefault("version", 1)
+        self.index.pop("queue_sig", None)  # folder mtimes don't survive a checkout
+        self.index.setdefault("items", {})
+        self.index.setdefault("sent_keys", {})
+        self.items = self.index["items"]
+        self._recover_inflight()
+        self.ingest()
+        self._heap = [self._heap_key(name, rec) for name, rec in self.items.items()
+                      if self._next_due(rec) is not None]
+        heapq.heapify(self._heap)
+
+    # ---------------- ingest ----------------
+    def ingest(self):
+        """
+        Index any queue file we haven't seen; known files are never reopened.
+        Records whose file is gone (an operator deleted it to cancel the post)
+        are dropped. Returns how many files were added.
+        """
+        try:
+            entries = list(os.scandir(self.queue_dir))
+        except FileNotFoundError:
+            entries = []
+        except OSError:
+            return 0
+        names, added = set(), 0
+        for entry in entries:
+            if not entry.name.endswith(".json"):
+                continue
+            names.add(entry.name)
+            if entry.name not in self.items and self.add(entry.path) is not None:
+                added += 1
+        for name in [n for n in self.items if n not in names]:
+            print(f"Dropped {name}: its queue file is gone (cancelled)")
+            del self.items[name]
+        return added
+
+    def add(self, path):
+        """Index one queue file; None (with a note) if it can't be read."""
+        name = os.path.basename(path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Skipped {name}: can't read it ({e})")
+            return None
+        if not isinstance(payload, dict):
+            print(f"Skipped {name}: not a JSON object")
+            return None
+        now = time.time()
+        rec = {
+            "file": name,
+            "key": idempotency_key(payload),
+            "priority": int(payload.get("priority", 0) or 0),
+            "scheduled_at": _when(payload.get("scheduled_at"), now),
+            "created_at": now,
+            "deliveries": {},
+        }
+        for alias in payload.get("targets") or self.default_targets:
+            rec["deliveries"][alias] = {"state": PENDING, "attempts": 0, "next_at": 0}
+        self.items[name] = rec
+        if hasattr(self, "_heap"):
+            heapq.heappush(self._heap, self._heap_key(name, rec))
+        return rec
+
+    def _recover_inflight(self):
+        for rec in self.items.values():
+            for d in rec["deliveries"].values():
+                if d["state"] == INFLIGHT:
+                    d["state"] = UNKNOWN
+                    d["last_error"] = "run stopped mid-post; may already be live"
+
+    # ---------------- selection ----------------
+    def _next_due(self, rec):
+        times = [max(rec["scheduled_at"], d.get("next_at", 0))
+                 for d in rec["deliveries"].values() if d["state"] == PENDING]
+        return min(times) if times else None
+
+    def _heap_key(self, name, rec):
+        return (self._next_due(rec) or 0, -rec["priority"], rec["created_at"], name)
+
+    def due(self, limit, now=None):
+        """
+        Up to `limit` items with pending deliveries due now, highest priority first.
+        Returns [(name, payload_path, [aliases])]. Stale heap entries are skipped.
+        """
+        now = time.time() if now is None else now
+        ready, seen = [], set()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, _, name = heapq.heappop(self._heap)
+            rec = self.items.get(name)
+            if rec is None or name in seen:
+                continue
+            due_at = self._next_due(rec)
+            if due_at is None:
+                continue
+            if due_at > now:
+                heapq.heappush(self._heap, self._heap_key(name, rec))
+                continue
+            seen.add(name)
+            ready.append((-rec["priority"], rec["created_at"], name))
+        ready.sort()
+        picked, rest = ready[:limit], ready[limit:]
+        for _, _, name in rest:
+            heapq.heappush(self._heap, self._heap_key(name, self.items[name]))
+
+        out = []
+        for _, _, name in picked:
+            rec = self.items[name]
+            aliases = []
+            for alias, d in rec["deliveries"].items():
+                if d["state"] != PENDING or max(rec["scheduled_at"], d.get("next_at", 0)) > now:
+                    continue
+                if f'{rec["key"]}|{alias}' in self.index["sent_keys"]:
+                    d["state"] = SENT  # already delivered under this key (e.g. re-queued copy)
+                    continue
+                aliases.append(alias)
+            if aliases:
+                out.append((name, os.path.join(self.queue_dir, rec["file"]), aliases))
+        return out
+
+    # ---------------- delivery state ----------------
+    def mark_inflight(self, name, alias):
+        d = self.items[name]["deliveries"][alias]
+        d["state"] = INFLIGHT
+        d["attempts"] = d.get("attempts", 0) + 1
+        d["started_at"] = time.time()
+
+    def complete(self, name, alias, ok, detail, retryable=True, unknown=False):
+        rec = self.items[name]
+        d = rec["deliveries"][alias]
+        d["last_result"] = detail[:300]
+        if ok:
+            d["state"] = SENT
+            d["sent_at"] = time.time()
+            self.index["sent_keys"][f'{rec["key"]}|{alias}'] = d["sent_at"]
+        elif unknown:
+            d["state"] = UNKNOWN
+            d["last_error"] = "sent but no answer; may already be live"
+        elif not retryable:
+            d["state"] = SKIPPED
+        elif d["attempts"] >= MAX_ATTEMPTS:
+            d["state"] = FAILED
+        else:
+            d["state"] = PENDING
+            d["next_at"] = time.time() + backoff(d["attempts"])
+            heapq.heappush(self._heap, self._heap_key(name, rec))
+
+    def retry(self, name, alias=None):
+        """Re-arm unknown/failed deliveries (operator action after checking the page)."""
+        rec = self.items[name]
+        for a, d in rec["deliveries"].items():
+            if alias in (None, a) and d["state"] in (UNKNOWN, FAILED):
+                d.update(state=PENDING, next_at=0)
+        heapq.heappush(self._heap, self._heap_key(name, rec))
+
+    def finished(self):
+        """Names of items whose every delivery reached a final state."""
+        return [name for name, rec in self.items.items()
+                if rec["deliveries"] and all(d["state"] in TERMINAL
+                                             for d in rec["deliveries"].values())]
+
+    def pop(self, name):
+        return self.items.pop(name)
+
+    def save(self):
+        _atomic_json(self.index_path, self.index)
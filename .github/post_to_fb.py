@@ -1,20 +1,38 @@
-import os, json, glob, time, shutil, subprocess
+import os, json, time, shutil, argparse, threading, subprocess
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlencode
-from urllib.request import Request, urlopen
-from urllib.error import HTTPError, URLError
+from graph_http import HttpPool, OutcomeUnknown
+from post_queue import PostQueue
 
-GRAPH = "https://graph.facebook.com/v19.0"
+# GRAPH_API_BASE lets a local stub Graph server stand in during tests.
+GRAPH = os.environ.get("GRAPH_API_BASE", "https://graph.facebook.com/v19.0").rstrip("/")
+HTTP_TIMEOUT = float(os.environ.get("AUTOPOSTER_HTTP_TIMEOUT", "60"))  # read
+CONNECT_TIMEOUT = float(os.environ.get("AUTOPOSTER_CONNECT_TIMEOUT", "10"))
+MIN_INTERVAL = float(os.environ.get("AUTOPOSTER_MIN_INTERVAL", "1.0"))  # per destination
+MAX_WORKERS = int(os.environ.get("AUTOPOSTER_MAX_WORKERS", "4"))
+
+# Keep-alive connections shared by every post in the run (one TLS handshake per socket).
+POOL = HttpPool(size=MAX_WORKERS, connect_timeout=CONNECT_TIMEOUT, read_timeout=HTTP_TIMEOUT)
+
+class NotPosted(RuntimeError):
+    """Graph answered with an error, or the request never left: safe to try again."""
 
 def http_post(url, data):
+    """
+    Response text. Raises NotPosted for an HTTP error answer or a connection
+    that failed before the request was sent, and lets graph_http's
+    OutcomeUnknown through when it was sent but never answered.
+    """
     data_bytes = urlencode(data).encode("utf-8")
-    req = Request(url, data=data_bytes)
+    headers = {"Content-Type": "application/x-www-form-urlencoded"}
     try:
-        with urlopen(req, timeout=60) as r:
-            return r.read().decode("utf-8")
-    except HTTPError as e:
-        raise RuntimeError(f"HTTPError {e.code}: {e.read().decode('utf-8', errors='ignore')}")
-    except URLError as e:
-        raise RuntimeError(f"URLError: {e.reason}")
+        status, _, body = POOL.request("POST", url, body=data_bytes, headers=headers)
+    except OSError as e:
+        raise NotPosted(f"URLError: {e}")
+    text = body.decode("utf-8", errors="ignore")
+    if status >= 400:
+        raise NotPosted(f"HTTPError {status}: {text}")
+    return text
 
 def load_json(path):
     with open(path, "r", encoding="utf-8") as f:
@@ -25,16 +43,30 @@ def save_json(path, obj):
     with open(path, "w", encoding="utf-8") as f:
         json.dump(obj, f, ensure_ascii=False, indent=2)
 
-def pick_next_payload(queue_dir):
-    files = sorted(glob.glob(os.path.join(queue_dir, "*.json")))
-    return files[0] if files else None
+class RateLimiter:
+    """
+    Minimum spacing between calls to one destination. Replaces the old fixed
+    sleep: different pages post at the same time, the same page waits its turn.
+    """
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
 
 def post_to_page(dest, payload):
     page_id = dest["page_id"]
     token_env = dest["token_env"]
     token = os.environ.get(token_env, "").strip()
     if not token:
-        raise RuntimeError(f"Missing token env: {token_env}")
+        raise NotPosted(f"Missing token env: {token_env}")
 
     msg = payload.get("message", "").strip()
     link = payload.get("link", "").strip()
@@ -59,58 +91,194 @@ def post_to_page(dest, payload):
         data["link"] = link
     return http_post(url, data)
 
-def git_move_and_commit(src_path, sent_dir, sha_note):
-    os.makedirs(sent_dir, exist_ok=True)
-    base = os.path.basename(src_path)
-    dst_path = os.path.join(sent_dir, base)
-    shutil.move(src_path, dst_path)
-    # Commit the move so your ledger updates
-    subprocess.run(["git", "config", "user.name", "bubbleworld-bot"], check=True)
-    subprocess.run(["git", "config", "user.email", "actions@users.noreply.github.com"], check=True)
-    subprocess.run(["git", "add", "-A"], check=True)
-    msg = f"autoposter: sent {base} ({sha_note})"
-    subprocess.run(["git", "commit", "-m", msg], check=True)
-    # Push uses GITHUB_TOKEN via permissions in the workflow
-    subprocess.run(["git", "push"], check=True)
-
-def main():
-    root = os.getcwd()
+class Ledger:
+    """
+    Collects queue → sent moves, the queue index and a results record during
+    a run, then commits and pushes them once at the end. `git add` is scoped
+    to the paths we touched; a rejected push is retried after a rebase.
+    checkpoint() pushes the index on its own before posting: the runner's
+    working tree is thrown away with the job, so an "inflight" mark only
+    protects against a double post once it is on the remote.
+    AUTOPOSTER_GIT=0 turns git off (local dry runs, tests).
+    """
+    GIT_ID = ["-c", "user.name=bubbleworld-bot",
+              "-c", "user.email=actions@users.noreply.github.com"]
+
+    def __init__(self, sent_dir, results_dir, push_attempts=3,
+                 git=os.environ.get("AUTOPOSTER_GIT", "1") != "0"):
+        self.sent_dir = sent_dir
+        self.results_dir = results_dir
+        self.push_attempts = push_attempts
+        self.git = git
+        self.paths = []
+        self.results = {}
+        self.moved = []
+
+    def move(self, src_path):
+        os.makedirs(self.sent_dir, exist_ok=True)
+        base = os.path.basename(src_path)
+        dst_path = os.path.join(self.sent_dir, base)
+        shutil.move(src_path, dst_path)
+        self.paths += [src_path, dst_path]
+        self.moved.append(base)
+
+    def note(self, name, results):
+        self.results[name] = results
+
+    def track(self, path):
+        self.paths.append(path)
+
+    def commit(self, sha_note):
+        if not self.results:
+            return
+        stamp = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+        record = os.path.join(self.results_dir, f"{stamp}.json")
+        save_json(record, {"sha": sha_note, "at": stamp, "items": self.results})
+        self.paths.append(record)
+
+        if self.moved:
+            msg = f"autoposter: sent {', '.join(self.moved)} ({sha_note})"
+        else:
+            msg = f"autoposter: attempted {', '.join(self.results)} ({sha_note})"
+        self._commit(self.paths, msg)
+
+    def checkpoint(self, paths, msg):
+        """Commit + push `paths` right now. Raises if the push can't land."""
+        self._commit(paths, msg)
+
+    def _commit(self, paths, msg):
+        if not self.git:
+            return
+        subprocess.run(["git", "add", "-A", "--", *paths], check=True)
+        if subprocess.run(["git", "diff", "--cached", "--quiet"]).returncode == 0:
+            return  # nothing changed
+        subprocess.run(["git", *self.GIT_ID, "commit", "-m", msg], check=True)
+        self.push()
+
+    def push(self):
+        # Push uses GITHUB_TOKEN via permissions in the workflow
+        for attempt in range(1, self.push_attempts + 1):
+            if subprocess.run(["git", "push"]).returncode == 0:
+                return
+            if attempt == self.push_attempts:
+                break
+            print(f"Push rejected (attempt {attempt}) — rebasing onto remote and retrying.")
+            subprocess.run(["git", *self.GIT_ID, "pull", "--rebase"], check=True)
+            time.sleep(attempt)
+        raise RuntimeError("git push failed after retries")
+
+def post_all(tasks, alias_map, limiters, max_workers=MAX_WORKERS):
+    """
+    Fan out every (item, alias) delivery over a bounded thread pool.
+    `tasks` is [(name, payload, [aliases])].
+    Returns {(name, alias): (ok, detail, retryable, unknown)}. Only failures
+    where nothing was posted are retryable; a post that went out without an
+    answer (or died some other way mid-call) is `unknown`, like a crash.
+    """
+    def _one(payload, alias):
+        dest = alias_map.get(alias)
+        if not dest:
+            return False, "SKIPPED (unknown alias)", False, False
+        limiters[alias].wait()
+        try:
+            resp = post_to_page(dest, payload)
+            return True, f"OK {resp[:140]}...", True, False
+        except NotPosted as e:
+            return False, f"ERROR {e}", True, False
+        except OutcomeUnknown as e:
+            return False, f"UNKNOWN {e}", False, True
+        except Exception as e:
+            return False, f"UNKNOWN {e!r}", False, True
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = [((name, alias), pool.submit(_one, payload, alias))
+                   for name, payload, aliases in tasks for alias in aliases]
+        for key, fut in futures:
+            results[key] = fut.result()
+    return results
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Post queued items to Facebook pages.")
+    ap.add_argument("command", nargs="?", default="run", choices=["run", "status", "retry"],
+                    help="run the queue (default), show delivery state, or re-arm a delivery")
+    ap.add_argument("item", nargs="?", help="retry: queue file name")
+    ap.add_argument("alias", nargs="?", help="retry: destination alias (default: all)")
+    ap.add_argument("--max-items", type=int,
+                    default=int(os.environ.get("AUTOPOSTER_MAX_ITEMS", "1")),
+                    help="drain up to K queue items this run (default 1)")
+    args = ap.parse_args(argv)
+
     meta = load_json(".github/autoposter/destinations.json")
     destinations = [d for d in meta.get("destinations", []) if d.get("active", True)]
     if not destinations:
         print("No active destinations.")
         return
 
-    queue_dir = ".github/autoposter/queue"
     sent_dir  = ".github/autoposter/sent"
-    next_file = pick_next_payload(queue_dir)
-    if not next_file:
-        print("Queue empty — nothing to post.")
+    results_dir = ".github/autoposter/results"
+    alias_map = {d["alias"]: d for d in destinations}
+    queue = PostQueue(".github/autoposter", default_targets=list(alias_map))
+
+    if args.command == "status":
+        for name, rec in sorted(queue.items.items()):
+            states = ", ".join(f"{a}={d['state']}({d.get('attempts', 0)})"
+                               for a, d in rec["deliveries"].items())
+            print(f"- {name} [p{rec['priority']}]: {states}")
+        return
+    if args.command == "retry":
+        if args.item not in queue.items:
+            raise SystemExit(f"Not in queue: {args.item}")
+        queue.retry(args.item, args.alias)
+        queue.save()
+        print(f"Re-armed {args.item} {args.alias or '(all aliases)'}")
         return
 
-    payload = load_json(next_file)
-    targets = payload.get("targets") or [d["alias"] for d in destinations]
-    alias_map = {d["alias"]: d for d in destinations}
+    due = queue.due(max(1, args.max_items))
 
-    results = {}
-    for alias in targets:
-        dest = alias_map.get(alias)
-        if not dest:
-            results[alias] = "SKIPPED (unknown alias)"
-            continue
+    # Mark + persist + push before any Graph call so a crash can't lead to a
+    # repost. If the push fails, nothing is posted this run.
+    tasks = []
+    for name, path, aliases in due:
         try:
-            resp = post_to_page(dest, payload)
-            results[alias] = f"OK {resp[:140]}..."
-            time.sleep(1.0)  # gentle
-        except Exception as e:
-            results[alias] = f"ERROR {e}"
+            payload = load_json(path)
+        except (OSError, ValueError) as e:  # deleted or broken since it was indexed
+            print(f"Dropped {name}: can't read its queue file ({e})")
+            queue.pop(name)
+            continue
+        for alias in aliases:
+            queue.mark_inflight(name, alias)
+        tasks.append((name, payload, aliases))
+    queue.save()
+    ledger = Ledger(sent_dir, results_dir)
+    if not tasks:
+        # Still push the index if it dropped cancelled items (a no-op otherwise).
+        ledger.checkpoint([queue.index_path], "autoposter: update queue index")
+        print("Queue empty — nothing due to post.")
+        return
+    ledger.checkpoint([queue.index_path],
+                      f"autoposter: posting {', '.join(name for name, _, _ in tasks)} (inflight)")
+
+    limiters = {alias: RateLimiter(MIN_INTERVAL) for alias in alias_map}
+    results = post_all(tasks, alias_map, limiters)
 
-    print("Post results:")
-    for k, v in results.items():
-        print(f"- {k}: {v}")
+    for name, _, aliases in tasks:
+        print(f"Post results ({name}):")
+        for alias in aliases:
+            ok, detail, retryable, unknown = results[(name, alias)]
+            queue.complete(name, alias, ok, detail, retryable, unknown)
+            print(f"- {alias}: {detail} → {queue.items[name]['deliveries'][alias]['state']}")
+            if unknown:
+                print(f"  check the page, then: python .github/post_to_fb.py retry {name} {alias}")
+        ledger.note(name, queue.items[name]["deliveries"])
+    for name in queue.finished():
+        rec = queue.pop(name)
+        ledger.move(os.path.join(queue.queue_dir, rec["file"]))
+    queue.save()
+    ledger.track(queue.index_path)
 
-    sha_note = os.environ.get("GITHUB_SHA", "")[:7]
-    git_move_and_commit(next_file, sent_dir, sha_note)
+    # One commit + push for the whole run so the ledger updates
+    ledger.commit(os.environ.get("GITHUB_SHA", "")[:7])
 
 if __name__ == "__main__":
     main()
@@ -9,16 +9,51 @@
 # - Ignore external query params (fbclid, utm_*, list, index, si, feature, etc.)
 # - FB-safe Open Graph tags with absolute https URLs & 1200x630 image
 
-import os, re, json, socket, threading, time, webbrowser
+import time
+_T0 = time.perf_counter()  # --profile-startup counts from here
+import os, sys, json, hashlib, threading
+from contextlib import contextmanager
 from pathlib import Path
-from flask import Flask, request, jsonify, render_template_string
+from collections import OrderedDict
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+from metrics import Registry, gauge_lines
+from statestore import StateStore
+from roomstore import RoomStore
+from pubsub import Hub, StreamServer, stream
+from schema import SCHEMA_VERSION, from_dict, to_dict, valid_room_id
+from youtube import extract_youtube_id
+from og import OgRegistry
+from assets import AssetManifest, ENCODINGS
 
 APP_NAME = "Timmy Ship v1.1 — Sanitizer + FB-OG"
 ROOT = Path(__file__).parent.resolve()
 STATIC_DIR = ROOT / "static"
 OG_DIR = STATIC_DIR / "og"
 DATA_DIR = STATIC_DIR / "data"
-DATA_FILE = DATA_DIR / "state.json"
+# SHIP_STATE_FILE points the app at another state file (benchmarks, scratch runs);
+# SHIP_BANNERS=0 turns off background banner drawing.
+DATA_FILE = Path(os.getenv("SHIP_STATE_FILE") or DATA_DIR / "state.json")
+BANNERS = os.getenv("SHIP_BANNERS", "1") != "0"
+
+# ------------------------- STARTUP PROFILE -------------------------
+# Flask, Jinja and the filesystem are only touched on first use (see
+# init_runtime / create_app), so `import app` stays cheap for the CLI,
+# the exporter and forked workers. Each phase records its cost here.
+STARTUP = []  # [(phase, seconds)]
+
+@contextmanager
+def _phase(name):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        STARTUP.append((name, time.perf_counter() - t0))
+
+def startup_report() -> str:
+    lines = [f"{ms * 1000:9.2f} ms  {name}" for name, ms in STARTUP]
+    lines.append(f"{(time.perf_counter() - _T0) * 1000:9.2f} ms  total since import")
+    return "\n".join(lines)
 
 # ----------- YOUR PUBLIC BASE (used for absolute OG URLs) -----------
 # Override with env PUBLIC_BASE_URL if needed.
@@ -29,6 +64,7 @@ PUBLIC_BASE_URL = os.getenv(
 
 # ------------------------- DEFAULT STATE -------------------------
 DEFAULT_STATE = {
+    "schema": SCHEMA_VERSION,
     "rooms": {
         "1": {"video_id": "", "start": 0, "title": "Engine Room — Hammer Online"},
         "2": {"video_id": "", "start": 0, "title": "Room 2 — Purple Play"},
@@ -45,157 +81,234 @@ DEFAULT_STATE = {
 }
 
 # ------------------------- SETUP FOLDERS/FILES -------------------------
-STATIC_DIR.mkdir(parents=True, exist_ok=True)
-DATA_DIR.mkdir(parents=True, exist_ok=True)
-OG_DIR.mkdir(parents=True, exist_ok=True)
-
 def ensure_default_state():
     if not DATA_FILE.exists():
         DATA_FILE.write_text(json.dumps(DEFAULT_STATE, indent=2), encoding="utf-8")
 
-def ensure_default_og():
-    """Create a 1200x630 default banner if missing."""
-    placeholder = OG_DIR / "ship_default_1200x630.png"
-    if not placeholder.exists():
+def ensure_default_og(room_ids=None):
+    """
+    Draw 1200x630 banners in the background, so no request waits on Pillow.
+    No argument: a full pass (the default + every room; unchanged ones are
+    skipped by hash). With room_ids: just those rooms, so a video lock costs
+    one banner, not a walk over every room file. Requests arriving while a
+    pass runs are merged into the next one.
+    """
+    global _banner_thread, _banner_full
+    if not BANNERS:
+        return
+    with _banner_lock:
+        if room_ids is None:
+            _banner_full = True
+        else:
+            _banner_pending.update(room_ids)
+        if _banner_thread is None:
+            _banner_thread = threading.Thread(target=_banner_loop, name="og-banners", daemon=True)
+            _banner_thread.start()
+
+def _banner_pool():
+    """One long-lived worker process for drawing; spawned, not forked, since the server runs threads."""
+    global _banner_executor
+    if _banner_executor is None:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        _banner_executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    return _banner_executor
+
+def _banner_loop():
+    global _banner_thread, _banner_full
+    from banners import build_banners
+    while True:
+        with _banner_lock:
+            full, room_ids = _banner_full, sorted(_banner_pending, key=int)
+            _banner_full = False
+            _banner_pending.clear()
+            if not full and not room_ids:
+                _banner_thread = None
+                return
         try:
-            from PIL import Image, ImageDraw
-            img = Image.new("RGB", (1200, 630), (5, 0, 12))  # deep space
-            d = ImageDraw.Draw(img)
-            # simple diagonal glow bar
-            for i in range(0, 1200, 6):
-                shade = 12 + int(8 * (i/1200))
-                d.line([(i, 0), (i-80, 630)], fill=(255, 59, 209, 40), width=3)
-            img.save(str(placeholder), format="PNG")
+            if full:
+                rooms = ROOMS.items()
+            else:
+                rooms = [(room_id, room) for room_id in room_ids if (room := ROOMS.get(room_id)) is not None]
+            build_banners(load_state().brand, rooms, OG_DIR, include_default=full, pool=_banner_pool())
         except Exception:
             # If Pillow not available, silently skip; you can drop your own image
             pass
 
-ensure_default_state()
-ensure_default_og()
-
-# ------------------------- APP CORE -------------------------
-app = Flask(__name__)
-
-YOUTUBE_ID_RE = re.compile(r"^[A-Za-z0-9_-]{11}$")
+_banner_lock = threading.Lock()
+_banner_thread = None
+_banner_full = False
+_banner_pending = set()  # room ids waiting for a redraw
+_banner_executor = None
 
-def load_state():
-    try:
-        return json.loads(DATA_FILE.read_text(encoding="utf-8"))
-    except Exception:
-        return DEFAULT_STATE.copy()
-
-def save_state(state):
-    DATA_FILE.write_text(json.dumps(state, indent=2), encoding="utf-8")
+_runtime_lock = threading.Lock()
+_runtime_ready = False
+_banners_started = False  # per process: reset in a forked worker
 
-def extract_youtube_id(raw: str):
+def _banners_after_fork():
     """
-    Accepts:
-      - https://youtu.be/ID
-      - https://www.youtube.com/watch?v=ID
-      - https://www.youtube.com/shorts/ID
-      - raw 11-char ID
-      Optional t= / start= seconds allowed
-    Returns (video_id, start_seconds) or (None, 0)
+    A forked worker (gunicorn) inherits the parent's banner globals but not
+    its threads or pool: start clean, keep whatever was queued, and let the
+    worker's first request start its own banner thread.
     """
-    if not raw:
-        return None, 0
-    s = raw.strip()
-
-    # start seconds: t=42 or start=42 (simple numeric)
-    start = 0
-    t_match = re.search(r"(?:[?&]|^)t=([0-9]+)s?\b", s) or re.search(r"(?:[?&]|^)start=([0-9]+)\b", s)
-    if t_match:
-        try:
-            start = int(t_match.group(1))
-        except ValueError:
-            start = 0
+    global _banner_lock, _banner_thread, _banner_executor, _runtime_lock, _banners_started
+    _banner_lock = threading.Lock()
+    _banner_thread = _banner_executor = None
+    _runtime_lock = threading.Lock()
+    _banners_started = False
 
-    # raw ID
-    if YOUTUBE_ID_RE.match(s):
-        return s, start
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_banners_after_fork)
 
-    # shorts
-    m = re.search(r"youtube\.com/shorts/([A-Za-z0-9_-]{11})", s)
-    if m:
-        return m.group(1), start
+def init_runtime(banners: bool = True):
+    """
+    First-use setup: folders, the default state.json and (unless told not
+    to) the background banner run. Idempotent; the app calls it before its
+    first request and the CLI before any command, so importing does nothing.
+    Folders and state are set up once; banners start once per process.
+    """
+    global _runtime_ready, _banners_started
+    if _runtime_ready and (_banners_started or not banners):
+        return
+    with _runtime_lock:
+        if not _runtime_ready:
+            with _phase("init: folders + default state"):
+                for d in (STATIC_DIR, DATA_FILE.parent, OG_DIR):
+                    d.mkdir(parents=True, exist_ok=True)
+                ensure_default_state()
+            with _phase("init: load state (+ shard pre-v3 rooms)"):
+                load_state()
+            _runtime_ready = True
+        if banners and not _banners_started:
+            with _phase("init: start banner thread"):
+                ensure_default_og()
+            _banners_started = True
+
+# ------------------------- ASSETS -------------------------
+# static/dist holds content-hashed copies (+ .gz/.br) of the stylesheets and
+# scripts; pages link them through ASSETS.url(), so a changed file gets a
+# new URL and everything else can be cached for a year. Building them is a
+# deploy step (`python app.py assets`, also run by `build`); the server only
+# reads static/dist/manifest.json and never writes to the source tree.
+ASSETS = AssetManifest()
+ASSET_MAX_AGE = 31536000  # one year; the hash in the name does the invalidating
+
+def ensure_assets(force=False):
+    """Rebuild static/dist for any changed source (CLI only). A read-only tree keeps what's there."""
+    from assets import build_assets
+    try:
+        result = build_assets(force=force)
+    except OSError as e:
+        print(f"[assets] build skipped: {e}", file=sys.stderr)
+        return None
+    if result["built"]:
+        print(f"[assets] fingerprinted {', '.join(result['built'])}")
+    return result
 
-    # watch?v=
-    m = re.search(r"[?&]v=([A-Za-z0-9_-]{11})\b", s)
-    if m:
-        return m.group(1), start
+# ------------------------- APP CORE -------------------------
+# Rooms live one file each next to state.json (see roomstore.py); a video
+# change rewrites one small file and the dock pages through an ordered index.
+ROOMS = RoomStore(DATA_FILE.parent / "rooms")
+
+# Live room updates: /api/set_video publishes, /room/<id>/events streams (SSE).
+HUB = Hub()
+SSE_HEARTBEAT = 15.0  # seconds between keep-alive comments on an idle stream
+SSE_MAX_AGE = 300.0  # then the browser reconnects (on the dev server, that frees a thread)
+# Under --serve production the streams don't touch the WSGI thread pool: each
+# process runs a pubsub.StreamServer (one selector thread, its own port) and
+# /room/<id>/events redirects there. The dev server streams from its threads.
+LIVE_HOST = None  # the stream server's bind address; None = no stream server
+LIVE = None  # this process's StreamServer
+_live_pid = None
+_live_lock = threading.Lock()
+
+def _live_topic(path: str):
+    parts = path.strip("/").split("/")
+    if len(parts) == 3 and parts[0] == "room" and parts[2] == "events" and valid_room_id(parts[1]):
+        return parts[1]
+    return None
+
+def ensure_live_server():
+    """Start this process's stream server, once per process (gunicorn workers get one each)."""
+    global LIVE, _live_pid
+    if LIVE_HOST is None or _live_pid == os.getpid():
+        return
+    with _live_lock:
+        if _live_pid != os.getpid():
+            LIVE = StreamServer(HUB, _live_topic, host=LIVE_HOST,
+                                heartbeat=SSE_HEARTBEAT, max_age=SSE_MAX_AGE).start()
+            HUB.limit = LIVE.capacity
+            _live_pid = os.getpid()
+
+def _decode_state(raw):
+    """
+    state.json → ShipState. Rooms still inside an older file (or the default
+    seed rooms, on a fresh ship) move into ROOMS once; the file is then
+    rewritten without them.
+    """
+    state, changed = from_dict(raw, DEFAULT_STATE)
+    if state.rooms:
+        if raw is not None or not ROOMS.exists():
+            added = ROOMS.adopt(state.rooms)
+            if added:
+                print(f"[state] moved {added} room(s) into {ROOMS.root}", file=sys.stderr)
+        state.rooms = {}
+        changed = changed or raw is not None
+    return state, changed
+
+# Brand + the other ship-wide settings (see schema.py); re-read only when the
+# file changes. Legacy files are migrated on first load and written back once.
+STATE = StateStore(DATA_FILE, DEFAULT_STATE, decode=_decode_state, encode=to_dict)
 
-    # youtu.be/<id>
-    m = re.search(r"youtu\.be/([A-Za-z0-9_-]{11})\b", s)
-    if m:
-        return m.group(1), start
+def load_state():
+    """Cached ShipState (shared). Don't mutate it — use STATE.update() or save_state()."""
+    return STATE.get()
 
-    return None, 0
+def save_state(state):
+    """Replace state; the disk write is atomic and coalesced with nearby saves."""
+    STATE.put(state)
 
 def build_embed(video_id: str, start: int = 0):
     base = f"https://www.youtube-nocookie.com/embed/{video_id}"
     return f"{base}?start={start}" if start and start > 0 else base
 
-def room_meta(state, room_id: str):
-    r = state["rooms"].get(room_id, {"video_id":"", "start":0, "title":f"Room {room_id}"})
-    vid = r.get("video_id") or ""
-    start = int(r.get("start") or 0)
-    embed = build_embed(vid, start) if vid else ""
-    title = r.get("title") or f"Room {room_id}"
-    return title, vid, start, embed
+def room_meta(room_id: str):
+    r = ROOMS.get(room_id)
+    if r is None:
+        return f"Room {room_id}", "", 0, ""
+    embed = build_embed(r.video_id, r.start) if r.video_id else ""
+    return r.title, r.video_id, r.start, embed
+
+# Banner index + memoized tag sets; no stat() per page view.
+# Indexed on first use, not at import.
+OG = OgRegistry(OG_DIR, PUBLIC_BASE_URL,
+                "TimmyTime • Bubble World Ship — Creative Rooms, Reels, and Music.")
 
 def ensure_room_og_image(room_id: str):
     """
-    Ensure a per-room OG image exists; if not, use default.
-    Returns absolute URL to the image.
+    Absolute (cache-busted) URL of the room's OG banner, or the default.
     """
-    custom = OG_DIR / f"room{room_id}_1200x630.png"
-    if custom.exists():
-        return f"{PUBLIC_BASE_URL}/static/og/room{room_id}_1200x630.png"
-    # fallback to default
-    return f"{PUBLIC_BASE_URL}/static/og/ship_default_1200x630.png"
+    return OG.image_for(room_id)["url"]
 
 def build_og_meta(room_id: str, title: str, video_id: str, start: int = 0):
     """
     Build a dict of OG tags with absolute https URLs so FB shows the full banner.
+    Shared and memoized — don't mutate the result.
     """
+    OG.start_watching()
     room_url = f"{PUBLIC_BASE_URL}/room/{room_id}"
-    image_url = ensure_room_og_image(room_id)
-    og = {
-        "og:url": room_url,
-        "og:title": title,
-        "og:description": "TimmyTime • Bubble World Ship — Creative Rooms, Reels, and Music.",
-        "og:image": image_url,
-        "og:image:width": "1200",
-        "og:image:height": "630",
-        "og:type": "website"
-    }
-    if video_id:
-        v = build_embed(video_id, start)
-        og["og:video:url"] = v
-    return og
+    return OG.tags(room_id, room_url, title, build_embed(video_id, start) if video_id else "")
 
 # ------------------------- PAGES -------------------------
-BASE_CSS = """
+# The stylesheet itself is static/ship.css, served fingerprinted and
+# precompressed from static/dist (assets.py); only the brand colours are
+# per-state, so they stay inline.
+BRAND_CSS = """
 :root {
-  --bg: {{brand['bg']}};
-  --fg: {{brand['fg']}};
-  --accent: {{brand['theme_color']}};
+  --bg: {{brand.bg}};
+  --fg: {{brand.fg}};
+  --accent: {{brand.theme_color}};
 }
-html, body { margin:0; padding:0; background:var(--bg); color:var(--fg);
-  font-family:-apple-system, system-ui, Segoe UI, Roboto, Helvetica, Arial, sans-serif; }
-h1 { font-size:3rem; margin:1rem; }
-a { color:#ffb6ff; }
-.room { display:block; margin:1rem; padding:1rem 1.2rem; background:#0f0f18; border:1px solid #222;
-  border-radius:12px; color:#fff; text-decoration:none; font-size:1.4rem; }
-.small { opacity:.85; font-size:.95rem; }
-button { font-size:1.2rem; padding:.8rem 1.1rem; border-radius:10px; border:1px solid #444;
-  background:var(--accent); color:#000; cursor:pointer; }
-input[type=text], input[type=number] {
-  font-size:1.2rem; padding:.8rem; border-radius:10px; border:1px solid #333; background:#0f0f18; color:#fff;
-}
-.inputrow { display:flex; gap:.6rem; flex-wrap:wrap; }
-.player { aspect-ratio:16/9; width:min(960px, 96vw); max-width:100%; border-radius:14px; border:1px solid #222;
-  overflow:hidden; background:#000; }
 """
 
 HOME_TPL = f"""
@@ -204,14 +317,19 @@ HOME_TPL = f"""
 <head>
 <meta charset="utf-8" />
 <meta name="viewport" content="width=device-width, initial-scale=1" />
-<title>{{{{brand['site_title']}}}} — Dock</title>
-<meta name="theme-color" content="{{{{brand['theme_color']}}}}">
-<style>{BASE_CSS}</style>
+<title>{{{{brand.site_title}}}} — Dock</title>
+<meta name="theme-color" content="{{{{brand.theme_color}}}}">
+<link rel="stylesheet" href="{{{{ship_css}}}}">
+<style>{BRAND_CSS}</style>
 </head>
 <body>
   <h1>TimmyTime Dock</h1>
   <div class="small" style="margin:0 1rem .8rem 1rem;">{APP_NAME} — Paste any YouTube link in a room; it becomes <b>hard-clean</b> and final.</div>
-  {{{{room_links}}}}
+  {{% for k, title, href in rooms %}}<a class="room" href="{{{{href}}}}">{{{{title}}}} <span class="small">/room/{{{{k}}}}</span></a>{{% endfor %}}
+  {{% if pages > 1 %}}<div class="small" style="margin:1rem;">
+    {{% if prev_href %}}<a href="{{{{prev_href}}}}">← Prev</a> · {{% endif %}}Page {{{{page}}}} of {{{{pages}}}} ({{{{total}}}} rooms)
+    {{% if next_href %}} · <a href="{{{{next_href}}}}">Next →</a>{{% endif %}}
+  </div>{{% endif %}}
 </body>
 </html>
 """
@@ -223,23 +341,26 @@ ROOM_TPL = """
 <meta charset="utf-8" />
 <meta name="viewport" content="width=device-width, initial-scale=1" />
 <title>{{ title }}</title>
-<meta name="theme-color" content="{{ brand['theme_color'] }}" />
+<meta name="theme-color" content="{{ brand.theme_color }}" />
 <link rel="canonical" href="{{ og['og:url'] }}" />
 {% for k,v in og.items() %}
 <meta property="{{k}}" content="{{v}}">
 {% endfor %}
-<style>""" + BASE_CSS + """</style>
+<link rel="stylesheet" href="{{ ship_css }}">
+<style>""" + BRAND_CSS + """</style>
 </head>
 <body>
   <div style="padding:1rem">
     <h1>{{ title }}</h1>
 
+    {% if not static_export %}
     <div class="inputrow" style="margin:.6rem 0 1rem 0;">
       <input id="paste" type="text" placeholder="Paste YouTube link or 11-char ID" autocomplete="off" style="flex:1;min-width:240px;">
       <input id="start" type="number" min="0" step="1" value="{{ start }}" title="Start seconds (optional)" style="width:120px;">
       <button onclick="lockVideo()">Lock Clean Link</button>
     </div>
     <div class="small">Accepts youtu.be/ID, watch?v=ID, /shorts/ID, or raw 11-char ID. We store only the ID (optional start). Everything else is ignored.</div>
+    {% endif %}
     <div id="msg" class="small" style="color:#ff6b6b; display:none; margin-top:.3rem;"></div>
     <div id="ok" class="small" style="color:#7ef0a8; display:none; margin-top:.3rem;"></div>
 
@@ -264,7 +385,7 @@ ROOM_TPL = """
     </div>
 
     <div class="small">This page ignores any querystrings (fbclid, utm, list, si, feature, etc.). Only your locked ID controls playback.</div>
-    <div class="small" style="margin-top:.5rem;"><a href="/">← Back to Dock</a></div>
+    <div class="small" style="margin-top:.5rem;"><a href="{{ dock_url }}">← Back to Dock</a></div>
   </div>
 
 <script>
@@ -289,19 +410,34 @@ function lockVideo(){
       msg.style.display='block'; msg.textContent=d.error || 'Unrecognized link — paste a YouTube URL or 11-char ID.';
       return;
     }
-    CURRENT_EMBED = d.embed;
-    const now = document.getElementById('now');
-    now.textContent = 'Now playing → ' + CURRENT_EMBED;
-    const player = document.getElementById('yt');
-    if(player) player.src = CURRENT_EMBED;
-    else {
-      const div = document.querySelector('.player');
-      div.innerHTML = "<iframe id='yt' src='"+CURRENT_EMBED+"' allow='accelerometer; autoplay; encrypted-media; gyroscope; picture-in-picture; web-share' allowfullscreen referrerpolicy='strict-origin-when-cross-origin' style='border:0;width:100%;height:100%;'></iframe>";
-    }
+    showEmbed(d.embed);
   }).catch(()=>{
     msg.style.display='block'; msg.textContent='Network hiccup. Try again.';
   });
 }
+function showEmbed(embed){
+  CURRENT_EMBED = embed;
+  const now = document.getElementById('now');
+  now.textContent = 'Now playing → ' + CURRENT_EMBED;
+  const player = document.getElementById('yt');
+  if(player) player.src = CURRENT_EMBED;
+  else {
+    const div = document.querySelector('.player');
+    div.innerHTML = "<iframe id='yt' src='"+CURRENT_EMBED+"' allow='accelerometer; autoplay; encrypted-media; gyroscope; picture-in-picture; web-share' allowfullscreen referrerpolicy='strict-origin-when-cross-origin' style='border:0;width:100%;height:100%;'></iframe>";
+  }
+}
+{% if not static_export %}
+// Live: when another tab or phone locks a video here, follow it (the static site has no server to listen to).
+if(window.EventSource){
+  new EventSource('/room/{{ room_id }}/events').addEventListener('video', e=>{
+    const d = JSON.parse(e.data);
+    if(d.embed !== CURRENT_EMBED){
+      showEmbed(d.embed);
+      document.getElementById('start').value = d.start;
+    }
+  });
+}
+{% endif %}
 // Never let page querystrings alter behavior
 history.replaceState(null, '', window.location.pathname);
 </script>
@@ -309,43 +445,225 @@ history.replaceState(null, '', window.location.pathname);
 </html>
 """
 
-@app.route("/")
-def home():
-    state = load_state()
-    brand = state["brand"]
-    # links
-    items = []
-    for k in sorted(state["rooms"].keys(), key=lambda x: int(x)):
-        title = state["rooms"][k]["title"]
-        items.append(f'<a class="room" href="/room/{k}">{title} <span class="small">/room/{k}</span></a>')
-    html = render_template_string(
-        HOME_TPL,
-        brand=brand,
-        room_links="".join(items),
+# ------------------------- METRICS -------------------------
+METRICS = Registry()
+REQUESTS = METRICS.counter("ship_requests_total", "Requests by route, method and status.",
+                           labels=("route", "method", "status"))
+LATENCY = METRICS.histogram("ship_request_duration_seconds", "Request latency by route.",
+                            labels=("route",))
+RENDER_SECONDS = METRICS.histogram("ship_render_duration_seconds",
+                                   "Template render time on page-cache misses.", labels=("page",))
+
+def _state_metrics():
+    st = STATE.stats()
+    lookups = st["hits"] + st["misses"] + st["reloads"]
+    lines = []
+    for k in ("hits", "misses", "reloads"):
+        lines += gauge_lines(f"ship_state_cache_{k}_total", f"state.json (brand + settings) cache {k}.",
+                             st[k], "counter")
+    lines += gauge_lines("ship_state_cache_hit_ratio", "state.json cache hits / lookups.",
+                         f"{(st['hits'] / lookups) if lookups else 0:.6f}")
+    lines += gauge_lines("ship_state_writes_total", "state.json flushes to disk.", st["writes"], "counter")
+    lines += gauge_lines("ship_state_version", "In-memory state version.", st["version"])
+    # Rooms live in their own files (roomstore.py); video locks show up here, not above.
+    rs = ROOMS.stats()
+    lines += gauge_lines("ship_rooms", "Rooms in the index.", rs["rooms"])
+    lines += gauge_lines("ship_rooms_cached", "Room files held parsed in memory.", rs["cached"])
+    lines += gauge_lines("ship_rooms_reads_total", "Room file + index reads from disk.", rs["reads"], "counter")
+    lines += gauge_lines("ship_rooms_writes_total", "Room file + index writes.", rs["writes"], "counter")
+    lines += gauge_lines("ship_live_listeners", "Open /room/<id>/events streams.", HUB.subscribers)
+    lines += gauge_lines("ship_live_events_total", "Room updates published.", HUB.published, "counter")
+    lines += gauge_lines("ship_uptime_seconds", "Seconds since start.",
+                         f"{time.time() - METRICS.started:.1f}")
+    return lines
+
+METRICS.collectors.append(_state_metrics)
+
+def _metrics_start():
+    from flask import g
+    g._t0 = time.perf_counter()
+
+def _metrics_stop(resp):
+    from flask import g, request
+    t0 = g.get("_t0")
+    if t0 is not None:
+        rule = request.url_rule.rule if request.url_rule else "<unmatched>"
+        LATENCY.observe(time.perf_counter() - t0, rule)
+        REQUESTS.inc(rule, request.method, resp.status_code)
+    return resp
+
+# ------------------------- RENDER CACHE -------------------------
+_templates = None
+
+def templates():
+    """
+    (HOME_T, ROOM_T), compiled once on first use; Jinja would otherwise
+    re-parse the big strings per hit. A plain autoescaping Environment, so
+    the exporter renders without importing Flask.
+    """
+    global _templates
+    if _templates is None:
+        with _phase("compile templates"):
+            from jinja2 import Environment
+            env = Environment(autoescape=True)
+            _templates = (env.from_string(HOME_TPL), env.from_string(ROOM_TPL))
+    return _templates
+
+def _now_second():
+    return datetime.fromtimestamp(int(time.time()), tz=timezone.utc)
+
+class Page:
+    __slots__ = ("html", "etag", "last_modified")
+
+    def __init__(self, html: str, last_modified: float):
+        self.html = html
+        # Strong validator: same bytes => same tag, stable across restarts.
+        self.etag = hashlib.sha1(html.encode("utf-8")).hexdigest()[:20]
+        self.last_modified = datetime.fromtimestamp(int(last_modified), tz=timezone.utc)
+
+class PageCache:
+    """
+    Rendered pages per page key, tagged with the state version they came from.
+    A lookup under a newer version is a miss, so edits invalidate naturally;
+    LRU-capped so random /room/<junk> hits can't grow it without bound.
+    """
+    def __init__(self, max_pages: int = 256):
+        self.max_pages = max_pages
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            hit = self._pages.get(key)
+            if hit is None or hit[0] != version:
+                return None
+            self._pages.move_to_end(key)
+            return hit[1]
+
+    def latest(self, key):
+        """The last page cached under `key`, whatever its version (None if never)."""
+        with self._lock:
+            hit = self._pages.get(key)
+            return hit[1] if hit is not None else None
+
+    def put(self, key, version, page):
+        with self._lock:
+            self._pages[key] = (version, page)
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._pages.pop(key, None)
+
+PAGES = PageCache()
+
+DOCK_PAGE_SIZE = 100  # rooms per dock page; the page renders the same size at 10 or 10,000 rooms
+
+def _dock_href(n):
+    return "/" if n == 1 else f"/?page={n}"
+
+def home_context(state, page=1, room_href="/room/{}", page_href=_dock_href, root="/"):
+    """One dock page: a slice of the room index, plus prev/next links."""
+    pages = ROOMS.pages(DOCK_PAGE_SIZE)
+    return dict(
+        brand=state.brand,
+        ship_css=ASSETS.url("static/ship.css", root),
+        rooms=[(k, title, room_href.format(k)) for k, title in ROOMS.page(page, DOCK_PAGE_SIZE)],
+        page=page,
+        pages=pages,
+        total=ROOMS.count(),
+        prev_href=page_href(page - 1) if page > 1 else "",
+        next_href=page_href(page + 1) if page < pages else "",
     )
-    return html
 
-@app.route("/room/<room_id>")
-def room(room_id):
-    state = load_state()
-    brand = state["brand"]
-    title, vid, start, embed = room_meta(state, room_id)
+def room_context(state, room_id: str, dock_url="/", static_export=False, root="/"):
+    title, vid, start, embed = room_meta(room_id)
     # Build OG with absolute URLs
     og = build_og_meta(room_id, title, vid, start)
-    html = render_template_string(
-        ROOM_TPL,
-        brand=brand,
+    return dict(
+        brand=state.brand,
+        ship_css=ASSETS.url("static/ship.css", root),
         title=title,
         start=start,
         embed=embed,
         og=og,
-        room_id=room_id
+        room_id=room_id,
+        dock_url=dock_url,
+        static_export=static_export,
     )
-    return html
 
-@app.post("/api/set_video")
-def api_set_video():
-    data = request.get_json(silent=True) or {}
+def render_home(state, page=1):
+    return templates()[0].render(**home_context(state, page))
+
+def render_room(state, room_id: str):
+    return templates()[1].render(**room_context(state, room_id))
+
+def serve_page(key, render, rooms_version):
+    """
+    Cached page with ETag/Last-Modified; answers 304 to a matching
+    If-None-Match / If-Modified-Since. no-cache = "revalidate every time",
+    which with the validators is a cheap 304 for crawlers and the SW.
+    `rooms_version()` is the room-store version the page depends on (the
+    index for dock pages, one room for a room page), so an edit re-renders
+    only the pages it touches.
+    Not every input has a file mtime behind it (banners, assets, a room file
+    edited by hand), so a re-render whose bytes differ from the last cached
+    page for the key is stamped Last-Modified now; If-Modified-Since alone
+    can't get a 304 for stale HTML.
+    """
+    from flask import request
+    state, version = STATE.snapshot()
+    version = (version, rooms_version(), OG.generation, ASSETS.current_version())  # new banners/assets re-render too
+    page = PAGES.get(key, version)
+    if page is None:
+        t0 = time.perf_counter()
+        prev = PAGES.latest(key)
+        page = Page(render(state), max(STATE.modified, ROOMS.modified))
+        if prev is not None:
+            if prev.etag == page.etag:
+                page = prev  # same bytes: keep the validators clients already hold
+            else:
+                page.last_modified = _now_second()
+        RENDER_SECONDS.observe(time.perf_counter() - t0, "room" if key.startswith("/room/") else "home")
+        PAGES.put(key, version, page)
+    resp = get_app().make_response(page.html)
+    resp.set_etag(page.etag)
+    resp.last_modified = page.last_modified
+    resp.cache_control.public = True
+    resp.cache_control.no_cache = True
+    return resp.make_conditional(request)
+
+# ------------------------- ROUTES -------------------------
+_ROUTES = []  # (rule, view, options), registered by create_app()
+
+def route(rule, **options):
+    def deco(view):
+        _ROUTES.append((rule, view, options))
+        return view
+    return deco
+
+@route("/")
+def home():
+    from flask import request, abort
+    page = request.args.get("page", "1")
+    if not valid_room_id(page) or not 1 <= int(page) <= ROOMS.pages(DOCK_PAGE_SIZE):
+        abort(404)
+    page = int(page)
+    return serve_page(_dock_href(page), lambda state: render_home(state, page),
+                      lambda: ROOMS.index_version)
+
+@route("/room/<room_id>")
+def room(room_id):
+    return serve_page(f"/room/{room_id}", lambda state: render_room(state, room_id),
+                      lambda: ROOMS.version(room_id))
+
+def clean_video_entry(data):
+    """
+    Validate one {room_id, raw, start} entry.
+    Returns (entry, None) with the hard-clean fields, or (None, error).
+    """
     room_id = str(data.get("room_id", "")).strip()
     raw = str(data.get("raw", "")).strip()
     start = data.get("start", 0)
@@ -357,46 +675,256 @@ def api_set_video():
         start = 0
 
     if not room_id:
-        return jsonify(ok=False, error="Missing room_id")
+        return None, "Missing room_id"
+    if not valid_room_id(room_id):
+        return None, "room_id must be a number."
 
     video_id, parsed_start = extract_youtube_id(raw)
     if not video_id:
-        return jsonify(ok=False, error="Unrecognized link — paste a YouTube URL or 11-char ID.")
+        return None, "Unrecognized link — paste a YouTube URL or 11-char ID."
 
     final_start = start if start else parsed_start
-    embed = build_embed(video_id, final_start)
-
+    return {
+        "room_id": room_id,
+        "video_id": video_id,
+        "start": final_start,
+        "embed": build_embed(video_id, final_start),
+    }, None
+
+def apply_videos(entries):
+    """Lock every entry: one small room-file write each, the index only for new rooms."""
     # Save ID + start only (hard-clean final)
-    state = load_state()
-    if "rooms" not in state:
-        state["rooms"] = {}
-    if room_id not in state["rooms"]:
-        state["rooms"][room_id] = {"video_id":"", "start":0, "title": f"Room {room_id}"}
-    state["rooms"][room_id]["video_id"] = video_id
-    state["rooms"][room_id]["start"] = final_start
-    save_state(state)
+    ROOMS.set_videos([(e["room_id"], e["video_id"], e["start"]) for e in entries])
+    for e in entries:  # open pages of these rooms follow along
+        HUB.publish(e["room_id"], "video", {"video_id": e["video_id"], "start": e["start"], "embed": e["embed"]})
+    ensure_default_og([e["room_id"] for e in entries])  # new video → new accent color on its banner
+
+@route("/api/set_video", methods=["POST"])
+def api_set_video():
+    from flask import request, jsonify
+    data = request.get_json(silent=True) or {}
+    entry, error = clean_video_entry(data)
+    if error:
+        return jsonify(ok=False, error=error)
+    apply_videos([entry])
+    return jsonify(ok=True, video_id=entry["video_id"], start=entry["start"], embed=entry["embed"])
 
-    return jsonify(ok=True, video_id=video_id, start=final_start, embed=embed)
+MAX_BATCH = 1000
+
+@route("/api/set_videos", methods=["POST"])
+def api_set_videos():
+    """
+    Batch lock. Body is either
+      {"rooms": [{"room_id": "4", "raw": "...", "start": 0}, ...]}
+    or a state.json-style map
+      {"rooms": {"4": "https://youtube.com/shorts/...", "5": {"raw": "...", "start": 12}}}
+    All-or-nothing: if any link is rejected, nothing is saved, and a saved
+    batch becomes visible to readers only once every room file is written
+    (a crash mid-batch is finished on the next read; see RoomStore).
+    Per-room results either way.
+    """
+    from flask import request, jsonify
+    data = request.get_json(silent=True) or {}
+    rooms = data.get("rooms")
+    if isinstance(rooms, dict):
+        rooms = [dict(v, room_id=k) if isinstance(v, dict) else {"room_id": k, "raw": v}
+                 for k, v in rooms.items()]
+    if not isinstance(rooms, list) or not rooms:
+        return jsonify(ok=False, error="Send rooms as a list or a room_id → link map.")
+    if len(rooms) > MAX_BATCH:
+        return jsonify(ok=False, error=f"Too many rooms in one batch (max {MAX_BATCH}).")
+
+    entries, results = [], []
+    for item in rooms:
+        entry, error = clean_video_entry(item if isinstance(item, dict) else {})
+        if error:
+            room_id = str(item.get("room_id", "")).strip() if isinstance(item, dict) else ""
+            results.append({"room_id": room_id, "ok": False, "error": error})
+        else:
+            entries.append(entry)
+            results.append(dict(entry, ok=True))
+
+    if len(entries) != len(results):
+        return jsonify(ok=False, applied=False, error="Some links were rejected; nothing saved.",
+                       results=results)
+    apply_videos(entries)
+    return jsonify(ok=True, applied=True, results=results)
+
+@route("/room/<room_id>/events", methods=["GET"])
+def room_events(room_id):
+    """
+    Server-Sent Events for one room: a `video` event ({video_id, start,
+    embed}) each time a link is locked, ": ping" comments while idle. In
+    production this is a 307 to the process's stream server.
+    """
+    from flask import Response, request, abort, redirect
+    if not valid_room_id(room_id):
+        abort(404)
+    last_id = request.headers.get("Last-Event-ID", "")
+    last_id = int(last_id) if last_id.isdigit() else None
+    if LIVE is not None:
+        host = urlsplit("//" + request.host).hostname or LIVE.host
+        host = f"[{host}]" if ":" in host else host
+        query = f"?last_event_id={last_id}" if last_id is not None else ""
+        resp = redirect(f"{request.scheme}://{host}:{LIVE.port}/room/{room_id}/events{query}", 307)
+        resp.headers["Cache-Control"] = "no-store"
+        return resp
+    return Response(stream(HUB, room_id, last_id, heartbeat=SSE_HEARTBEAT, max_age=SSE_MAX_AGE),
+                    mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@route("/health", methods=["GET"])
+def health():
+    """
+    Liveness + readiness: the process answers, state.json loads and the room
+    index reads (an empty ship with no index yet is still ready).
+    """
+    from flask import jsonify
+    try:
+        state, version = STATE.snapshot()
+        rooms, schema = ROOMS.count(), state.schema
+        error = ROOMS.index_error
+    except Exception as e:
+        version, schema, rooms, error = 0, None, 0, str(e)
+    ready = error is None
+    body = {"status": "ok" if ready else "degraded", "ready": ready, "state_version": version,
+            "schema": schema, "rooms": rooms,
+            "uptime_s": round(time.time() - METRICS.started, 1)}
+    if error:
+        body["error"] = error
+    return jsonify(body), (200 if ready else 503)
+
+@route("/metrics", methods=["GET"])
+def metrics():
+    return METRICS.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+@route("/api/state_stats", methods=["GET"])
+def api_state_stats():
+    from flask import jsonify
+    return jsonify(dict(STATE.stats(), rooms=ROOMS.stats(), live=HUB.stats()))
+
+@route("/static/dist/<name>")
+def dist_asset(name):
+    """
+    A fingerprinted asset: the precompressed .br/.gz sibling when the client
+    accepts it, else the plain file. Names change with content, so immutable.
+    """
+    import mimetypes
+    from flask import request, abort, send_from_directory
+    entry = ASSETS.by_file(name)
+    if entry is None:
+        abort(404)
+    ext = next((ext for ext in (".br", ".gz")
+                if ext in entry["variants"] and request.accept_encodings[ENCODINGS[ext]]), "")
+    resp = send_from_directory(ASSETS.dist, name + ext, mimetype=mimetypes.guess_type(name)[0],
+                               max_age=ASSET_MAX_AGE)
+    if ext:
+        resp.headers["Content-Encoding"] = ENCODINGS[ext]
+    resp.vary.add("Accept-Encoding")
+    resp.cache_control.public = True
+    resp.cache_control.immutable = True
+    return resp
+
+# ------------------------- APP FACTORY -------------------------
+def create_app():
+    """Build a configured Flask app. Flask is imported here, not at module load."""
+    with _phase("import flask"):
+        from flask import Flask
+    with _phase("create_app"):
+        flask_app = Flask(__name__)
+        flask_app.before_request(init_runtime)
+        flask_app.before_request(ensure_live_server)
+        flask_app.before_request(_metrics_start)
+        flask_app.after_request(_metrics_stop)
+        for rule, view, options in _ROUTES:
+            flask_app.add_url_rule(rule, view_func=view, **options)
+    return flask_app
+
+_app = None
+_app_lock = threading.Lock()
+
+def get_app():
+    """The process-wide app, created on first call."""
+    global _app
+    if _app is None:
+        with _app_lock:
+            if _app is None:
+                _app = create_app()
+    return _app
+
+def __getattr__(name):
+    # `from app import app`, gunicorn's "app:app" and ship.HOME_T stay working, lazily.
+    if name == "app":
+        return get_app()
+    if name in ("HOME_T", "ROOM_T"):
+        return templates()[name == "ROOM_T"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+STARTUP.append(("import app.py", time.perf_counter() - _T0))
 
 # ------------------------- PORT-HOP + AUTO-OPEN -------------------------
-def find_free_port(preferred=5050, max_tries=30):
-    for p in range(preferred, preferred+max_tries):
-        if p == 5000:
-            continue
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            try:
-                s.bind(("127.0.0.1", p))
-                return p
-            except OSError:
-                continue
-    raise RuntimeError("No free port found")
-
-def open_browser(url):
-    time.sleep(0.6)
-    webbrowser.open(url)
+def find_free_port(preferred=5050, max_tries=30, host="127.0.0.1"):
+    """Port-hop via the shared allocator (cache → parallel probe → OS); never 5000."""
+    from sniffer import allocate_port
+    return allocate_port(preferred, preferred + max_tries - 1, host=host)
 
 if __name__ == "__main__":
-    port = find_free_port()
-    threading.Thread(target=open_browser, args=(f"http://127.0.0.1:{port}/",), daemon=True).start()
-    app.run(host="127.0.0.1", port=port, debug=False)
+    import argparse
+    ap = argparse.ArgumentParser(description=APP_NAME)
+    ap.add_argument("command", nargs="?", default="run", choices=["run", "build", "banners", "assets"],
+                    help="run the local ship (default), build the static site, draw OG banners, "
+                         "or fingerprint static assets")
+    ap.add_argument("--out", default=str(ROOT / "site"), help="build: output folder")
+    ap.add_argument("--force", action="store_true", help="build/banners/assets: re-render everything")
+    ap.add_argument("--serve", default="dev", choices=["dev", "production"],
+                    help="run: Flask dev server (default) or a multi-threaded WSGI server")
+    ap.add_argument("--host", default="127.0.0.1", help="run: bind address (local-only by default)")
+    ap.add_argument("--port", type=int, default=0, help="run: fixed port (default: port-hop from 5050)")
+    ap.add_argument("--workers", type=int, default=1, help="production: processes (>1 uses gunicorn)")
+    ap.add_argument("--threads", type=int, default=8, help="production: threads per worker")
+    ap.add_argument("--keepalive", type=int, default=5, help="production: keep-alive seconds")
+    ap.add_argument("--profile-startup", action="store_true",
+                    help="print an import/init timing breakdown and exit")
+    args = ap.parse_args()
+    if args.profile_startup:
+        init_runtime(banners=False)
+        get_app()
+        templates()
+        with _phase("OG banner index"):
+            OG.refresh()
+        print(startup_report())
+        raise SystemExit(0)
+    # gunicorn forks its workers from this process: each starts banners on its first request.
+    prefork = args.serve == "production" and args.workers > 1
+    init_runtime(banners=args.command == "run" and not prefork)
+    if args.command == "build":
+        from exporter import build_site
+        ensure_assets()
+        build_site(sys.modules[__name__], Path(args.out), force=args.force)
+        raise SystemExit(0)
+    if args.command == "assets":
+        print(ensure_assets(force=args.force))
+        raise SystemExit(0)
+    if args.command == "banners":
+        from banners import build_banners
+        print(build_banners(load_state().brand, ROOMS.items(), OG_DIR, force=args.force)
+              or "Pillow not installed — skipped.")
+        raise SystemExit(0)
+
+    if args.port == 5000:
+        ap.error("port 5000 is off-limits (Suno) — pick another or let it hop.")
+    if args.serve == "production":
+        from jumper import serve_production
+        LIVE_HOST = args.host  # live streams get their own selector-driven server, started per process
+        serve_production(get_app(), host=args.host, port=args.port or find_free_port(host=args.host),
+                         workers=args.workers, threads=args.threads, keepalive=args.keepalive)
+        raise SystemExit(0)
+
+    # Dev: the browser and the healer fire on the server's "listening" event.
+    from jumper import port_hop, open_when_ready
+    from healer import Healer
+    handle = port_hop(get_app(), args.port, host=args.host)
+    open_when_ready(handle)
+    handle.on_ready(lambda h: Healer(h.url).start())
+    print(f" * {APP_NAME} on {handle.url}/")
+    handle.serve_until_stopped()
@@ -0,0 +1,209 @@
+# assets.py — fingerprinted static assets. Each source gets a content-hashed
+# copy in static/dist (name.<hash>.ext, safe to cache forever) plus .gz/.br
+# siblings, and a manifest the app templates read. sw.js precaches what the
+# hand-written pages at the root actually link, as they link it. Unchanged
+# sources are skipped. Brotli is optional (pip install brotli).
+#
+#   python app.py assets [--force]      (or: python assets.py)
+import gzip, hashlib, json, os, re, sys
+from pathlib import Path
+from statestore import write_atomic
+try:
+    import brotli
+except ImportError:
+    brotli = None  # gzip alone still helps
+
+ROOT = Path(__file__).parent.resolve()
+DIST = ROOT / "static" / "dist"
+MANIFEST = "manifest.json"
+# Only files a page links through AssetManifest.url(); a copy nobody requests is just weight.
+SOURCES = (
+    "static/ship.css",  # the Flask pages' stylesheet
+)
+MIN_COMPRESS = 256  # bytes; below this a variant isn't worth a file
+SW_FILE = ROOT / "sw.js"
+SW_CORE = ("./", "./index.html", "./offline.html")
+_SW_BLOCK = re.compile(r"// BEGIN ASSETS.*?// END ASSETS\n", re.S)
+_LINK = re.compile(r"""<(?:link|script|img)\b[^>]*?\b(?:href|src)=["']([^"'#?]+)["']""", re.I)
+
+def _variants(data: bytes) -> dict:
+    """{".gz": bytes, ".br": bytes} — only the ones that actually shrink the file."""
+    out = {}
+    if len(data) < MIN_COMPRESS:
+        return out
+    gz = gzip.compress(data, compresslevel=9, mtime=0)  # mtime=0: same input, same bytes
+    if len(gz) < len(data):
+        out[".gz"] = gz
+    if brotli is not None:
+        br = brotli.compress(data, quality=11)
+        if len(br) < len(data):
+            out[".br"] = br
+    return out
+
+ENCODINGS = {".br": "br", ".gz": "gzip"}
+
+def build_assets(root: Path = ROOT, dist: Path = DIST, sources=SOURCES, force=False, sw_file=SW_FILE):
+    """
+    Fingerprint every source into `dist`, write the manifest and refresh
+    sw.js's precache block. Files of the build before this one stay (listed
+    under "previous") so pages and service workers still holding the old
+    URLs keep working for one more generation; older files are dropped.
+    Returns {"built": [...], "skipped": n, "removed": [...]}.
+    """
+    root, dist = Path(root), Path(dist)
+    dist.mkdir(parents=True, exist_ok=True)
+    try:
+        old_manifest = json.loads((dist / MANIFEST).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        old_manifest = {}
+    old = old_manifest.get("assets", {})
+
+    assets, built, skipped = {}, [], 0
+    for rel in sources:
+        src = root / rel
+        try:
+            data = src.read_bytes()
+        except OSError:
+            print(f"[assets] missing {rel}; skipped", file=sys.stderr)
+            continue
+        digest = hashlib.sha256(data).hexdigest()
+        name = f"{src.stem}.{digest[:10]}{src.suffix}"
+        prev = old.get(rel)
+        # A build without brotli is redone once brotli is around; one with it is kept either way.
+        if (not force and prev and prev.get("sha256") == digest and (prev.get("brotli") or brotli is None)
+                and all((dist / (name + ext)).exists() for ext in ["", *prev.get("variants", [])])):
+            assets[rel] = prev
+            skipped += 1
+            continue
+        write_atomic(dist / name, data, sync_dir=False)
+        variants = _variants(data)
+        for ext, blob in variants.items():
+            write_atomic(dist / (name + ext), blob, sync_dir=False)
+        assets[rel] = {"file": name, "sha256": digest, "size": len(data),
+                       "variants": sorted(variants), "brotli": brotli is not None}
+        built.append(rel)
+
+    current = {a["file"] for a in assets.values()}
+    if current != {a["file"] for a in old.values()}:  # a new generation: the old one steps back
+        previous = {a["file"]: {"file": a["file"], "variants": a.get("variants", [])}
+                    for a in old.values() if a["file"] not in current}
+    else:
+        previous = old_manifest.get("previous", {})
+    keep = {MANIFEST} | {a["file"] + ext for a in [*assets.values(), *previous.values()]
+                         for ext in ["", *a["variants"]]}
+    removed = []
+    for p in dist.iterdir():
+        if p.is_file() and p.name not in keep and not p.name.startswith("."):
+            p.unlink()
+            removed.append(p.name)
+
+    version = hashlib.sha256("".join(sorted(a["sha256"] for a in assets.values())).encode()).hexdigest()[:10]
+    manifest = {"version": version, "assets": assets, "previous": previous}
+    text = json.dumps(manifest, indent=2, sort_keys=True) + "\n"
+    try:
+        same = (dist / MANIFEST).read_text(encoding="utf-8") == text
+    except OSError:
+        same = False
+    if not same:
+        write_atomic(dist / MANIFEST, text)
+    if sw_file is not None:
+        write_sw_precache(Path(sw_file))
+    return {"built": built, "skipped": skipped, "removed": removed}
+
+def linked_files(root: Path) -> list:
+    """
+    Local files the pages next to sw.js load (<link>/<script>/<img>), as
+    root-relative paths. Absolute URLs, pages and missing files are left out.
+    """
+    found = set()
+    for page in sorted(Path(root).glob("*.html")):
+        for ref in _LINK.findall(page.read_text(encoding="utf-8", errors="replace")):
+            if ":" in ref or ref.startswith("/") or ref.endswith(".html"):
+                continue
+            path = (page.parent / ref).resolve()
+            if path.is_file() and path.is_relative_to(Path(root).resolve()):
+                found.add(path.relative_to(Path(root).resolve()).as_posix())
+    return sorted(found)
+
+def write_sw_precache(sw_file: Path):
+    """
+    Rewrite the marked block in sw.js: the precache list is SW_CORE plus
+    linked_files() under the URLs the pages use, and the cache key hashes
+    those files, so editing one (and re-running assets) renews the cache.
+    """
+    try:
+        js = sw_file.read_text(encoding="utf-8")
+    except OSError:
+        return
+    root = sw_file.parent
+    files = linked_files(root)
+    h = hashlib.sha256()
+    for rel in (*SW_CORE[1:], *files):
+        h.update(rel.encode() + b"\0")
+        try:
+            h.update((root / rel).read_bytes())
+        except OSError:
+            pass
+    block = ("// BEGIN ASSETS (written by `python app.py assets`; don't edit by hand)\n"
+             f"const CACHE = 'timmy-rock-{h.hexdigest()[:10]}';\n"
+             "const ASSETS = [\n" + ",\n".join(f"  '{u}'" for u in (*SW_CORE, *(f"./{f}" for f in files)))
+             + "\n];\n// END ASSETS\n")
+    if not _SW_BLOCK.search(js):
+        print(f"[assets] {sw_file.name} has no BEGIN/END ASSETS block; precache list not updated",
+              file=sys.stderr)
+        return
+    new = _SW_BLOCK.sub(lambda m: block, js, count=1)
+    if new != js:
+        write_atomic(sw_file, new)
+
+class AssetManifest:
+    """
+    Read side for the app: url(source) → the fingerprinted URL (or the plain
+    one when no build has run), by_file(name) → manifest entry (current or
+    previous build). current_version() stats manifest.json and re-reads it
+    when it changed, so callers keying caches on it notice a new build.
+    """
+    def __init__(self, dist: Path = DIST):
+        self.dist = Path(dist)
+        self.version = None
+        self._sig = False  # never matches, so the first call loads
+        self._assets = {}
+        self._files = {}
+
+    def _fresh(self):
+        try:
+            st = os.stat(self.dist / MANIFEST)
+            sig = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            sig = None
+        if sig != self._sig:
+            try:
+                m = json.loads((self.dist / MANIFEST).read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                m = {}
+            self._assets = m.get("assets", {})
+            self._files = {**m.get("previous", {}), **{a["file"]: a for a in self._assets.values()}}
+            self.version = m.get("version")
+            self._sig = sig
+        return self._assets
+
+    def current_version(self):
+        self._fresh()
+        return self.version
+
+    def url(self, source: str, prefix: str = "/") -> str:
+        entry = self._fresh().get(source)
+        if entry is None:
+            return prefix + source
+        return f"{prefix}{self.dist.relative_to(ROOT).as_posix()}/{entry['file']}"
+
+    def by_file(self, name: str):
+        self._fresh()
+        return self._files.get(name)
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Fingerprint + precompress static assets.")
+    ap.add_argument("--force", action="store_true")
+    args = ap.parse_args()
+    print(build_assets(force=args.force))
@@ -0,0 +1,148 @@
+# banners.py — batch OG banner pipeline (1200x630, PNG/JPEG/WebP per room).
+# Rooms are drawn across a process pool; a room whose inputs (title, brand
+# colors, video ID, renderer version) hash the same as last time is skipped.
+# Needs Pillow; without it every call is a quiet no-op, like before.
+#
+#   python app.py banners [--force]      (or: python banners.py)
+import colorsys, hashlib, io
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from buildcache import BuildManifest
+from statestore import write_atomic
+
+RENDERER_VERSION = 1  # bump when the drawing changes so every banner redraws
+SIZE = (1200, 630)
+MANIFEST = ".banners.json"
+DEFAULT_NAME = "ship_default_1200x630"
+# Facebook takes all three; og:image points at the PNG (see og.py).
+FORMATS = {
+    "png": {"format": "PNG", "optimize": True},
+    "jpg": {"format": "JPEG", "quality": 86, "optimize": True, "progressive": True},
+    "webp": {"format": "WEBP", "quality": 82, "method": 6},
+}
+
+def _rgb(hex_color, fallback):
+    s = str(hex_color or "").lstrip("#")
+    if len(s) == 3:
+        s = "".join(c * 2 for c in s)
+    try:
+        return tuple(int(s[i:i + 2], 16) for i in (0, 2, 4))
+    except ValueError:
+        return fallback
+
+def _accent(video_id, theme):
+    """A second color derived from the video ID, so each room's banner differs."""
+    if not video_id:
+        return theme
+    hue = int(hashlib.md5(video_id.encode("utf-8")).hexdigest()[:4], 16) / 0xFFFF
+    r, g, b = colorsys.hsv_to_rgb(hue, 0.75, 1.0)
+    return (int(r * 255), int(g * 255), int(b * 255))
+
+def banner_job(name, title, brand, video_id=""):
+    """Everything that affects the pixels — and therefore the skip hash. `brand` is a schema.Brand."""
+    return {
+        "name": name,
+        "title": title,
+        "site_title": brand.site_title,
+        "tagline": brand.tagline,
+        "bg": brand.bg,
+        "fg": brand.fg,
+        "theme": brand.theme_color,
+        "video_id": video_id or "",
+    }
+
+# The built-in font lacks typographic punctuation; map it to plain glyphs.
+_PLAIN = str.maketrans({"—": "-", "–": "-", "•": "-", "“": '"', "”": '"', "’": "'", "‘": "'"})
+
+def _font(size):
+    from PIL import ImageFont
+    try:
+        return ImageFont.load_default(size=size)  # Pillow >= 10.1
+    except TypeError:
+        return ImageFont.load_default()
+
+def render_banner(job, out_dir):
+    """Draw one banner and write every format. Runs in a worker process."""
+    from PIL import Image, ImageDraw
+    bg = _rgb(job["bg"], (5, 0, 12))
+    fg = _rgb(job["fg"], (255, 255, 255))
+    theme = _rgb(job["theme"], (255, 59, 209))
+    accent = _accent(job["video_id"], theme)
+
+    w, h = SIZE
+    img = Image.new("RGB", SIZE, bg)  # deep space
+    d = ImageDraw.Draw(img)
+    # diagonal glow bars, blending theme → accent across the width
+    for i in range(0, w + 80, 24):
+        t = i / w
+        color = tuple(int(a + (b - a) * t) for a, b in zip(theme, accent))
+        d.line([(i, 0), (i - 80, h)], fill=color, width=3)
+    d.rectangle([60, 50, w - 60, h - 110], fill=bg)
+    d.rectangle([60, 150, w - 60, 158], fill=accent)
+    d.text((80, 75), job["site_title"].translate(_PLAIN), font=_font(40), fill=theme)
+    d.text((80, 200), job["title"].translate(_PLAIN), font=_font(72), fill=fg)
+    d.text((80, h - 180), job["tagline"].translate(_PLAIN), font=_font(36), fill=fg)
+
+    out_dir = Path(out_dir)
+    written = []
+    for ext, opts in FORMATS.items():
+        dst = out_dir / f'{job["name"]}.{ext}'
+        buf = io.BytesIO()
+        img.save(buf, **opts)
+        write_atomic(dst, buf.getvalue(), sync_dir=False)  # rename → folder mtime changes → OG watcher re-indexes
+        written.append(dst.name)
+    return job["name"], written
+
+def build_banners(brand, rooms, og_dir, workers=None, force=False, include_default=True, pool=None):
+    """
+    Render banners for every room (+ the default) whose inputs changed.
+    `brand` is a schema.Brand, `rooms` an iterable of (room_id, Room) —
+    all of them or just the ones that changed; manifest entries for rooms
+    not passed are kept. `pool`: an executor to draw in (the app keeps one),
+    else a fresh process pool for more than one banner.
+    Returns {"rendered": [names], "skipped": n}, or None without Pillow.
+    """
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        return None  # drop your own images into static/og instead
+    og_dir = Path(og_dir)
+    og_dir.mkdir(parents=True, exist_ok=True)
+    jobs = []
+    if include_default:
+        jobs.append(banner_job(DEFAULT_NAME, brand.site_title or "Bubble World Ship", brand))
+    for room_id, room in rooms:
+        jobs.append(banner_job(f"room{room_id}_1200x630", room.title, brand, room.video_id))
+
+    manifest = BuildManifest(og_dir / MANIFEST, RENDERER_VERSION, force)
+    todo, skipped = [], 0
+    for job in jobs:
+        png = og_dir / f'{job["name"]}.png'
+        if manifest.made_by_hand(job["name"], png) or not manifest.stale(job["name"], job, png):
+            skipped += 1
+        else:
+            todo.append(job)
+
+    rendered = []
+    if pool is not None and todo:
+        rendered = [name for name, _ in pool.map(render_banner, todo, [og_dir] * len(todo))]
+    elif len(todo) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for name, _ in pool.map(render_banner, todo, [og_dir] * len(todo)):
+                rendered.append(name)
+    else:
+        for job in todo:
+            rendered.append(render_banner(job, og_dir)[0])
+
+    manifest.save()  # merged: the CLI and server workers may be drawing at the same time
+    return {"rendered": rendered, "skipped": skipped}
+
+if __name__ == "__main__":
+    import argparse
+    import app as ship
+    ap = argparse.ArgumentParser(description="Render OG banners for every room.")
+    ap.add_argument("--force", action="store_true")
+    ap.add_argument("--workers", type=int, default=None)
+    args = ap.parse_args()
+    print(build_banners(ship.load_state().brand, ship.ROOMS.items(), ship.OG_DIR,
+                        workers=args.workers, force=args.force))
@@ -0,0 +1,314 @@
+# bench.py — benchmarks + load test for the ship's routes and hot helpers.
+# Runs against a throwaway state file (never static/data/state.json), prints
+# JSON (throughput, p50/p95/p99 latency, tracemalloc peak) and compares it
+# with a stored baseline so regressions get flagged.
+#
+#   python bench.py                      # full run → JSON on stdout
+#   python bench.py --quick              # fewer sizes, shorter runs
+#   python bench.py --save-baseline      # store this run as bench-baseline.json
+#   python bench.py --compare            # exit 1 if anything regressed
+import argparse, http.client, json, os, platform, random, shutil, socket, sys, tempfile, threading, time, tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).parent.resolve()
+BASELINE = ROOT / "bench-baseline.json"
+SAMPLE_LINKS = [
+    "https://youtube.com/shorts/BRoTqtY70ZQ?si=50v1ISh-D_dU9THH",
+    "https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=1m30s&fbclid=abc",
+    "https://youtu.be/dQw4w9WgXcQ?t=42",
+    "https://m.youtube.com/watch?feature=share&v=dQw4w9WgXcQ",
+    "dQw4w9WgXcQ",
+    "not a link",
+]
+
+# ------------------------- MEASURE -------------------------
+def summarize(samples, wall):
+    """Latency percentiles (ms) + throughput for a list of per-call seconds."""
+    s = sorted(samples)
+    pick = lambda q: round(s[min(len(s) - 1, int(q * len(s)))] * 1000, 4) if s else None
+    return {
+        "n": len(s),
+        "ops_per_s": round(len(s) / wall, 1) if wall > 0 else None,
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+    }
+
+def measure(fn, min_time=0.5, min_n=20, max_n=200_000, alloc_n=50):
+    """
+    Time fn() one call at a time until `min_time` has passed (at least
+    `min_n` calls), then re-run a few calls under tracemalloc for the
+    allocation peak — separately, so tracing doesn't skew the timings.
+    """
+    fn()  # warm-up: caches, lazy imports, compiled templates
+    samples = []
+    start = time.perf_counter()
+    while len(samples) < max_n:
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+        if len(samples) >= min_n and t0 - start >= min_time:
+            break
+    out = summarize(samples, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        for _ in range(min(alloc_n, len(samples))):
+            fn()
+        out["alloc_peak_kb"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+    return out
+
+# ------------------------- FIXTURES -------------------------
+def make_rooms(rooms: int):
+    """`rooms` Room records, half of them holding a video."""
+    from schema import Room
+    return {str(i): Room("dQw4w9WgXcQ" if i % 2 else "", i % 90, f"Room {i} — Bench")
+            for i in range(1, rooms + 1)}
+
+def use_state(ship, rooms: int):
+    """Point the app at a fresh room store (in the scratch dir) holding `rooms` rooms."""
+    from roomstore import RoomStore
+    ship.ROOMS = RoomStore(ship.DATA_FILE.parent / f"rooms-{rooms}")
+    ship.ROOMS.adopt(make_rooms(rooms))
+    ship.PAGES = ship.PageCache()
+
+# ------------------------- SUITES -------------------------
+def bench_micro(ship, sizes, min_time):
+    from youtube import extract_youtube_id
+    res = {}
+    counter = iter(range(10 ** 9))
+    res["extract_youtube_id.cold"] = measure(
+        lambda: extract_youtube_id(f"{SAMPLE_LINKS[1]}&n={next(counter)}"), min_time)
+    warm = iter(range(10 ** 9))
+    res["extract_youtube_id.warm"] = measure(
+        lambda: extract_youtube_id(SAMPLE_LINKS[next(warm) % len(SAMPLE_LINKS)]), min_time)
+
+    for n in sizes:
+        use_state(ship, n)
+        ids = ship.ROOMS.ids()
+        rnd = random.Random(n)
+        tag = f"[rooms={n}]"
+
+        def og_meta():
+            rid = rnd.choice(ids)
+            title, vid, start, _ = ship.room_meta(rid)
+            ship.build_og_meta(rid, title, vid, start)
+        res[f"build_og_meta{tag}"] = measure(og_meta, min_time)
+        res[f"load_state.cached{tag}"] = measure(ship.load_state, min_time)
+
+        def reload():
+            ship.STATE.invalidate()  # forces parse + validate
+            ship.load_state()
+        res[f"load_state.reload{tag}"] = measure(reload, min_time, max_n=2000)
+
+        state = ship.load_state()
+        def save():
+            ship.save_state(state)
+            ship.STATE.flush()  # include encode + atomic write
+        res[f"save_state{tag}"] = measure(save, min_time, max_n=2000)
+        res[f"rooms.get{tag}"] = measure(lambda: ship.ROOMS.get(rnd.choice(ids)), min_time)
+        res[f"rooms.set_video{tag}"] = measure(
+            lambda: ship.ROOMS.set_videos([(rnd.choice(ids), "dQw4w9WgXcQ", rnd.randrange(90))]),
+            min_time, max_n=2000)
+        res[f"render_home{tag}"] = measure(lambda: ship.render_home(ship.load_state()), min_time, max_n=5000)
+        res[f"render_room{tag}"] = measure(
+            lambda: ship.render_room(ship.load_state(), rnd.choice(ids)), min_time, max_n=5000)
+    return res
+
+def bench_routes(ship, sizes, min_time):
+    """In-process requests through Flask's test client (no sockets)."""
+    client = ship.get_app().test_client()
+    res = {}
+    for n in sizes:
+        use_state(ship, n)
+        ids = ship.ROOMS.ids()
+        rnd = random.Random(n)
+        tag = f"[rooms={n}]"
+        res[f"GET /{tag}"] = measure(lambda: client.get("/"), min_time)
+        res[f"GET /room/<id>{tag}"] = measure(lambda: client.get(f"/room/{rnd.choice(ids)}"), min_time)
+        res[f"POST /api/set_video{tag}"] = measure(lambda: client.post("/api/set_video", json={
+            "room_id": rnd.choice(ids), "raw": rnd.choice(SAMPLE_LINKS[:5])}), min_time, max_n=2000)
+    return res
+
+def _free_port(host):
+    with socket.socket() as s:
+        s.bind((host, 0))
+        return s.getsockname()[1]
+
+def start_server(ship, kind, host="127.0.0.1", threads=16):
+    """Serve the app on a spare port in this process; returns (url, stop)."""
+    if kind == "waitress":
+        from waitress import create_server, wasyncore
+        server = create_server(ship.get_app(), host=host, port=0, threads=threads)
+        loop = threading.Thread(target=server.run, daemon=True)
+        loop.start()
+
+        def stop():
+            # Close the sockets from inside the loop thread; the loop ends once its map is empty.
+            server.trigger.pull_trigger(lambda: wasyncore.close_all(server._map))
+            loop.join(5)
+            server.task_dispatcher.shutdown()
+        return f"http://{host}:{server.effective_port}", stop
+    import logging
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # no per-request log lines
+    from jumper import port_hop
+    handle = port_hop(ship.get_app(), _free_port(host), host=host)
+    return handle.url, handle.shutdown
+
+def load_test(url, method, path_fn, body_fn, concurrency, duration):
+    """
+    `concurrency` threads, one keep-alive connection each, hammering for
+    `duration` seconds. Latencies are per request; errors are non-2xx/3xx
+    answers or broken connections.
+    """
+    host, port = url.split("//", 1)[1].split(":")
+    deadline = time.perf_counter() + duration
+
+    def worker(seed):
+        rnd = random.Random(seed)
+        conn, lat, errors = None, [], 0
+        while time.perf_counter() < deadline:
+            if conn is None:
+                conn = http.client.HTTPConnection(host, int(port), timeout=10)
+            body = body_fn(rnd) if body_fn else None
+            headers = {"Content-Type": "application/json"} if body else {}
+            t0 = time.perf_counter()
+            try:
+                conn.request(method, path_fn(rnd), body=body, headers=headers)
+                resp = conn.getresponse()
+                resp.read()
+                if resp.will_close:
+                    conn.close()
+                    conn = None
+            except Exception:
+                errors += 1
+                conn.close()
+                conn = None
+                continue
+            if resp.status >= 400:
+                errors += 1
+            else:
+                lat.append(time.perf_counter() - t0)
+        if conn is not None:
+            conn.close()
+        return lat, errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        parts = list(pool.map(worker, range(concurrency)))
+    out = summarize([x for lat, _ in parts for x in lat], time.perf_counter() - start)
+    out["errors"] = sum(e for _, e in parts)
+    return out
+
+def bench_load(ship, rooms, concurrency, duration, server):
+    use_state(ship, rooms)
+    ids = ship.ROOMS.ids()
+    url, stop = start_server(ship, server)
+    res = {}
+    try:
+        for c in concurrency:
+            tag = f"[{server},c={c},rooms={rooms}]"
+            res[f"GET /{tag}"] = load_test(url, "GET", lambda r: "/", None, c, duration)
+            res[f"GET /room/<id>{tag}"] = load_test(
+                url, "GET", lambda r: f"/room/{r.choice(ids)}", None, c, duration)
+            res[f"POST /api/set_video{tag}"] = load_test(
+                url, "POST", lambda r: "/api/set_video",
+                lambda r: json.dumps({"room_id": r.choice(ids), "raw": r.choice(SAMPLE_LINKS[:5])}),
+                c, duration)
+    finally:
+        stop()
+    return res
+
+# ------------------------- BASELINE -------------------------
+def compare(results, baseline, threshold):
+    """
+    Flag benchmarks whose p50 grew by more than `threshold` (fraction) —
+    ignoring sub-microsecond wobble — or whose allocation peak grew by more
+    than `threshold` and 64 KB.
+    """
+    flagged = []
+    for suite, benches in results.items():
+        for name, cur in benches.items():
+            old = baseline.get("results", {}).get(suite, {}).get(name)
+            if not old:
+                continue
+            p_old, p_new = old.get("p50_ms"), cur.get("p50_ms")
+            if p_old and p_new and p_new > p_old * (1 + threshold) and p_new - p_old > 0.001:
+                flagged.append(f"{suite}:{name} p50 {p_old} → {p_new} ms (+{(p_new / p_old - 1) * 100:.0f}%)")
+            a_old, a_new = old.get("alloc_peak_kb"), cur.get("alloc_peak_kb")
+            if a_old is not None and a_new is not None and a_new > a_old * (1 + threshold) and a_new - a_old > 64:
+                flagged.append(f"{suite}:{name} alloc peak {a_old} → {a_new} KB")
+    return flagged
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark the ship's routes and hot helpers.")
+    ap.add_argument("--quick", action="store_true", help="sizes 10,1000; short runs")
+    ap.add_argument("--sizes", default=None, help="room counts, e.g. 10,100,1000,10000")
+    ap.add_argument("--suites", default="micro,routes,load", help="any of micro,routes,load")
+    ap.add_argument("--min-time", type=float, default=None, help="seconds per micro/route benchmark")
+    ap.add_argument("--concurrency", default="1,8,32", help="load: client threads per run")
+    ap.add_argument("--duration", type=float, default=None, help="load: seconds per run")
+    ap.add_argument("--load-rooms", type=int, default=100, help="load: rooms in the served state")
+    ap.add_argument("--server", default="dev", choices=["dev", "waitress"], help="load: server to drive")
+    ap.add_argument("--out", default=None, help="also write the JSON here")
+    ap.add_argument("--baseline", default=str(BASELINE))
+    ap.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    ap.add_argument("--compare", action="store_true", help="exit 1 when something regressed")
+    ap.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+    args = ap.parse_args(argv)
+
+    sizes = [int(x) for x in (args.sizes or ("10,1000" if args.quick else "10,100,1000,10000")).split(",")]
+    min_time = args.min_time or (0.1 if args.quick else 0.5)
+    duration = args.duration or (1.0 if args.quick else 3.0)
+    suites = set(args.suites.split(","))
+
+    scratch = Path(tempfile.mkdtemp(prefix="ship-bench-"))
+    os.environ["SHIP_STATE_FILE"] = str(scratch / "state.json")
+    os.environ["SHIP_BANNERS"] = "0"
+    import app as ship
+    ship.init_runtime()
+    results = {}
+    try:
+        if "micro" in suites:
+            results["micro"] = bench_micro(ship, sizes, min_time)
+        if "routes" in suites:
+            results["routes"] = bench_routes(ship, sizes, min_time)
+        if "load" in suites:
+            results["load"] = bench_load(ship, args.load_rooms,
+                                         [int(c) for c in args.concurrency.split(",")],
+                                         duration, args.server)
+    finally:
+        ship.STATE.flush()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    report = {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(),
+                 "cpus": os.cpu_count(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                 "sizes": sizes, "quick": args.quick},
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    if args.save_baseline:
+        Path(args.baseline).write_text(text + "\n", encoding="utf-8")
+        print(f"baseline → {args.baseline}", file=sys.stderr)
+        return 0
+
+    try:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        print("no baseline yet (run with --save-baseline)", file=sys.stderr)
+        return 0
+    flagged = compare(results, baseline, args.threshold)
+    for line in flagged:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    if not flagged:
+        print(f"no regressions vs {args.baseline} (threshold {args.threshold:.0%})", file=sys.stderr)
+    return 1 if flagged and args.compare else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,57 @@
+# buildcache.py — skip-by-hash bookkeeping shared by the generators (OG
+# banners, the static site export, share pages). Each keeps a dot-file
+# manifest in its output folder, {output name: hash of everything that
+# shaped it}; an output whose inputs hash the same and still exists is
+# skipped, and one that exists without an entry was made by hand.
+import hashlib, json
+from pathlib import Path
+from statestore import write_atomic
+
+def _plain(o):
+    # Callables count by name: their repr carries an address that changes every run.
+    return getattr(o, "__qualname__", repr(o)) if callable(o) else str(o)
+
+def job_hash(job) -> str:
+    return hashlib.sha256(json.dumps(job, sort_keys=True, default=_plain).encode("utf-8")).hexdigest()
+
+def read_manifest(path) -> dict:
+    try:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+class BuildManifest:
+    """
+    One generator's manifest for one run. `renderer` is the generator's
+    RENDERER_VERSION, folded into every hash, so bumping it rebuilds all it
+    owns; `force` rebuilds them without touching hand-made files.
+    """
+    def __init__(self, path, renderer: int = 0, force: bool = False):
+        self.path = Path(path)
+        self.renderer = renderer
+        self.force = force
+        self.old = read_manifest(self.path)
+        self.new = {}
+
+    def made_by_hand(self, name, output) -> bool:
+        """An output that exists with no entry from an earlier run: never overwrite it."""
+        return name not in self.old and Path(output).exists()
+
+    def stale(self, name, job, output) -> bool:
+        """Record `name` with this job's hash; True when the output must be (re)built."""
+        digest = self.new[name] = job_hash({**job, "renderer": self.renderer})
+        return self.force or self.old.get(name) != digest or not Path(output).exists()
+
+    def gone(self) -> list:
+        """Names an earlier run built that this one didn't see."""
+        return sorted(self.old.keys() - self.new.keys())
+
+    def save(self, merge: bool = True):
+        """
+        merge: re-read the file just before writing and update it with this
+        run's entries — other runs (the CLI, server workers, a partial batch)
+        own the rest. Otherwise the manifest becomes exactly this run's.
+        """
+        manifest = {**read_manifest(self.path), **self.new} if merge else self.new
+        write_atomic(self.path, json.dumps(manifest, indent=2, sort_keys=True))
@@ -0,0 +1,98 @@
+# exporter.py — pre-render the dock + every room (with OG tags) into a static
+# tree for GitHub Pages, so the public never has to hit the Flask server.
+# Incremental: a page is re-rendered only when its template or inputs change.
+#
+#   python app.py build [--out site] [--force]
+import shutil
+from pathlib import Path
+from buildcache import BuildManifest, job_hash
+from statestore import write_atomic
+
+MANIFEST = ".build-manifest.json"
+
+def minify_html(html: str) -> str:
+    """
+    Trim every line and drop blank ones. Line-safe on purpose: the room
+    script uses // comments, so lines are never joined.
+    """
+    return "\n".join(line.strip() for line in html.splitlines() if line.strip()) + "\n"
+
+def _mirror(src_dir: Path, dst_dir: Path, skip=()) -> int:
+    """Copy new/changed files from src_dir into dst_dir (size + mtime compare)."""
+    copied = 0
+    if not src_dir.is_dir():
+        return 0
+    for src in src_dir.iterdir():
+        if not src.is_file() or src.name.startswith(".") or src.suffix in skip:
+            continue
+        dst = dst_dir / src.name
+        st = src.stat()
+        if dst.exists():
+            dt = dst.stat()
+            if dt.st_size == st.st_size and dt.st_mtime_ns == st.st_mtime_ns:
+                continue
+        dst_dir.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(src, dst)
+        copied += 1
+    return copied
+
+def build_site(ship, out: Path, force: bool = False) -> dict:
+    """
+    Render into `out`:
+      index.html               — the dock's first page (links are relative)
+      page/<n>/index.html      — further dock pages
+      room/<id>/index.html     — one per room, OG URLs absolute via PUBLIC_BASE_URL
+      static/og/*              — banner images the OG tags point at
+      static/dist/*            — the fingerprinted stylesheet(s) the pages link
+    `ship` is the app module (passed in so `python app.py build` doesn't
+    import app.py a second time).
+    """
+    out = Path(out)
+    out.mkdir(parents=True, exist_ok=True)
+    manifest = BuildManifest(out / MANIFEST, force=force)
+
+    state = ship.load_state()
+    home_tpl = job_hash(ship.HOME_TPL)
+    room_tpl = job_hash(ship.ROOM_TPL)
+
+    jobs = []
+    for n in range(1, ship.ROOMS.pages(ship.DOCK_PAGE_SIZE) + 1):
+        up = "" if n == 1 else "../../"  # page/<n>/ sits two levels below the root
+        ctx = ship.home_context(state, n, room_href=up + "room/{}/", root=up,
+                                page_href=lambda m, up=up: (up or "./") if m == 1 else f"{up}page/{m}/")
+        jobs.append(("index.html" if n == 1 else f"page/{n}/index.html", ship.HOME_T, home_tpl, ctx))
+    for room_id in ship.ROOMS.ids():  # numeric order
+        ctx = ship.room_context(state, room_id, dock_url="../../", static_export=True, root="../../")
+        jobs.append((f"room/{room_id}/index.html", ship.ROOM_T, room_tpl, ctx))
+
+    rendered, skipped = [], 0
+    for rel, tpl, tpl_hash, ctx in jobs:
+        if not manifest.stale(rel, {"template": tpl_hash, "context": ctx}, out / rel):
+            skipped += 1
+            continue
+        write_atomic(out / rel, minify_html(tpl.render(**ctx)), sync_dir=False)
+        rendered.append(rel)
+
+    for rel in manifest.gone():  # rooms that left the ship
+        (out / rel).unlink(missing_ok=True)
+
+    images = _mirror(ship.OG_DIR, out / "static" / "og")  # so og:image URLs resolve on Pages
+    # Pages compresses on its own; the .br/.gz siblings are only for the Flask server.
+    _mirror(ship.ASSETS.dist, out / "static" / "dist", skip=(".br", ".gz"))
+    manifest.save(merge=False)
+
+    for rel in rendered:
+        print(f"built  {rel}")
+    print(f"site → {out}  ({len(rendered)} rendered, {skipped} unchanged, {images} images copied)")
+    return {"rendered": rendered, "skipped": skipped, "images": images}
+
+if __name__ == "__main__":
+    import argparse
+    import app as ship
+    ap = argparse.ArgumentParser(description="Pre-render the ship into a static site.")
+    ap.add_argument("--out", default=str(ship.ROOT / "site"))
+    ap.add_argument("--force", action="store_true")
+    args = ap.parse_args()
+    ship.init_runtime(banners=False)
+    ship.ensure_assets()
+    build_site(ship, Path(args.out), force=args.force)
@@ -1,53 +1,178 @@
 # healer.py — gentle health monitor with adaptive backoff (no killing port 5000).
-import threading, time
+# Many Healers share one Monitor thread; each keeps one keep-alive connection.
+import heapq, http.client, itertools, random, threading, time
+from collections import deque
+from urllib.parse import urlsplit
 try:
     import requests
 except Exception:
-    requests = None  # We'll degrade gracefully without it.
+    requests = None  # stdlib http.client does the job without it.
+
+class _Probe:
+    """One reusable keep-alive connection to the health URL."""
+    def __init__(self, url: str, timeout: float):
+        self.url = url
+        self.timeout = timeout
+        self._session = requests.Session() if requests is not None else None
+        self._conn = None
+
+    def __call__(self) -> bool:
+        if self._session is not None:
+            return self._session.get(self.url, timeout=self.timeout).status_code == 200
+        parts = urlsplit(self.url)
+        if self._conn is None:
+            self._conn = http.client.HTTPConnection(parts.hostname, parts.port or 80,
+                                                    timeout=self.timeout)
+        try:
+            self._conn.request("GET", parts.path or "/")
+            resp = self._conn.getresponse()
+            resp.read()
+            if resp.will_close:
+                self.close()
+            return resp.status == 200
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        if self._session is not None:
+            self._session.close()
+            self._session = requests.Session()
+
+class Monitor:
+    """
+    One daemon thread running every registered Healer on its own schedule
+    (a heap of due times), so five apps cost one thread, not five.
+    """
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()
+        self._cv = threading.Condition()
+        self._thread = None
+
+    def add(self, healer, delay: float = 0.0):
+        with self._cv:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), healer))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="healer", daemon=True)
+                self._thread.start()
+            self._cv.notify()
+
+    def _loop(self):
+        while True:
+            with self._cv:
+                while not self._heap:
+                    self._cv.wait()
+                due, _, healer = self._heap[0]
+                wait = due - time.monotonic()
+                if wait > 0:
+                    self._cv.wait(wait)
+                    continue
+                heapq.heappop(self._heap)
+            if healer.stopped:
+                continue
+            healer.check()
+            if not healer.stopped:
+                self.add(healer, healer.delay)
+
+DEFAULT_MONITOR = Monitor()
 
 class Healer:
     """
     Pings /health and, if it looks stuck, re-pokes the browser using a
     growing delay. We DON'T kill processes or touch 5000—Suno is sacred.
+
+    Schedule: a healthy app is checked less and less often (up to
+    `idle_delay`); the first failure re-checks fast to confirm, then backs
+    off to `max_delay` so we don't thrash an app that's starting up.
+    Every delay gets ±10% jitter. Recovery hooks fire once per outage,
+    when `fail_threshold` checks in a row have failed.
     """
-    def __init__(self, base_url: str, ping_path: str = "/health"):
+    def __init__(self, base_url: str, ping_path: str = "/health", monitor: Monitor = None,
+                 timeout: float = 1.5, window: int = 64, fail_threshold: int = 3,
+                 min_delay: float = 1.0, idle_delay: float = 10.0, max_delay: float = 20.0):
         self.url = base_url.rstrip("/") + ping_path
-        self._stop = threading.Event()
+        self.monitor = monitor or DEFAULT_MONITOR
+        self.fail_threshold = fail_threshold
+        self.min_delay, self.idle_delay, self.max_delay = min_delay, idle_delay, max_delay
+        self.delay = 2.0  # start calm
+        self.stopped = False
+        self._probe = _Probe(self.url, timeout)
+        self._latencies = deque(maxlen=window)  # ms of successful checks
+        self._hooks = []
+        self._lock = threading.Lock()
+        self.healthy = None
+        self.ok_streak = 0
+        self.consecutive_failures = 0
+        self.checks = 0
+        self.last_latency_ms = None
+        self.last_checked = None
 
     def start(self):
-        threading.Thread(target=self._loop, daemon=True).start()
+        self.stopped = False
+        self.monitor.add(self)
 
     def stop(self):
-        self._stop.set()
+        self.stopped = True
+        self._probe.close()
 
-    def _loop(self):
-        if requests is None:
-            # No requests module; do a simple sleep loop so we don't spin.
-            for _ in range(120):
-                if self._stop.is_set():
-                    return
-                time.sleep(1.0)
-            return
-
-        # Adaptive cadence: quick when healthy, slower when flaky.
-        ok_streak = 0
-        delay = 2.0     # start calm
-        max_delay = 20  # cap so it never feels dead
-
-        while not self._stop.is_set():
-            try:
-                r = requests.get(self.url, timeout=1.5)
-                healthy = (r.status_code == 200)
-            except Exception:
-                healthy = False
+    def add_recovery_hook(self, fn):
+        """fn(healer, status_dict) runs when the app has failed fail_threshold times in a row."""
+        self._hooks.append(fn)
+
+    def check(self) -> bool:
+        t0 = time.perf_counter()
+        try:
+            healthy = self._probe()
+        except Exception:
+            healthy = False
+        ms = (time.perf_counter() - t0) * 1000
 
+        with self._lock:
+            self.checks += 1
+            self.last_checked = time.time()
+            self.last_latency_ms = ms
+            self.healthy = healthy
             if healthy:
-                ok_streak += 1
-                # reward health: shorten checks a bit
-                delay = max(1.0, delay * 0.7)
+                self._latencies.append(ms)
+                self.ok_streak += 1
+                self.consecutive_failures = 0
+                # reward health: check less often
+                self.delay = min(self.idle_delay, max(self.min_delay, self.delay * 1.25))
             else:
-                ok_streak = 0
-                # back off so we don't thrash an app starting up
-                delay = min(max_delay, delay * 1.6)
+                self.ok_streak = 0
+                self.consecutive_failures += 1
+                # confirm fast, then back off so we don't thrash
+                self.delay = (self.min_delay if self.consecutive_failures == 1
+                              else min(self.max_delay, self.delay * 1.6))
+            self.delay *= random.uniform(0.9, 1.1)
+            fire = not healthy and self.consecutive_failures == self.fail_threshold
+
+        if fire:
+            status = self.status()
+            for hook in self._hooks:
+                try:
+                    hook(self, status)
+                except Exception:
+                    pass
+        return healthy
 
-            time.sleep(delay)
+    def status(self) -> dict:
+        with self._lock:
+            lat = sorted(self._latencies)
+            pick = lambda q: round(lat[min(len(lat) - 1, int(q * len(lat)))], 2) if lat else None
+            return {
+                "url": self.url,
+                "healthy": self.healthy,
+                "checks": self.checks,
+                "ok_streak": self.ok_streak,
+                "consecutive_failures": self.consecutive_failures,
+                "last_latency_ms": None if self.last_latency_ms is None else round(self.last_latency_ms, 2),
+                "p50_ms": pick(0.50),
+                "p95_ms": pick(0.95),
+                "next_check_s": round(self.delay, 2),
+                "last_checked": self.last_checked,
+            }
@@ -1,46 +1,168 @@
-# jumper.py — binds Flask to a safe port and opens Safari with adaptive delay.
-import threading, time, webbrowser, socket
-
-def port_hop(app, port: int):
-    """Run Flask on 127.0.0.1:port in a daemon thread."""
-    def _run():
-        # werkzeug reloader off to avoid double-threads on iPhone
-        app.run(host="127.0.0.1", port=port, debug=False, use_reloader=False)
-    t = threading.Thread(target=_run, daemon=True)
-    t.start()
-    return t
-
-def _tcp_ready(host: str, port: int, timeout_s: float = 0.25) -> bool:
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.settimeout(timeout_s)
+# jumper.py — binds Flask to a safe port and opens Safari the moment it's listening.
+import sys, threading, time, webbrowser, socket, signal
+from sniffer import FORBIDDEN, allocate_port
+
+class ServerHandle:
+    """
+    What port_hop hands back. `ready` is set once the listening socket is
+    bound and accepting (connections queue in the backlog from then on), so
+    subscribers never race the server. Timings are perf_counter seconds.
+    """
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.ready = threading.Event()
+        self.started_at = time.perf_counter()
+        self.ready_at = None
+        self.first_request_at = None
+        self.server = None
+        self.thread = None
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def on_ready(self, fn):
+        """Call fn(handle) once listening (right away if it already is)."""
+        with self._lock:
+            if not self.ready.is_set():
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    def _fire(self):
+        with self._lock:
+            self.ready_at = time.perf_counter()
+            self.ready.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            try:
+                fn(self)
+            except Exception as e:
+                print(f"[jumper] on_ready hook failed: {e}", file=sys.stderr)
+
+    def timings(self) -> dict:
+        ms = lambda t: None if t is None else round((t - self.started_at) * 1000, 2)
+        return {"listening_ms": ms(self.ready_at), "first_request_ms": ms(self.first_request_at)}
+
+    def wait(self, timeout=None) -> bool:
+        return self.ready.wait(timeout)
+
+    def serve_until_stopped(self):
+        """Block the caller (Ctrl-C friendly) while the server thread runs."""
         try:
-            s.connect((host, port))
-            return True
+            while self.thread.is_alive():
+                self.thread.join(0.5)
+        except KeyboardInterrupt:
+            self.shutdown()
+
+    def shutdown(self):
+        if self.server is not None:
+            self.server.shutdown()
+
+def _listen(host: str, port: int = 0) -> socket.socket:
+    """Bind + listen now, so the socket we hand to the server is the one we probed."""
+    for _ in range(5):
+        p = port or allocate_port(host=host)  # probe the interface we're about to bind
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            s.bind((host, p))
+            s.listen(128)
+            return s
         except OSError:
-            return False
+            s.close()
+            if port:
+                raise  # caller asked for this exact port
+    raise RuntimeError("No open port found for local run.")
 
-def open_when_ready(url: str, host: str, port: int):
+def port_hop(app, port: int = 0, host: str = "127.0.0.1") -> ServerHandle:
     """
-    Open the browser once the socket accepts. Adaptive delay:
-    - Try fast for ~1.5s, then ease into small backoff up to ~2s sleeps.
+    Run Flask on host:port (port-hop when 0) in a daemon thread.
+    Returns a ServerHandle whose `ready` event fires once it's listening.
     """
-    def _watch():
-        # Phase 1: quick spins (~1.5s total)
-        for _ in range(15):
-            if _tcp_ready(host, port, 0.2):
-                webbrowser.open(url)
-                return
-            time.sleep(0.1)
+    if port in FORBIDDEN:
+        raise RuntimeError(f"Port {port} is reserved — pick another.")
+    from werkzeug.serving import make_server
 
-        # Phase 2: gentle backoff (0.25 → 2.0s, cap 20 tries)
-        delay = 0.25
-        for _ in range(20):
-            if _tcp_ready(host, port, min(0.3, delay)):
-                webbrowser.open(url)
-                return
-            time.sleep(delay)
-            delay = min(delay * 1.6, 2.0)
+    sock = _listen(host, port)
+    handle = ServerHandle(host, sock.getsockname()[1])
+
+    def _wsgi(environ, start_response):
+        if handle.first_request_at is None:
+            handle.first_request_at = time.perf_counter()
+            t = handle.timings()
+            print(f"[jumper] listening at {t['listening_ms']} ms, first request at "
+                  f"{t['first_request_ms']} ms", file=sys.stderr)
+        return app(environ, start_response)
+
+    # The server adopts our already-listening socket (fd) instead of re-binding.
+    # werkzeug reloader off to avoid double-threads on iPhone
+    handle.server = make_server(host, handle.port, _wsgi, threaded=True, fd=sock.fileno())
+    sock.close()  # the server holds its own dup of the fd
+    handle.thread = threading.Thread(target=handle.server.serve_forever, daemon=True)
+    handle.thread.start()
+    handle._fire()
+    return handle
+
+def open_when_ready(handle: ServerHandle, path: str = "/"):
+    """Open the browser as soon as the handle reports it's listening."""
+    handle.on_ready(lambda h: threading.Thread(
+        target=webbrowser.open, args=(h.url + path,), daemon=True).start())
+
+def serve_production(app, host: str = "127.0.0.1", port: int = 5050,
+                     workers: int = 1, threads: int = 8, keepalive: int = 5,
+                     graceful_timeout: int = 10):
+    """
+    Run `app` under a real WSGI server instead of Werkzeug's dev server.
+    - workers > 1 → gunicorn (pre-fork, gthread workers; POSIX only)
+    - otherwise   → waitress (one process, `threads` worker threads)
+    Blocks until SIGINT/SIGTERM, then drains in-flight requests and exits.
+    Workers share state.json only through the file, so keep workers=1 when
+    rooms are edited heavily; threads scale reads fine.
+    """
+    if port in FORBIDDEN:
+        raise RuntimeError(f"Port {port} is reserved — pick another.")
+
+    if workers > 1:
+        try:
+            from gunicorn.app.base import BaseApplication
+        except ImportError:
+            raise RuntimeError("--workers > 1 needs gunicorn (pip install gunicorn).")
+
+        class _Ship(BaseApplication):
+            def load_config(self):
+                for k, v in {
+                    "bind": f"{host}:{port}",
+                    "workers": workers,
+                    "threads": threads,
+                    "worker_class": "gthread",
+                    "keepalive": keepalive,
+                    "graceful_timeout": graceful_timeout,
+                }.items():
+                    self.cfg.set(k, v)
+
+            def load(self):
+                return app
+
+        _Ship().run()
+        return
+
+    try:
+        from waitress import create_server
+    except ImportError:
+        raise RuntimeError("--serve production needs waitress (pip install waitress).")
+    server = create_server(app, host=host, port=port, threads=threads,
+                           channel_timeout=max(keepalive, 1))
 
-        # Last ping—if still not up, just open anyway (Flask may finish a moment later)
-        webbrowser.open(url)
-    threading.Thread(target=_watch, daemon=True).start()
+    def _stop(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, _stop)
+    print(f"Serving on http://{host}:{port}/ (waitress, {threads} threads)")
+    try:
+        server.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()  # waits up to 5s for running tasks
@@ -0,0 +1,87 @@
+# metrics.py — tiny Prometheus-text metrics (counters + histograms), no deps.
+import bisect, threading, time
+
+# Seconds; tuned for a local app where most hits are cache lookups.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+def _esc(v):
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_esc(v)}"' for n, v in zip(names, values)) + "}"
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{_labels(self.label_names, k)} {v}" for k, v in items]
+        return lines
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [0] * (len(self.buckets) + 2)
+            s[i] += 1
+            s[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        names = self.label_names + ("le",)
+        for k, s in items:
+            running = 0
+            for bound, n in zip(self.buckets + ("+Inf",), s[:-1]):
+                running += n
+                lines.append(f"{self.name}_bucket{_labels(names, k + (bound,))} {running}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, k)} {s[-1]:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, k)} {running}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []  # callables returning extra exposition lines at scrape time
+        self.started = time.time()
+
+    def counter(self, *a, **kw):
+        m = Counter(*a, **kw)
+        self.metrics.append(m)
+        return m
+
+    def histogram(self, *a, **kw):
+        m = Histogram(*a, **kw)
+        self.metrics.append(m)
+        return m
+
+    def render(self) -> str:
+        lines = []
+        for m in self.metrics:
+            lines += m.render()
+        for collect in self.collectors:
+            lines += collect()
+        return "\n".join(lines) + "\n"
+
+def gauge_lines(name, help, value, kind="gauge"):
+    return [f"# HELP {name} {help}", f"# TYPE {name} {kind}", f"{name} {value}"]
@@ -0,0 +1,160 @@
+# og.py — Open Graph registry: banner index + ready-made tag sets per room.
+# static/og is scanned on first use and re-scanned only when a polling
+# watcher sees the folder change, so room pages do zero filesystem calls.
+# A re-scan only re-hashes banners whose mtime or size moved.
+import hashlib, os, threading, time
+from pathlib import Path
+
+IMAGE_TYPES = {".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".webp": "image/webp"}
+# Which variant og:image points at when a room has several (FB likes PNG/JPEG best).
+PREFERENCE = (".png", ".jpg", ".jpeg", ".webp")
+DEFAULT_NAME = "ship_default_1200x630.png"
+
+def og_tags(url: str, title: str, description: str, image: dict, video_url: str = "") -> dict:
+    """The OG dict every ship page carries; `image` is an image_for() entry."""
+    og = {
+        "og:url": url,
+        "og:title": title,
+        "og:description": description,
+        "og:image": image["url"],
+        "og:image:type": image["type"],
+        "og:image:width": "1200",
+        "og:image:height": "630",
+        "og:type": "website"
+    }
+    if video_url:
+        og["og:video:url"] = video_url
+    return og
+
+def _content_hash(path: Path) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()[:10]
+
+class OgRegistry:
+    """
+    image_for(room_id) → {"url", "type", "hash"} with a ?v=<content hash>
+    cache-buster, falling back to the default banner. tags(...) returns the
+    full OG dict, memoized until the banners change (`generation` bumps).
+    Callers must not mutate the returned dicts.
+    """
+    def __init__(self, og_dir: Path, base_url: str, description: str, poll_interval: float = 2.0):
+        self.og_dir = Path(og_dir)
+        self.base_url = base_url.rstrip("/")
+        self.description = description
+        self.poll_interval = poll_interval
+        self._generation = 0
+        self._images = None  # indexed on first use
+        self._tags = {}
+        self._sig = None
+        self._digests = {}  # file name → ((st_mtime_ns, st_size), content hash)
+        self._lock = threading.Lock()
+        self._watcher = None
+
+    # ---------------- index ----------------
+    def _dir_sig(self):
+        try:
+            st = os.stat(self.og_dir)
+        except OSError:
+            return None
+        return st.st_mtime_ns
+
+    def _entry(self, name, digest=None):
+        url = f"{self.base_url}/static/og/{name}"
+        return {"url": f"{url}?v={digest}" if digest else url,
+                "type": IMAGE_TYPES.get(Path(name).suffix.lower(), "image/png"),
+                "hash": digest}
+
+    def refresh(self):
+        """
+        Re-index the folder: one listing, plus a hash for each banner that is
+        new or whose mtime/size changed. `generation` only moves when some
+        room's image URL actually did.
+        """
+        sig = self._dir_sig()
+        found = {}
+        if sig is not None:
+            for entry in os.scandir(self.og_dir):
+                p = Path(entry.name)
+                ext = p.suffix.lower()
+                if not entry.is_file() or ext not in IMAGE_TYPES:
+                    continue
+                if entry.name == DEFAULT_NAME:
+                    key = "default"
+                elif p.stem.startswith("room") and p.stem.endswith("_1200x630"):
+                    key = p.stem[len("room"):-len("_1200x630")]
+                else:
+                    continue
+                rank = PREFERENCE.index(ext)
+                if key not in found or rank < found[key][0]:
+                    found[key] = (rank, entry)
+        digests, images = {}, {}
+        for key, (_, entry) in found.items():
+            try:
+                st = entry.stat()
+                stamp = (st.st_mtime_ns, st.st_size)
+                known = self._digests.get(entry.name)
+                digest = known[1] if known and known[0] == stamp else _content_hash(Path(entry.path))
+            except OSError:
+                continue  # removed mid-scan; the watcher will see the folder change again
+            digests[entry.name] = (stamp, digest)
+            images[key] = self._entry(entry.name, digest)
+        images.setdefault("default", self._entry(DEFAULT_NAME))
+        with self._lock:
+            self._digests = digests
+            self._sig = sig
+            if images != self._images:
+                self._images = images
+                self._tags = {}
+                self._generation += 1
+
+    @property
+    def generation(self) -> int:
+        if self._images is None:
+            self.refresh()
+        return self._generation
+
+    def _index(self) -> dict:
+        images = self._images
+        if images is None:
+            self.refresh()
+            images = self._images
+        return images
+
+    def image_for(self, room_id: str) -> dict:
+        images = self._index()
+        return images.get(str(room_id)) or images["default"]
+
+    def default_image(self) -> dict:
+        """The ship-wide banner, for pages that aren't rooms (share pages)."""
+        return self._index()["default"]
+
+    # ---------------- watcher ----------------
+    def start_watching(self):
+        """Poll the folder's mtime in a daemon thread (stdlib has no inotify)."""
+        with self._lock:
+            if self._watcher is not None:
+                return
+            self._watcher = threading.Thread(target=self._watch, name="og-watch", daemon=True)
+        self._watcher.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            if self._dir_sig() != self._sig:
+                self.refresh()
+
+    # ---------------- tags ----------------
+    def tags(self, room_id: str, room_url: str, title: str, video_url: str = "") -> dict:
+        key = (room_id, room_url, title, video_url)
+        og = self._tags.get(key)
+        if og is not None:
+            return og
+        og = og_tags(room_url, title, self.description, self.image_for(room_id), video_url)
+        with self._lock:
+            if len(self._tags) > 4096:
+                self._tags = {}
+            self._tags[key] = og
+        return og
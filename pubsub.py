@@ -0,0 +1,403 @@
+# pubsub.py — in-process pub/sub behind the live room streams (Server-Sent Events).
+# Publishers never block: every subscriber has a small bounded queue, and one
+# that falls behind loses its oldest events (a room page only needs the newest
+# video anyway). Nothing polls: a subscriber is woken by a publish or by the
+# heartbeat that keeps proxies and dead-peer detection honest.
+#
+# Two ways to serve a stream: stream() is a WSGI body that holds a server
+# thread per listener (fine for the dev server), and StreamServer runs every
+# listener from one selector thread on its own port, so thousands of idle
+# tabs cost sockets, not threads (production).
+import json, selectors, socket, sys, threading, time
+from collections import deque
+from urllib.parse import parse_qs, urlsplit
+
+class Subscription:
+    __slots__ = ("topic", "queue", "dropped", "notify", "_wake")
+
+    def __init__(self, topic, size: int, notify=None):
+        self.topic = topic
+        self.queue = deque(maxlen=size)
+        self.dropped = 0
+        self.notify = notify  # called after each put() instead of waking a waiting thread
+        self._wake = threading.Event()
+
+    def put(self, item):
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1  # deque drops the oldest for us
+        self.queue.append(item)
+        if self.notify is not None:
+            self.notify(self)
+        else:
+            self._wake.set()
+
+    def drain(self) -> list:
+        out = []
+        while self.queue:
+            out.append(self.queue.popleft())
+        return out
+
+    def wait(self, timeout: float) -> list:
+        """Everything queued since the last call; [] after `timeout` quiet seconds."""
+        if not self._wake.wait(timeout):
+            return []
+        self._wake.clear()
+        return self.drain()
+
+class Hub:
+    """
+    Topics are plain strings (room IDs here). publish() fans an event out to
+    the topic's current subscribers and remembers it as the topic's latest,
+    so a client reconnecting with an older Last-Event-ID catches up at once.
+    `limit` caps concurrent subscribers: below the thread count when streams
+    hold threads, below the open-file limit under a StreamServer.
+    """
+    def __init__(self, queue_size: int = 4, limit: int = 1000):
+        self.queue_size = queue_size
+        self.limit = limit
+        self._topics = {}  # topic → set of Subscription
+        self._last = {}  # topic → (event_id, name, data)
+        self._last_id = 0
+        self._lock = threading.Lock()
+        self.subscribers = 0
+        self.published = 0
+
+    def full(self) -> bool:
+        return self.subscribers >= self.limit
+
+    def subscribe(self, topic, last_id=None, notify=None):
+        """A new Subscription, or None when the hub is at its limit."""
+        with self._lock:
+            if self.subscribers >= self.limit:
+                return None
+            sub = Subscription(topic, self.queue_size, notify)
+            self._topics.setdefault(topic, set()).add(sub)
+            self.subscribers += 1
+            latest = self._last.get(topic)
+        if latest is not None and last_id is not None and latest[0] > last_id:
+            sub.put(latest)  # missed it while reconnecting
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            subs = self._topics.get(sub.topic)
+            if subs is not None and sub in subs:
+                subs.discard(sub)
+                self.subscribers -= 1
+                if not subs:
+                    del self._topics[sub.topic]
+
+    def publish(self, topic, name: str, data: dict) -> int:
+        with self._lock:
+            # Millisecond-based ids keep growing across restarts, so Last-Event-ID stays comparable.
+            event_id = self._last_id = max(self._last_id + 1, int(time.time() * 1000))
+            item = (event_id, name, data)
+            self._last[topic] = item
+            subs = list(self._topics.get(topic, ()))
+            self.published += 1
+        for sub in subs:
+            sub.put(item)
+        return event_id
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"subscribers": self.subscribers, "topics": len(self._topics),
+                    "published": self.published, "limit": self.limit}
+
+def sse(event_id, name, data) -> str:
+    return f"id: {event_id}\nevent: {name}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+def stream(hub: Hub, topic, last_id=None, heartbeat: float = 15.0, max_age: float = 300.0,
+           retry_ms: int = 3000):
+    """
+    SSE text chunks for one client. Subscribes on first iteration (so a
+    response that is never sent leaks nothing) and unsubscribes when the
+    client goes away — noticed at the latest on the next heartbeat. Ends
+    after `max_age` seconds; EventSource reconnects on its own and the
+    server thread gets recycled. A full hub gets a long retry, not an error
+    status: EventSource gives up for good on a 503.
+    """
+    sub = hub.subscribe(topic, last_id)
+    if sub is None:
+        yield f"retry: {retry_ms * 10}\n: busy\n\n"
+        return
+    try:
+        yield f"retry: {retry_ms}\n\n"
+        deadline = time.monotonic() + max_age
+        while True:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                return
+            events = sub.wait(min(heartbeat, left))
+            if not events:
+                yield ": ping\n\n"
+                continue
+            for item in events:
+                yield sse(*item)
+    finally:
+        hub.unsubscribe(sub)
+
+# ------------------------- STREAM SERVER -------------------------
+_CORS = "Access-Control-Allow-Origin: *\r\n"
+_STREAM_HEAD = ("HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                "Connection: close\r\nX-Accel-Buffering: no\r\n" + _CORS + "\r\n")
+_PREFLIGHT = ("HTTP/1.1 204 No Content\r\nAccess-Control-Allow-Methods: GET\r\n"
+              "Access-Control-Allow-Headers: Last-Event-ID, Cache-Control\r\n"
+              "Access-Control-Max-Age: 86400\r\nConnection: close\r\n" + _CORS + "\r\n")
+MAX_HEAD = 8192  # request line + headers
+MAX_BACKLOG = 65536  # unsent bytes before a client counts as stuck and is dropped
+
+def _plain(status: str) -> str:
+    return f"HTTP/1.1 {status}\r\nContent-Length: 0\r\nConnection: close\r\n{_CORS}\r\n"
+
+def _raise_nofile() -> int:
+    """Lift the soft open-file limit to the hard one; returns the limit now in force (0 if unknown)."""
+    try:
+        import resource
+    except ImportError:
+        return 0
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard != resource.RLIM_INFINITY and soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+            soft = hard
+        except (ValueError, OSError):
+            pass
+    return soft if soft != resource.RLIM_INFINITY else 0
+
+class _Client:
+    __slots__ = ("sock", "inbuf", "out", "sub", "closing", "writing", "head_by", "ends_at", "ping_at")
+
+    def __init__(self, sock, now, head_timeout):
+        self.sock = sock
+        self.inbuf = bytearray()
+        self.out = bytearray()
+        self.sub = None  # set once the request is in and the stream has started
+        self.closing = False  # close as soon as `out` is flushed
+        self.writing = False  # registered for EVENT_WRITE
+        self.head_by = now + head_timeout
+        self.ends_at = self.ping_at = 0.0
+
+class StreamServer:
+    """
+    Serves SSE streams from one selector thread on its own port: a listener
+    costs a socket and a Subscription, never a thread. `topic_for(path)`
+    maps a request path to a Hub topic (None → 404). Responses are
+    Connection: close streams with CORS open, since pages reach them by a
+    redirect from the app's port; Last-Event-ID comes from the header or a
+    `last_event_id` query parameter. Heartbeats, `max_age` and a stuck
+    client's backlog are all handled on the same thread.
+    """
+    def __init__(self, hub: Hub, topic_for, host: str = "127.0.0.1", port: int = 0,
+                 heartbeat: float = 15.0, max_age: float = 300.0, retry_ms: int = 3000,
+                 head_timeout: float = 10.0):
+        self.hub = hub
+        self.topic_for = topic_for
+        self.host = host
+        self.port = port
+        self.heartbeat = heartbeat
+        self.max_age = max_age
+        self.retry_ms = retry_ms
+        self.head_timeout = head_timeout
+        self.capacity = 0  # listeners the open-file limit allows; set by start()
+        self._sel = selectors.DefaultSelector()
+        self._clients = set()
+        self._ready = deque()  # clients with new events, appended by publisher threads
+        self._waker_r, self._waker_w = socket.socketpair()
+        self._thread = None
+        self._stopping = False
+
+    # ---------------- lifecycle ----------------
+    def start(self):
+        family = socket.AF_INET6 if ":" in self.host else socket.AF_INET
+        self._listener = socket.socket(family, socket.SOCK_STREAM)
+        self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind((self.host, self.port))
+        self._listener.listen(1024)
+        self._listener.setblocking(False)
+        self.port = self._listener.getsockname()[1]
+        nofile = _raise_nofile()
+        self.capacity = max(1, nofile - 256) if nofile else 10000  # leave room for pages, files, state
+        for s in (self._waker_r, self._waker_w):
+            s.setblocking(False)
+        self._sel.register(self._listener, selectors.EVENT_READ, "accept")
+        self._sel.register(self._waker_r, selectors.EVENT_READ, "wake")
+        self._thread = threading.Thread(target=self._loop, name="sse-streams", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping = True
+        self._wake()
+        if self._thread is not None:
+            self._thread.join(5)
+
+    # ---------------- loop ----------------
+    def _wake(self):
+        try:
+            self._waker_w.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass  # a wake-up is already pending
+
+    def _loop(self):
+        next_tick = time.monotonic() + 1.0
+        try:
+            while not self._stopping:
+                for key, mask in self._sel.select(max(0.0, next_tick - time.monotonic())):
+                    if key.data == "accept":
+                        self._accept()
+                    elif key.data == "wake":
+                        self._drain_waker()
+                    else:
+                        if mask & selectors.EVENT_READ:
+                            self._read(key.data)
+                        if mask & selectors.EVENT_WRITE and key.data in self._clients:
+                            self._send(key.data)
+                self._deliver()
+                now = time.monotonic()
+                if now >= next_tick:
+                    self._tick(now)
+                    next_tick = now + 1.0
+        finally:
+            for c in list(self._clients):
+                self._close(c)
+            self._sel.close()
+            self._listener.close()
+            self._waker_r.close()
+            self._waker_w.close()
+
+    def _accept(self):
+        while True:
+            try:
+                sock, _ = self._listener.accept()
+            except BlockingIOError:
+                return
+            except OSError as e:  # out of file descriptors: leave the rest in the backlog
+                print(f"[live] accept failed: {e}", file=sys.stderr)
+                return
+            sock.setblocking(False)
+            c = _Client(sock, time.monotonic(), self.head_timeout)
+            self._clients.add(c)
+            self._sel.register(sock, selectors.EVENT_READ, c)
+
+    def _drain_waker(self):
+        try:
+            while self._waker_r.recv(4096):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+    def _read(self, c):
+        try:
+            data = c.sock.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._close(c)  # the tab went away
+            return
+        if c.sub is not None or c.closing:
+            return  # nothing more is expected from an EventSource
+        c.inbuf += data
+        if b"\r\n\r\n" in c.inbuf:
+            self._start(c)
+        elif len(c.inbuf) > MAX_HEAD:
+            self._reply(c, _plain("431 Request Header Fields Too Large"))
+
+    def _start(self, c):
+        head = bytes(c.inbuf).split(b"\r\n\r\n", 1)[0].decode("latin-1")
+        c.inbuf = bytearray()
+        lines = head.split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            return self._reply(c, _plain("400 Bad Request"))
+        if method == "OPTIONS":
+            return self._reply(c, _PREFLIGHT)
+        if method != "GET":
+            return self._reply(c, _plain("405 Method Not Allowed"))
+        parts = urlsplit(target)
+        topic = self.topic_for(parts.path)
+        if topic is None:
+            return self._reply(c, _plain("404 Not Found"))
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        last = headers.get("last-event-id") or parse_qs(parts.query).get("last_event_id", [""])[0]
+        sub = self.hub.subscribe(topic, int(last) if last.isdigit() else None,
+                                 notify=lambda _sub, c=c: self._notify(c))
+        if sub is None:
+            return self._reply(c, _STREAM_HEAD + f"retry: {self.retry_ms * 10}\n: busy\n\n")
+        now = time.monotonic()
+        c.sub, c.ends_at, c.ping_at = sub, now + self.max_age, now + self.heartbeat
+        self._write(c, _STREAM_HEAD + f"retry: {self.retry_ms}\n\n")
+        self._notify(c)  # a catch-up event may already be queued
+
+    def _notify(self, c):
+        self._ready.append(c)
+        if threading.current_thread() is not self._thread:
+            self._wake()
+
+    def _deliver(self):
+        seen = set()
+        while self._ready:
+            c = self._ready.popleft()
+            if c in seen or c.sub is None or c not in self._clients:
+                continue
+            seen.add(c)
+            events = c.sub.drain()
+            if events:
+                c.ping_at = time.monotonic() + self.heartbeat
+                self._write(c, "".join(sse(*item) for item in events))
+
+    def _tick(self, now):
+        for c in list(self._clients):
+            if c.sub is None:
+                if not c.closing and now >= c.head_by:
+                    self._close(c)
+            elif now >= c.ends_at:
+                self._close(c)  # EventSource reconnects after `retry`
+            elif now >= c.ping_at:
+                c.ping_at = now + self.heartbeat
+                self._write(c, ": ping\n\n")
+
+    # ---------------- output ----------------
+    def _reply(self, c, text):
+        c.closing = True
+        self._write(c, text)
+
+    def _write(self, c, text):
+        c.out += text.encode("utf-8")
+        if len(c.out) > MAX_BACKLOG:
+            self._close(c)  # not reading; it will reconnect if it's still there
+            return
+        self._send(c)
+
+    def _send(self, c):
+        try:
+            sent = c.sock.send(c.out)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            self._close(c)
+            return
+        del c.out[:sent]
+        if not c.out and c.closing:
+            self._close(c)
+        elif bool(c.out) != c.writing:
+            c.writing = bool(c.out)
+            self._sel.modify(c.sock, selectors.EVENT_READ | (selectors.EVENT_WRITE if c.writing else 0), c)
+
+    def _close(self, c):
+        if c not in self._clients:
+            return
+        self._clients.discard(c)
+        if c.sub is not None:
+            self.hub.unsubscribe(c.sub)
+        try:
+            self._sel.unregister(c.sock)
+        except (KeyError, ValueError):
+            pass
+        c.sock.close()
@@ -0,0 +1,261 @@
+# roomstore.py — rooms sharded one JSON file each, plus an ordered index.
+# Locking a video rewrites one small file; the dock pages through the index
+# (id + title per room) without opening any room file. Like StateStore,
+# files are re-read only when their mtime/size changes on disk.
+#
+#   static/data/rooms/index.json   {"rooms": [["1", "Engine Room — ..."], ...]}
+#   static/data/rooms/<id>.json    {"video_id": "...", "start": 0, "title": "..."}
+#   static/data/rooms/batch.json   only while a multi-room batch is being written
+import json, os, sys, threading, time
+from dataclasses import asdict
+from pathlib import Path
+from schema import Room, room_from_dict, valid_room_id
+from statestore import fsync_dir, write_atomic
+
+INDEX = "index.json"
+JOURNAL = "batch.json"
+BATCH_WAIT = 2.0  # seconds a reader waits on another process's batch before finishing it itself
+
+def _sig(path: Path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def _warn(msg):
+    print(f"[rooms] {msg}", file=sys.stderr)
+
+class RoomStore:
+    """
+    get(room_id) → Room (None if the index doesn't list it); page(n, size)
+    → one slice of the ordered index. Returned Rooms are shared and never
+    mutated — a write swaps in a new object. `index_version` bumps when the
+    index changes and version(room_id) when a room does, so page caches can
+    invalidate one room at a time. A multi-room set_videos() is atomic for
+    readers, in this process or another: see _wait_for_batch().
+    """
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self._lock = threading.RLock()
+        self._index = None  # [(room_id, title)] in numeric order
+        self._pos = {}  # room_id → position in _index
+        self._index_sig = None
+        self._rooms = {}  # room_id → (file sig, Room)
+        self._versions = {}
+        self.index_version = 0
+        self.index_error = None  # why the index couldn't be read, or None (a missing index is just "no rooms")
+        self.modified = 0.0  # epoch seconds of the last change we know about
+        self.reads = 0
+        self.writes = 0
+
+    def _path(self, room_id: str) -> Path:
+        return self.root / f"{room_id}.json"
+
+    # ---------------- index ----------------
+    def exists(self) -> bool:
+        return (self.root / INDEX).exists()
+
+    def _fresh_index(self):
+        sig = _sig(self.root / INDEX)
+        if self._index is not None and sig == self._index_sig:
+            return self._index
+        with self._lock:
+            if self._index is not None and sig == self._index_sig:
+                return self._index
+            self.index_error = None
+            try:
+                raw = json.loads((self.root / INDEX).read_text(encoding="utf-8"))
+            except FileNotFoundError:
+                raw = {}
+            except (OSError, ValueError) as e:
+                raw = {}
+                self.index_error = f"{INDEX}: {e}"
+            if not isinstance(raw, dict):
+                self.index_error = f"{INDEX}: not an object"
+            entries = {}
+            for item in (raw.get("rooms") if isinstance(raw, dict) else None) or []:
+                if (isinstance(item, list) and len(item) == 2 and valid_room_id(item[0])
+                        and isinstance(item[1], str)):
+                    entries[item[0]] = item[1]
+                else:
+                    _warn(f"index: skipped bad entry {item!r}")
+            self._set_index(sorted(entries.items(), key=lambda kv: int(kv[0])), sig)
+            self.reads += 1
+            return self._index
+
+    def _set_index(self, index, sig):
+        self._index = index
+        self._pos = {room_id: i for i, (room_id, _) in enumerate(index)}
+        self._index_sig = sig
+        self.index_version += 1
+        self.modified = sig[0] / 1e9 if sig else time.time()
+
+    def _write_index(self, index):
+        index = sorted(index, key=lambda kv: int(kv[0]))
+        rows = ",\n".join(json.dumps(list(kv), ensure_ascii=False) for kv in index)  # one room per line
+        write_atomic(self.root / INDEX, '{"rooms": [\n' + rows + '\n]}\n')
+        self.index_error = None
+        self._set_index(index, _sig(self.root / INDEX))
+        self.writes += 1
+
+    def ids(self) -> list:
+        return [room_id for room_id, _ in self._fresh_index()]
+
+    def count(self) -> int:
+        return len(self._fresh_index())
+
+    def pages(self, size: int) -> int:
+        return max(1, -(-self.count() // size))
+
+    def page(self, n: int, size: int) -> list:
+        """[(room_id, title)] for 1-based page `n`."""
+        return self._fresh_index()[(n - 1) * size:n * size]
+
+    # ---------------- rooms ----------------
+    def get(self, room_id: str):
+        self._fresh_index()
+        if room_id not in self._pos:
+            return None
+        path = self._path(room_id)
+        sig = _sig(path)
+        hit = self._rooms.get(room_id)
+        if hit is not None and hit[0] == sig:
+            return hit[1]
+        with self._lock:
+            self._wait_for_batch()
+            sig = _sig(path)
+            hit = self._rooms.get(room_id)
+            if hit is not None and hit[0] == sig:
+                return hit[1]  # the batch we waited on brought it in
+            try:
+                raw = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                raw = {}  # listed but missing/unreadable: an empty room under its index title
+            notes = []
+            room = room_from_dict(room_id, raw, notes)
+            if room is None or not raw:
+                room = Room(title=self._index[self._pos[room_id]][1])
+            for note in notes:
+                _warn(note)
+            self._rooms[room_id] = (sig, room)
+            self._versions[room_id] = self._versions.get(room_id, 0) + 1
+            self.reads += 1
+            return room
+
+    def version(self, room_id: str) -> int:
+        """Bumps whenever get(room_id) would return something new."""
+        self.get(room_id)
+        return self._versions.get(room_id, 0)
+
+    def items(self):
+        """(room_id, Room) for every room, in order; shards are read as you go."""
+        for room_id in self.ids():
+            room = self.get(room_id)
+            if room is not None:
+                yield room_id, room
+
+    def _apply(self, rooms: dict, added: list):
+        """
+        Write shards, then the index if rooms are new, and only then let this
+        process's readers see any of them (they wait on _lock meanwhile).
+        """
+        sigs = {}
+        for room_id, room in rooms.items():
+            path = self._path(room_id)
+            write_atomic(path, json.dumps(asdict(room), ensure_ascii=False), sync_dir=False)
+            sigs[room_id] = _sig(path)
+            self.writes += 1
+        fsync_dir(self.root)  # once for the whole batch
+        added = [(room_id, title) for room_id, title in added if room_id not in self._pos]
+        if added:
+            self._write_index(self._fresh_index() + added)
+        for room_id, room in rooms.items():
+            self._rooms[room_id] = (sigs[room_id], room)
+            self._versions[room_id] = self._versions.get(room_id, 0) + 1
+        self.modified = time.time()
+
+    # ---------------- batches ----------------
+    # batch.json holds a whole multi-room batch and is written before any of
+    # its shards, then removed after the last one (and the index). A reader
+    # that finds a shard changed waits while it exists, so nobody sees half a
+    # batch; if the writer died, whoever waits longest finishes the batch from
+    # it (rewriting a shard with the same content is harmless).
+    def _wait_for_batch(self):
+        journal = self.root / JOURNAL
+        deadline = time.monotonic() + BATCH_WAIT
+        while journal.exists():
+            if time.monotonic() >= deadline:
+                self._finish_batch()
+                return
+            time.sleep(0.01)
+
+    def _finish_batch(self):
+        """Replay a batch.json left behind by a writer that died (no-op without one)."""
+        journal = self.root / JOURNAL
+        try:
+            raw = json.loads(journal.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            raw = {}
+            _warn(f"{JOURNAL}: {e}")
+        notes, rooms = [], {}
+        for item in (raw.get("rooms") if isinstance(raw, dict) else None) or []:
+            if isinstance(item, list) and len(item) == 2 and valid_room_id(item[0]):
+                room = room_from_dict(item[0], item[1], notes)
+                if room is not None:
+                    rooms[item[0]] = room
+        for note in notes:
+            _warn(note)
+        if rooms:
+            _warn(f"finishing an interrupted batch of {len(rooms)} room(s)")
+            self._apply(rooms, [(room_id, room.title) for room_id, room in rooms.items()])
+        journal.unlink(missing_ok=True)
+
+    def set_videos(self, entries):
+        """
+        entries: [(room_id, video_id, start)]; a room listed twice keeps its
+        last entry. All-or-nothing for readers and across a crash: several
+        rooms go through batch.json, one room is a single atomic write. The
+        index is rewritten only when a room is new. Returns the new Rooms.
+        """
+        with self._lock:
+            self._finish_batch()
+            rooms, added = {}, []
+            for room_id, video_id, start in entries:
+                old = rooms.get(room_id) or self.get(room_id)
+                title = old.title if old is not None else f"Room {room_id}"
+                if old is None:
+                    added.append((room_id, title))
+                rooms[room_id] = Room(video_id, start, title)
+            batch = len(rooms) > 1
+            if batch:
+                write_atomic(self.root / JOURNAL, json.dumps(
+                    {"rooms": [[room_id, asdict(room)] for room_id, room in rooms.items()]},
+                    ensure_ascii=False))
+            self._apply(rooms, added)
+            if batch:
+                (self.root / JOURNAL).unlink()
+            return [rooms[room_id] for room_id, _, _ in entries]
+
+    def adopt(self, rooms: dict) -> int:
+        """
+        Import rooms from a pre-sharding state.json. Rooms the index already
+        lists are left alone (their own files win). Returns how many were added.
+        """
+        with self._lock:
+            self._fresh_index()
+            added = {room_id: r for room_id, r in rooms.items() if room_id not in self._pos}
+            if added:
+                self._apply(added, [(room_id, r.title) for room_id, r in added.items()])
+            return len(added)
+
+    def stats(self) -> dict:
+        return {
+            "rooms": len(self._index or ()),
+            "cached": len(self._rooms),
+            "reads": self.reads,
+            "writes": self.writes,
+            "index_version": self.index_version,
+        }
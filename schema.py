@@ -0,0 +1,159 @@
+# schema.py — versioned state.json: compact typed records, validated once per
+# load, plus the one-time migration from the legacy layout (videos / suno /
+# punchlines / marketing / weather / daily_lines). Pages read attributes of
+# pre-checked objects instead of poking at raw dicts on every render.
+# Since schema 3 the rooms live in their own files (roomstore.py); rooms
+# found in an older state.json are handed over to it on load.
+import copy, sys
+from dataclasses import asdict, dataclass, field
+from youtube import YOUTUBE_ID_RE, extract_many, extract_youtube_id
+
+SCHEMA_VERSION = 3  # 1 = no "schema" key (legacy layout, or early rooms/brand files); 2 = rooms inline
+
+@dataclass(slots=True)
+class Room:
+    video_id: str = ""
+    start: int = 0
+    title: str = ""
+
+@dataclass(slots=True)
+class Brand:
+    site_title: str = ""
+    tagline: str = ""
+    theme_color: str = "#ff3bd1"
+    bg: str = "#05000c"
+    fg: str = "#ffffff"
+
+@dataclass(slots=True)
+class ShipState:
+    rooms: dict = field(default_factory=dict)  # room_id → Room from a pre-sharding file, else empty
+    brand: Brand = field(default_factory=Brand)
+    extra: dict = field(default_factory=dict)  # other top-level keys, carried verbatim
+    schema: int = SCHEMA_VERSION
+
+def valid_room_id(room_id) -> bool:
+    """Room IDs are plain ASCII numbers; the dock sorts them numerically."""
+    return isinstance(room_id, str) and room_id.isascii() and room_id.isdigit()
+
+def _ordered(rooms: dict) -> dict:
+    return dict(sorted(rooms.items(), key=lambda kv: int(kv[0])))
+
+def _warn(msg):
+    print(f"[state] {msg}", file=sys.stderr)
+
+# ------------------------- MIGRATION -------------------------
+def migrate_legacy(raw: dict, default: dict) -> dict:
+    """
+    Legacy → current layout. Each `videos` link becomes a room holding only
+    the clean ID + start (titled from `marketing` when the room is new);
+    the default rooms and brand fill the rest. suno, punchlines, weather and
+    friends are kept as-is for the tools that still read them.
+    """
+    rooms = copy.deepcopy(default.get("rooms") or {})
+    videos = raw.get("videos") if isinstance(raw.get("videos"), dict) else {}
+    marketing = raw.get("marketing") if isinstance(raw.get("marketing"), dict) else {}
+    keys = list(videos)
+    for k, (vid, start) in zip(keys, extract_many([videos[k] for k in keys])):
+        room_id = str(k)
+        name = marketing.get(k)
+        r = rooms.setdefault(room_id, {"title": f"Room {room_id} — {name}" if name else f"Room {room_id}"})
+        if vid:
+            r["video_id"], r["start"] = vid, start
+        else:
+            _warn(f"legacy video for room {room_id} isn't a YouTube link; left empty: {videos[k]!r}")
+    out = {k: v for k, v in raw.items() if k != "videos"}
+    out["rooms"] = rooms
+    out["brand"] = copy.deepcopy(default.get("brand") or {})
+    return out
+
+# ------------------------- VALIDATION -------------------------
+def room_from_dict(room_id: str, r, notes):
+    """One validated Room, or None when the record is beyond repair."""
+    if isinstance(r, str):
+        r = {"video_id": r}  # a bare link or ID pasted in by hand
+        notes.append(f"room {room_id}: bare link expanded to a record")
+    elif not isinstance(r, dict):
+        notes.append(f"dropped room {room_id}: not a record")
+        return None
+    title = r.get("title")
+    if not isinstance(title, str) or not title.strip():
+        title = f"Room {room_id}"
+    vid = r.get("video_id") or ""
+    start = r.get("start") or 0
+    if vid and not (isinstance(vid, str) and YOUTUBE_ID_RE.match(vid)):
+        clean, parsed = extract_youtube_id(vid) if isinstance(vid, str) else (None, 0)
+        notes.append(f"room {room_id}: video_id {vid!r} → {clean or 'cleared'}")
+        vid, start = clean or "", start or parsed
+    try:
+        start = max(0, int(start))
+    except (TypeError, ValueError):
+        notes.append(f"room {room_id}: bad start {start!r} → 0")
+        start = 0
+    return Room(vid, start, title)
+
+def _rooms(raw, notes) -> dict:
+    if not isinstance(raw, dict):
+        if raw is not None:
+            notes.append("rooms is not a map; dropped")
+        return {}
+    rooms = {}
+    for k, r in raw.items():
+        room_id = str(k)
+        if not valid_room_id(room_id):
+            notes.append(f"dropped room {room_id!r}: room ids are numbers")
+            continue
+        room = room_from_dict(room_id, r, notes)
+        if room is not None:
+            rooms[room_id] = room
+    return _ordered(rooms)
+
+def _brand(raw, default: dict, notes) -> Brand:
+    base = Brand(**(default.get("brand") or {}))
+    if not isinstance(raw, dict):
+        if raw is not None:
+            notes.append("brand is not a map; using the default")
+        return base
+    for name in Brand.__slots__:
+        v = raw.get(name)
+        if isinstance(v, str):
+            setattr(base, name, v)
+        elif v is not None:
+            notes.append(f"brand.{name} is not text; using the default")
+    return base
+
+def from_dict(raw, default: dict):
+    """
+    (ShipState, changed) from parsed state.json; None (missing/unreadable)
+    gives `default`. `changed` means the file was migrated or repaired and
+    should be written back. Files from a newer schema load best-effort and
+    are never rewritten (that would downgrade them).
+    """
+    if not isinstance(raw, dict):
+        return from_dict(default, default)[0], False
+    notes = []
+    version = raw.get("schema", 1)
+    if not isinstance(version, int) or isinstance(version, bool):
+        notes.append(f"schema {version!r} is not a number; treating as 1")
+        version = 1
+    if version > SCHEMA_VERSION:
+        _warn(f"state.json schema {version} is newer than this app ({SCHEMA_VERSION}); not rewriting it")
+    if version < SCHEMA_VERSION and "rooms" not in raw:
+        raw = migrate_legacy(raw, default)
+        notes.append(f"migrated legacy state.json to schema {SCHEMA_VERSION}")
+    state = ShipState(
+        rooms=_rooms(raw.get("rooms"), notes),
+        brand=_brand(raw.get("brand"), default, notes),
+        extra={k: v for k, v in raw.items() if k not in ("schema", "rooms", "brand")},
+        schema=max(version, SCHEMA_VERSION),
+    )
+    for note in notes:
+        _warn(note)
+    return state, version < SCHEMA_VERSION or (version == SCHEMA_VERSION and bool(notes))
+
+def to_dict(state: ShipState) -> dict:
+    out = dict(state.extra)
+    out["schema"] = state.schema
+    if state.rooms:
+        out["rooms"] = {k: asdict(r) for k, r in state.rooms.items()}
+    out["brand"] = asdict(state.brand)
+    return out
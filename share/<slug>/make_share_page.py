@@ -1 +1,215 @@
-python make_share_page.py "https://youtu.be/dQw4w9WgXcQ" --title "Live at Jack’s — Fog" --desc "Cinematic fog field log"
+# make_share_page.py — batch share pages: share/<slug>/index.html per entry of
+# a JSON-lines file, with the same hard-clean YouTube IDs and OG tags as the
+# ship's room pages. The file is streamed; pages render across a process
+# pool; an entry whose inputs hash the same as last build is skipped.
+#
+#   python make_share_page.py [--input requests.jsonl] [--force] [--workers N]
+#   python make_share_page.py "https://youtu.be/dQw4w9WgXcQ" --title "Live at Jack’s — Fog" --desc "Cinematic fog field log"
+#
+# One entry per line:
+#   {"slug": "jacks-fog", "url": "https://youtu.be/dQw4w9WgXcQ?t=42", "title": "...", "desc": "..."}
+# slug is optional (made from the title); lines without a url are skipped.
+import json, os, re, sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+SHARE_DIR = Path(__file__).resolve().parents[1]
+ROOT = SHARE_DIR.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))  # the ship's modules (app, og, buildcache, statestore) live at the repo root
+from buildcache import BuildManifest
+from og import og_tags
+from statestore import write_atomic
+RENDERER_VERSION = 1  # bump when the page markup changes so every page re-renders
+MANIFEST = ".share-pages.json"
+_SLUG_OK = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,79}$")
+
+PAGE_TPL = """<!doctype html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{{ title }}</title>
+<meta name="description" content="{{ og['og:description'] }}">
+<link rel="canonical" href="{{ og['og:url'] }}">
+{% for k, v in og.items() %}<meta property="{{ k }}" content="{{ v }}">
+{% endfor %}<meta name="twitter:card" content="summary_large_image">
+<meta name="twitter:title" content="{{ title }}">
+<meta name="twitter:description" content="{{ og['og:description'] }}">
+<meta name="twitter:image" content="{{ og['og:image'] }}">
+<style>
+html, body { margin:0; padding:0; background:#05000c; color:#fff;
+  font-family:-apple-system, system-ui, Segoe UI, Roboto, Helvetica, Arial, sans-serif; }
+main { padding:1rem; }
+h1 { font-size:2.4rem; margin:1rem 0; }
+a { color:#ffb6ff; }
+.player { aspect-ratio:16/9; width:min(960px, 96vw); max-width:100%; border-radius:14px;
+  border:1px solid #222; overflow:hidden; background:#000; }
+</style>
+</head>
+<body>
+<main>
+  <h1>{{ title }}</h1>
+  {% if desc %}<p>{{ desc }}</p>{% endif %}
+  <div class="player">
+    <iframe src="{{ embed }}" allow="accelerometer; autoplay; encrypted-media; gyroscope; picture-in-picture; web-share"
+      allowfullscreen referrerpolicy="strict-origin-when-cross-origin" style="border:0;width:100%;height:100%;"></iframe>
+  </div>
+  <p><a href="{{ home }}">Board the ship →</a></p>
+</main>
+</body>
+</html>
+"""
+
+def _warn(msg):
+    print(f"[share] {msg}", file=sys.stderr)
+
+def _ship():
+    """The app module, for its link parser and OG registry (importing it has no side effects)."""
+    import app
+    return app
+
+def slugify(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")[:60].rstrip("-")
+
+def share_job(ship, entry: dict, where: str):
+    """
+    Everything that ends up in the page — and therefore the skip hash — or
+    None (with a warning) when the entry can't become a page.
+    """
+    url = entry.get("url")
+    if not url:
+        return None  # not a share request
+    if not isinstance(url, str):
+        _warn(f"{where}: url is not text; skipped")
+        return None
+    video_id, start = ship.extract_youtube_id(url)
+    if not video_id:
+        _warn(f"{where}: not a YouTube link; skipped: {url!r}")
+        return None
+    title = entry.get("title") if isinstance(entry.get("title"), str) and entry["title"].strip() else ""
+    title = title.strip() or f"Video {video_id}"
+    desc = entry.get("desc", entry.get("description"))
+    desc = desc.strip() if isinstance(desc, str) else ""
+    slug = entry.get("slug") or slugify(title) or video_id
+    if not isinstance(slug, str) or not _SLUG_OK.match(slug):
+        _warn(f"{where}: bad slug {slug!r} (letters, digits, - and _ only); skipped")
+        return None
+    embed = ship.build_embed(video_id, start)
+    # Same tag set as a room page, but never a room's banner (a slug like "4" isn't room 4)
+    # and not through the app's per-room tag cache.
+    og = og_tags(f"{ship.PUBLIC_BASE_URL}/share/{slug}/", title, desc or ship.OG.description,
+                 ship.OG.default_image(), embed)
+    return {
+        "slug": slug,
+        "title": title,
+        "desc": desc,
+        "embed": embed,
+        "og": og,
+        "home": f"{ship.PUBLIC_BASE_URL}/",
+    }
+
+_template = None
+
+def render_share(job, out_dir):
+    """Render + write one page. Runs in a worker process."""
+    global _template
+    if _template is None:  # compiled once per worker
+        from jinja2 import Environment
+        _template = Environment(autoescape=True).from_string(PAGE_TPL)
+    write_atomic(Path(out_dir) / job["slug"] / "index.html", _template.render(**job), sync_dir=False)
+    return job["slug"]
+
+def read_entries(path: Path):
+    """(where, entry) per line, streamed; blank lines skipped, bad JSON warned about."""
+    with open(path, encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            where = f"{path.name}:{lineno}"
+            try:
+                entry = json.loads(line)
+            except ValueError as e:
+                _warn(f"{where}: bad JSON ({e}); skipped")
+                continue
+            if isinstance(entry, dict):
+                yield where, entry
+            else:
+                _warn(f"{where}: not an object; skipped")
+
+def _run(todo, out_dir, workers):
+    """render_share over `todo`, yielding slugs. At most a few jobs per worker are in flight."""
+    if workers == 1:
+        for job in todo:
+            yield render_share(job, out_dir)
+        return
+    limit = 4 * (workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:  # workers start on first submit
+        pending = set()
+        for job in todo:
+            pending.add(pool.submit(render_share, job, out_dir))
+            if len(pending) >= limit:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for f in done:
+                    yield f.result()
+        for f in pending:
+            yield f.result()
+
+def build_share_pages(entries, out_dir: Path = SHARE_DIR, workers=None, force=False):
+    """
+    Render a page per (where, entry) whose inputs changed. Pages this tool
+    didn't write (no manifest entry) are never overwritten. Returns
+    {"rendered": [slugs], "skipped": n, "ignored": n}.
+    """
+    ship = _ship()
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest = BuildManifest(out_dir / MANIFEST, RENDERER_VERSION, force)
+    counts = {"skipped": 0, "ignored": 0}
+
+    def todo():
+        for where, entry in entries:
+            job = share_job(ship, entry, where)
+            if job is None:
+                counts["ignored"] += 1
+                continue
+            slug, page = job["slug"], out_dir / job["slug"] / "index.html"
+            if slug in manifest.new:
+                _warn(f"{where}: slug {slug!r} already used above; skipped")
+                counts["ignored"] += 1
+                continue
+            if manifest.made_by_hand(slug, page):
+                _warn(f"{where}: share/{slug}/index.html wasn't made by this tool; left alone")
+                counts["ignored"] += 1
+                continue
+            if not manifest.stale(slug, job, page):
+                counts["skipped"] += 1
+                continue
+            yield job
+
+    rendered = list(_run(todo(), out_dir, workers))
+    manifest.save()  # pages from earlier runs stay known
+    return {"rendered": rendered, **counts}
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Render share pages from a JSON-lines file (or one URL).")
+    ap.add_argument("url", nargs="?", help="one-off: a single YouTube link instead of --input")
+    ap.add_argument("--title", default="")
+    ap.add_argument("--desc", default="")
+    ap.add_argument("--slug", default="")
+    ap.add_argument("--input", default="requests.jsonl", help="JSON-lines file, one share entry per line")
+    ap.add_argument("--out", default=str(SHARE_DIR))
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--force", action="store_true")
+    args = ap.parse_args()
+    if args.url:
+        entries = [("command line", {"url": args.url, "title": args.title, "desc": args.desc,
+                                     "slug": args.slug or None})]
+        workers = 1
+    else:
+        entries, workers = read_entries(Path(args.input)), args.workers
+    result = build_share_pages(entries, Path(args.out), workers=workers, force=args.force)
+    for slug in result["rendered"]:
+        print(f"built  share/{slug}/index.html")
+    print(f"{len(result['rendered'])} rendered, {result['skipped']} unchanged, {result['ignored']} ignored")
@@ -1,28 +1,91 @@
 # sniffer.py — finds a safe local port (never 5000), fast.
-import socket
+# Order: last good port (cache file) → concurrent probe of the range →
+# OS-assigned ephemeral port. Each pick logs its time-to-bind.
+import socket, sys, time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
 DEFAULT_START = 5050
 DEFAULT_END = 5099
 FORBIDDEN = {5000}
+CACHE_FILE = Path(__file__).parent.resolve() / ".last_port"
+PROBE_WORKERS = 16
 
-def _port_free(port: int) -> bool:
+last_timing = {}  # {"port", "via", "ms"} of the most recent allocation
+
+def _port_free(port: int, host: str = "127.0.0.1") -> bool:
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
         s.settimeout(0.2)
         try:
-            s.bind(("127.0.0.1", port))
+            s.bind((host, port))
             return True
         except OSError:
             return False
 
-def find_open_port(start: int = DEFAULT_START, end: int = DEFAULT_END) -> int:
-    """Return first free port in [start, end] skipping any FORBIDDEN."""
-    for p in range(start, end + 1):
-        if p in FORBIDDEN:
-            continue
-        if _port_free(p):
-            return p
-    # last resort, expand a bit
-    for p in range(end + 1, end + 21):
-        if _port_free(p):
-            return p
+def _ephemeral_port(host: str = "127.0.0.1") -> int:
+    """Let the OS pick; it never hands out 5000 from the ephemeral range, but check anyway."""
+    for _ in range(5):
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            s.bind((host, 0))
+            port = s.getsockname()[1]
+        if port not in FORBIDDEN:
+            return port
     raise RuntimeError("No open port found for local run.")
+
+def _read_cache():
+    try:
+        return int(CACHE_FILE.read_text().strip())
+    except (OSError, ValueError):
+        return None
+
+def _write_cache(port: int):
+    try:
+        CACHE_FILE.write_text(str(port))
+    except OSError:
+        pass  # read-only checkout: just skip the cache
+
+def _probe(candidates, host):
+    """Bind-test candidates concurrently; lowest free one wins."""
+    candidates = [p for p in candidates if p not in FORBIDDEN]
+    if not candidates:
+        return None
+    with ThreadPoolExecutor(max_workers=min(PROBE_WORKERS, len(candidates))) as pool:
+        for port, free in zip(candidates, pool.map(lambda p: _port_free(p, host), candidates)):
+            if free:
+                return port
+    return None
+
+def allocate_port(start: int = DEFAULT_START, end: int = DEFAULT_END,
+                  host: str = "127.0.0.1", use_cache: bool = True) -> int:
+    """
+    Pick a free port in [start, end], skipping FORBIDDEN.
+    start=0 means "any port": ask the OS for an ephemeral one straight away.
+    """
+    t0 = time.perf_counter()
+    port, via = None, ""
+    if start == 0:
+        port, via = _ephemeral_port(host), "os"
+    if port is None and use_cache:
+        cached = _read_cache()
+        if cached and start <= cached <= end and cached not in FORBIDDEN and _port_free(cached, host):
+            port, via = cached, "cache"
+    if port is None:
+        port = _probe(range(start, end + 1), host)
+        via = "probe"
+    if port is None:
+        # last resort, expand a bit, then let the OS choose
+        port = _probe(range(end + 1, end + 21), host)
+        via = "probe+"
+    if port is None:
+        port, via = _ephemeral_port(host), "os"
+
+    if use_cache:
+        _write_cache(port)
+    ms = (time.perf_counter() - t0) * 1000
+    last_timing.update(port=port, via=via, ms=ms)
+    print(f"[sniffer] port {port} via {via} in {ms:.2f} ms", file=sys.stderr)
+    return port
+
+def find_open_port(start: int = DEFAULT_START, end: int = DEFAULT_END) -> int:
+    """Return a free port in [start, end] skipping any FORBIDDEN."""
+    return allocate_port(start, end)
@@ -0,0 +1,186 @@
+# statestore.py — process-wide state.json cache (load once, reload on change)
+# with lock-protected, atomic, write-behind persistence.
+import atexit, copy, json, os, tempfile, threading, time
+from pathlib import Path
+
+def fsync_dir(path: Path):
+    """Make a rename in `path` durable (no-op where directories can't be opened)."""
+    try:
+        dfd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return  # e.g. Windows: no directory fds; the rename is still atomic
+    try:
+        os.fsync(dfd)
+    except OSError:
+        pass
+    finally:
+        os.close(dfd)
+
+def write_atomic(path: Path, data, sync_dir: bool = True):
+    """
+    temp file -> fsync -> rename; readers see the old file or the new one,
+    never half. `data` is text (written as UTF-8) or bytes.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.stem}-", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, 0o644)  # mkstemp makes 0600; everything we write is meant to be readable
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    if sync_dir:
+        fsync_dir(path.parent)
+
+class StateStore:
+    """
+    Keeps state.json parsed in memory. Reads are served from the cached dict;
+    the file is re-parsed only when its mtime/size signature changes on disk
+    (someone edited it by hand) or after we write it ourselves.
+    Treat the dict returned by get() as read-only; change state via update().
+
+    Writes land in memory at once and are flushed to disk after `flush_delay`
+    seconds, so a burst of room edits costs one write. Each flush goes
+    temp file -> fsync -> rename, so readers never see a half-written file.
+
+    Optional `decode(raw) -> (state, changed)` turns the parsed JSON (None
+    when missing/unreadable) into the in-memory model, once per load; when
+    it reports `changed` (a migration or repair) the file is rewritten.
+    `encode(state) -> dict` is its inverse for flushes.
+    """
+    def __init__(self, path: Path, default: dict, flush_delay: float = 0.25,
+                 decode=None, encode=None):
+        self.path = Path(path)
+        self.default = default
+        self.flush_delay = flush_delay
+        self.decode = decode
+        self.encode = encode
+        self._lock = threading.RLock()
+        self._state = None
+        self._snap = (None, 0)  # (state, version), swapped as one object
+        self._sig = None
+        self._dirty = False
+        self._timer = None
+        self.version = 0
+        self.modified = 0.0  # epoch seconds of the last change we know about
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.writes = 0
+        atexit.register(self.flush)
+
+    def _stat_sig(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _load(self, sig):
+        try:
+            raw = json.loads(self.path.read_text(encoding="utf-8"))
+        except Exception:
+            raw = None
+        changed = False
+        if self.decode is not None:
+            state, changed = self.decode(raw)
+        else:
+            state = raw if raw is not None else copy.deepcopy(self.default)
+        self._state = state
+        self._sig = sig
+        self.modified = sig[0] / 1e9 if sig else time.time()
+        self.version += 1
+        self._snap = (state, self.version)
+        if changed and sig is not None:
+            self._dirty = True  # write the migrated/repaired form back once
+            self._schedule()
+
+    def get(self) -> dict:
+        state = self._state
+        if state is not None and (self._dirty or self._stat_sig() == self._sig):
+            self.hits += 1
+            return state
+        with self._lock:
+            if self._dirty:
+                return self._state
+            if self._state is None:
+                self.misses += 1
+            else:
+                self.reloads += 1
+            self._load(self._stat_sig())
+            return self._state
+
+    def snapshot(self):
+        """(state, version) taken together, for callers that cache by version."""
+        self.get()
+        return self._snap
+
+    def update(self, fn):
+        """
+        Apply fn(state) to a private copy under the writer lock, publish it,
+        and schedule a flush. Returns whatever fn returns.
+        """
+        with self._lock:
+            state = copy.deepcopy(self.get())
+            result = fn(state)
+            self._publish(state)
+            return result
+
+    def put(self, state: dict):
+        """Replace the whole state and schedule a flush."""
+        with self._lock:
+            self._publish(state)
+
+    def _publish(self, state):
+        self._state = state
+        self._dirty = True
+        self.modified = time.time()
+        self.version += 1
+        self._snap = (state, self.version)
+        self._schedule()
+
+    def _schedule(self):
+        if self.flush_delay <= 0:
+            self.flush()
+        elif self._timer is None:
+            self._timer = threading.Timer(self.flush_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Write pending changes now (no-op when clean)."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            state = self._state if self.encode is None else self.encode(self._state)
+            write_atomic(self.path, json.dumps(state, indent=2))
+            self._sig = self._stat_sig()
+            self._dirty = False
+            self.writes += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._sig = None
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "reloads": self.reloads,
+            "writes": self.writes,
+            "pending": self._dirty,
+            "version": self.version,
+        }
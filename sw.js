@@ -1,10 +1,17 @@
 // sw.js — Timmy Time Rock Cache
-const CACHE = 'timmy-rock-v1';
+// The precache list is what these pages link, and the cache key hashes
+// those files (python app.py assets), so a new key only appears when one
+// of them changes.
+// BEGIN ASSETS (written by `python app.py assets`; don't edit by hand)
+const CACHE = 'timmy-rock-f8c02151db';
 const ASSETS = [
   './',
   './index.html',
-  './offline.html'
+  './offline.html',
+  './static/base.css',
+  './static/style.css'
 ];
+// END ASSETS
 
 self.addEventListener('install', e=>{
   e.waitUntil(caches.open(CACHE).then(c=>c.addAll(ASSETS)).then(self.skipWaiting()));
@@ -0,0 +1,80 @@
+# conftest.py — shared setup: the repo root and .github (autoposter) on sys.path,
+# the app pointed at a scratch state file before anything imports it, git off
+# for the autoposter, and a local stand-in for the Graph API.
+import os, sys, tempfile, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path[:0] = [str(ROOT), str(ROOT / ".github")]
+_SCRATCH = tempfile.mkdtemp(prefix="ship-tests-")
+os.environ["SHIP_STATE_FILE"] = os.path.join(_SCRATCH, "state.json")
+os.environ["SHIP_BANNERS"] = "0"
+os.environ["AUTOPOSTER_GIT"] = "0"
+
+class StubGraph:
+    """
+    Keep-alive HTTP/1.1 server that records every POST. `responses` is a
+    queue of (status, headers, body); when empty it answers 200 {"id": "1_2"}.
+    `drop_after` closes the socket after that many responses per connection
+    without saying so (a stale keep-alive). Requests whose 1-based number is
+    in `hang_up_on` are read and then dropped with no answer at all.
+    `on_request(path, form)` runs before the answer.
+    """
+    def __init__(self):
+        self.requests = []
+        self.connections = 0
+        self.responses = []
+        self.drop_after = None
+        self.hang_up_on = set()
+        self.on_request = None
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                stub.connections += 1
+                self.served = 0
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                form = dict(parse_qsl(body.decode("utf-8")))
+                stub.requests.append((self.path, form))
+                if stub.on_request is not None:
+                    stub.on_request(self.path, form)
+                if len(stub.requests) in stub.hang_up_on:
+                    self.close_connection = True
+                    return
+                status, headers, payload = stub.responses.pop(0) if stub.responses else (
+                    200, {}, b'{"id": "1_2"}')
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                self.served += 1
+                if stub.drop_after is not None and self.served >= stub.drop_after:
+                    self.close_connection = True
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def graph():
+    stub = StubGraph()
+    yield stub
+    stub.close()
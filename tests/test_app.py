@@ -0,0 +1,129 @@
+import json, threading, time
+import pytest
+from roomstore import RoomStore
+from schema import Room
+
+VID = "dQw4w9WgXcQ"
+
+@pytest.fixture
+def ship(tmp_path, monkeypatch):
+    """The app on a fresh three-room store (like bench.use_state); banners off."""
+    import app as ship
+    ship.init_runtime(banners=False)
+    monkeypatch.setattr(ship, "ROOMS", RoomStore(tmp_path / "rooms"))
+    monkeypatch.setattr(ship, "PAGES", ship.PageCache())
+    ship.ROOMS.adopt({str(i): Room("", 0, f"Room {i}") for i in range(1, 4)})
+    return ship
+
+@pytest.fixture
+def client(ship):
+    return ship.get_app().test_client()
+
+def _lock(client, room_id, raw=VID, start=0):
+    return client.post("/api/set_video", json={"room_id": room_id, "raw": raw, "start": start}).get_json()
+
+# ---------------- conditional GET ----------------
+def test_etag_and_last_modified_answer_304(client):
+    first = client.get("/room/2")
+    assert first.status_code == 200 and first.headers["Cache-Control"] == "public, no-cache"
+    etag, lm = first.headers["ETag"], first.headers["Last-Modified"]
+    assert client.get("/room/2", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/room/2", headers={"If-Modified-Since": lm}).status_code == 304
+    assert client.get("/room/2", headers={"If-None-Match": '"other"'}).status_code == 200
+
+def test_a_lock_changes_only_that_rooms_validators(client):
+    room1, room2 = client.get("/room/1").headers["ETag"], client.get("/room/2").headers["ETag"]
+    assert _lock(client, "2", f"https://youtu.be/{VID}?t=42")["start"] == 42
+    fresh = client.get("/room/2", headers={"If-None-Match": room2})
+    assert fresh.status_code == 200 and VID in fresh.get_data(as_text=True)
+    assert fresh.headers["ETag"] != room2
+    assert client.get("/room/1", headers={"If-None-Match": room1}).status_code == 304
+
+def test_a_hand_edited_room_moves_last_modified(ship, client, tmp_path):
+    lm = client.get("/room/3").headers["Last-Modified"]
+    time.sleep(1.1)  # Last-Modified has one-second resolution
+    (tmp_path / "rooms" / "3.json").write_text(json.dumps({"video_id": VID, "start": 0, "title": "Room 3"}))
+    resp = client.get("/room/3", headers={"If-Modified-Since": lm})
+    assert resp.status_code == 200 and resp.headers["Last-Modified"] != lm
+
+def test_dock_pages(client):
+    home = client.get("/")
+    assert home.status_code == 200 and "Room 3" in home.get_data(as_text=True)
+    assert client.get("/", headers={"If-None-Match": home.headers["ETag"]}).status_code == 304
+    assert client.get("/?page=2").status_code == 404
+    assert client.get("/?page=x").status_code == 404
+
+# ---------------- /api/set_video(s) ----------------
+def test_set_video_rejects_bad_input(client):
+    assert _lock(client, "2", "not a link")["ok"] is False
+    assert _lock(client, "abc")["error"] == "room_id must be a number."
+    assert client.get("/room/2").get_data(as_text=True).count(VID) == 0
+
+def test_set_videos_list_and_map_forms(ship, client):
+    body = client.post("/api/set_videos", json={"rooms": [
+        {"room_id": "1", "raw": VID, "start": 7},
+        {"room_id": "9", "raw": f"https://www.youtube.com/shorts/{VID}"}]}).get_json()
+    assert body["ok"] and body["applied"]
+    assert [(r["room_id"], r["start"]) for r in body["results"]] == [("1", 7), ("9", 0)]
+    assert ship.ROOMS.get("1") == Room(VID, 7, "Room 1")
+    assert ship.ROOMS.ids() == ["1", "2", "3", "9"]  # a new room joins the index
+    body = client.post("/api/set_videos", json={"rooms": {"2": VID, "3": {"raw": VID, "start": 3}}}).get_json()
+    assert body["ok"] and ship.ROOMS.get("3").start == 3 and ship.ROOMS.get("2").video_id == VID
+
+def test_set_videos_saves_nothing_when_any_link_is_rejected(ship, client, tmp_path):
+    before = {p.name: p.read_text() for p in (tmp_path / "rooms").iterdir()}
+    body = client.post("/api/set_videos", json={"rooms": [
+        {"room_id": "1", "raw": VID}, {"room_id": "2", "raw": "nope"}, {"room_id": "12", "raw": VID}]}).get_json()
+    assert body["ok"] is False and body["applied"] is False
+    assert [r["ok"] for r in body["results"]] == [True, False, True]
+    assert body["results"][1]["room_id"] == "2"
+    assert {p.name: p.read_text() for p in (tmp_path / "rooms").iterdir()} == before
+
+def test_set_videos_rejects_bad_batches(ship, client, monkeypatch):
+    assert client.post("/api/set_videos", json={}).get_json()["ok"] is False
+    assert client.post("/api/set_videos", json={"rooms": []}).get_json()["ok"] is False
+    monkeypatch.setattr(ship, "MAX_BATCH", 2)
+    body = client.post("/api/set_videos", json={"rooms": {"1": VID, "2": VID, "3": VID}}).get_json()
+    assert body["ok"] is False and "max 2" in body["error"]
+
+# ---------------- live streams ----------------
+def test_production_redirects_streams_to_the_stream_server(ship, client, monkeypatch):
+    monkeypatch.setattr(ship, "LIVE_HOST", "127.0.0.1")
+    monkeypatch.setattr(ship, "_live_pid", None)
+    monkeypatch.setattr(ship.HUB, "limit", ship.HUB.limit)
+    try:
+        resp = client.get("/room/2/events", headers={"Last-Event-ID": "7"})
+        assert resp.status_code == 307 and resp.headers["Cache-Control"] == "no-store"
+        assert resp.headers["Location"] == f"http://localhost:{ship.LIVE.port}/room/2/events?last_event_id=7"
+        assert ship.HUB.limit == ship.LIVE.capacity
+        assert client.get("/room/abc/events").status_code == 404
+    finally:
+        ship.LIVE.stop()
+        monkeypatch.setattr(ship, "LIVE", None)
+
+# ---------------- banners ----------------
+def test_a_forked_worker_starts_its_own_banner_thread(ship, monkeypatch):
+    started = []
+    monkeypatch.setattr(ship, "BANNERS", True)
+    monkeypatch.setattr(ship, "_banner_loop", lambda: started.append(True))
+    for name in ("_banner_lock", "_banner_full", "_runtime_lock"):
+        monkeypatch.setattr(ship, name, getattr(ship, name))
+    # What gunicorn's master hands a worker: banners "started", by a thread that isn't there.
+    monkeypatch.setattr(ship, "_banner_thread", threading.Thread(target=lambda: None))
+    monkeypatch.setattr(ship, "_banners_started", True)
+    ship.init_runtime()
+    assert started == []
+    ship._banners_after_fork()
+    ship.init_runtime()
+    ship._banner_thread.join(5)
+    assert started == [True] and ship._banners_started and ship._banner_full
+    ship.init_runtime()
+    assert started == [True]  # once per process
+
+# ---------------- health ----------------
+def test_health_reports_a_broken_room_index(client, tmp_path):
+    body = client.get("/health").get_json()
+    assert body["ready"] and body["rooms"] == 3
+    (tmp_path / "rooms" / "index.json").write_text("{broken")
+    resp = client.get("/health")
+    assert resp.status_code == 503 and resp.get_json()["status"] == "degraded"
@@ -0,0 +1,63 @@
+import json
+import assets
+from assets import AssetManifest, build_assets, linked_files
+
+CSS = "body { color: #f0f; }\n" * 40  # big enough to get .gz/.br siblings
+SW = "// sw.js\n// BEGIN ASSETS\n// END ASSETS\nself.addEventListener('fetch', e=>{});\n"
+
+def _site(root):
+    (root / "static").mkdir()
+    (root / "static" / "ship.css").write_text(CSS)
+    (root / "static" / "base.css").write_text("h1 {}")
+    (root / "static" / "unused.js").write_text("// nobody links this")
+    (root / "index.html").write_text('<a href="room2.html">2</a><img src="https://x.example/a.png">')
+    (root / "room2.html").write_text('<link rel="stylesheet" href="static/base.css">'
+                                     '<script src="static/gone.js"></script>')
+    (root / "offline.html").write_text("offline")
+    (root / "sw.js").write_text(SW)
+
+def _build(root, **kw):
+    return build_assets(root, root / "static" / "dist", sources=("static/ship.css",),
+                        sw_file=root / "sw.js", **kw)
+
+def test_build_fingerprints_and_skips_unchanged_sources(tmp_path):
+    _site(tmp_path)
+    assert _build(tmp_path)["built"] == ["static/ship.css"]
+    manifest = json.loads((tmp_path / "static" / "dist" / "manifest.json").read_text())
+    entry = manifest["assets"]["static/ship.css"]
+    assert entry["file"].startswith("ship.") and ".gz" in entry["variants"]
+    assert (tmp_path / "static" / "dist" / (entry["file"] + ".gz")).exists()
+    assert _build(tmp_path) == {"built": [], "skipped": 1, "removed": []}
+
+def test_the_previous_build_survives_one_generation(tmp_path):
+    _site(tmp_path)
+    _build(tmp_path)
+    first = json.loads((tmp_path / "static" / "dist" / "manifest.json").read_text())
+    first = first["assets"]["static/ship.css"]["file"]
+    (tmp_path / "static" / "ship.css").write_text(CSS + "a {}\n")
+    _build(tmp_path)
+    reader = AssetManifest(tmp_path / "static" / "dist")
+    assert reader.by_file(first) is not None  # pages still holding the old URL keep working
+    (tmp_path / "static" / "ship.css").write_text(CSS + "b {}\n")
+    assert first in _build(tmp_path)["removed"]
+    assert reader.by_file(first) is None
+
+def test_sw_precaches_only_what_the_pages_link(tmp_path):
+    _site(tmp_path)
+    assert linked_files(tmp_path) == ["static/base.css"]  # not unused.js, the missing gone.js or URLs
+    _build(tmp_path)
+    sw = (tmp_path / "sw.js").read_text()
+    assert "'./static/base.css'" in sw and "ship." not in sw and "unused" not in sw
+    key = sw.split("timmy-rock-")[1][:10]
+    (tmp_path / "static" / "base.css").write_text("h1 { color: red; }")
+    _build(tmp_path)
+    assert key not in (tmp_path / "sw.js").read_text()  # an edited linked file renews the cache
+
+def test_url_falls_back_to_the_plain_file_without_a_build(tmp_path, monkeypatch):
+    monkeypatch.setattr(assets, "ROOT", tmp_path)
+    reader = AssetManifest(tmp_path / "static" / "dist")
+    assert reader.url("static/ship.css") == "/static/ship.css" and reader.current_version() is None
+    _site(tmp_path)
+    _build(tmp_path)
+    assert reader.url("static/ship.css", "../").startswith("../static/dist/ship.")
+    assert reader.current_version() is not None
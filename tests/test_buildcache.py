@@ -0,0 +1,34 @@
+import json
+from buildcache import BuildManifest, job_hash
+
+def test_hashes_are_stable_and_see_every_input():
+    assert job_hash({"a": 1, "b": [2]}) == job_hash({"b": [2], "a": 1})
+    assert job_hash({"a": 1}) != job_hash({"a": 2})
+    assert job_hash({"f": lambda: 1}) == job_hash({"f": lambda: 1})  # not by address
+
+def test_stale_made_by_hand_and_renderer_bumps(tmp_path):
+    out = tmp_path / "page.html"
+    m = BuildManifest(tmp_path / ".m.json", renderer=1)
+    assert m.stale("page", {"t": "x"}, out)  # never built
+    out.write_text("built")
+    m.save()
+    m = BuildManifest(tmp_path / ".m.json", renderer=1)
+    assert not m.stale("page", {"t": "x"}, out) and m.stale("page", {"t": "y"}, out)
+    assert BuildManifest(tmp_path / ".m.json", renderer=2).stale("page", {"t": "x"}, out)
+    assert BuildManifest(tmp_path / ".m.json", renderer=1, force=True).stale("page", {"t": "x"}, out)
+    (tmp_path / "mine.html").write_text("by hand")
+    assert m.made_by_hand("mine", tmp_path / "mine.html") and not m.made_by_hand("page", out)
+
+def test_save_merges_or_replaces(tmp_path):
+    path = tmp_path / ".m.json"
+    path.write_text(json.dumps({"a": "1", "b": "2"}))
+    m = BuildManifest(path)
+    m.stale("b", {}, tmp_path / "b")
+    path.write_text(json.dumps({"a": "1", "b": "2", "c": "3"}))  # another run saved meanwhile
+    m.save()
+    assert set(json.loads(path.read_text())) == {"a", "b", "c"}
+    m = BuildManifest(path)
+    m.stale("b", {}, tmp_path / "b")
+    assert m.gone() == ["a", "c"]
+    m.save(merge=False)
+    assert list(json.loads(path.read_text())) == ["b"]
@@ -0,0 +1,86 @@
+import threading, time
+import pytest
+from graph_http import HttpPool, OutcomeUnknown, UsageThrottle
+from post_to_fb import RateLimiter
+
+def test_pool_reuses_one_keepalive_connection(graph):
+    pool = HttpPool(size=2)
+    for _ in range(3):
+        status, _, body = pool.request("POST", f"{graph.url}/1/feed", body=b"message=hi",
+                                       headers={"Content-Type": "application/x-www-form-urlencoded"})
+        assert status == 200 and body == b'{"id": "1_2"}'
+    assert pool.connects == 1
+    assert graph.connections == 1
+    assert [form for _, form in graph.requests] == [{"message": "hi"}] * 3
+    pool.close()
+
+def test_pool_replaces_an_idle_connection_the_server_closed(graph):
+    graph.drop_after = 1  # the server hangs up after every answer, without a Connection: close
+    pool = HttpPool(size=1)
+    assert pool.request("POST", f"{graph.url}/1/feed", body=b"n=1")[0] == 200
+    time.sleep(0.05)  # let the close reach our idle socket
+    assert pool.request("POST", f"{graph.url}/1/feed", body=b"n=2")[0] == 200
+    assert pool.connects == 2  # the closed socket was spotted and replaced before sending
+    assert [form["n"] for _, form in graph.requests] == ["1", "2"]
+    pool.close()
+
+def test_pool_never_resends_a_request_that_went_out(graph):
+    graph.hang_up_on = {2}  # reads the second POST, then drops the connection unanswered
+    pool = HttpPool(size=1)
+    assert pool.request("POST", f"{graph.url}/1/feed", body=b"a=1")[0] == 200
+    with pytest.raises(OutcomeUnknown):
+        pool.request("POST", f"{graph.url}/1/feed", body=b"a=2")
+    assert [form["a"] for _, form in graph.requests] == ["1", "2"]
+    assert pool.request("POST", f"{graph.url}/1/feed", body=b"a=3")[0] == 200  # the pool recovers
+    pool.close()
+
+def test_pool_reports_a_missing_answer_on_a_fresh_connection(graph):
+    graph.hang_up_on = {1}
+    pool = HttpPool(size=1)
+    with pytest.raises(OutcomeUnknown):
+        pool.request("POST", f"{graph.url}/1/feed", body=b"a=1")
+    assert len(graph.requests) == 1
+    pool.close()
+
+def test_pool_passes_http_errors_through(graph):
+    graph.responses.append((400, {}, b'{"error": {"message": "bad"}}'))
+    pool = HttpPool()
+    status, _, body = pool.request("POST", f"{graph.url}/1/feed", body=b"")
+    assert status == 400 and b"bad" in body
+    pool.close()
+
+def test_throttle_parses_usage_headers():
+    parse = UsageThrottle._parse
+    assert parse('{"call_count": 80, "total_time": 12, "total_cputime": 5}') == (80.0, 0)
+    assert parse('{"123": [{"type": "pages", "call_count": 96, "estimated_time_to_regain_access": 2},'
+                 ' {"call_count": 10}]}') == (96.0, 2)
+    assert parse(None) == (0.0, 0)
+    assert parse("not json") == (0.0, 0)
+    assert parse('{"call_count": "lots"}') == (0.0, 0)
+
+def test_throttle_delays_by_usage():
+    t = UsageThrottle(max_delay=10.0, hard_pause=60.0)
+    t.observe({"X-App-Usage": '{"call_count": 10}'})
+    assert t._pause_until <= time.monotonic()
+    t.observe({"X-App-Usage": '{"call_count": 85}'})  # halfway between SOFT and HARD
+    assert 4.0 < t._pause_until - time.monotonic() <= 5.0
+    t.observe({"X-Page-Usage": '{"call_count": 99}'})
+    assert 59.0 < t._pause_until - time.monotonic() <= 60.0
+    t.observe({"X-Business-Use-Case-Usage": '{"1": [{"call_count": 50, "estimated_time_to_regain_access": 3}]}'})
+    assert 179.0 < t._pause_until - time.monotonic() <= 180.0
+    assert t.usage == 50.0
+
+def test_rate_limiter_spaces_calls():
+    limiter = RateLimiter(0.05)
+    stamps = []
+    def call():
+        limiter.wait()
+        stamps.append(time.monotonic())
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    stamps.sort()
+    gaps = [b - a for a, b in zip(stamps, stamps[1:])]
+    assert all(g >= 0.045 for g in gaps), gaps
@@ -0,0 +1,47 @@
+import os
+import og
+from og import DEFAULT_NAME, OgRegistry
+
+def _registry(tmp_path):
+    (tmp_path / DEFAULT_NAME).write_bytes(b"default")
+    (tmp_path / "room1_1200x630.png").write_bytes(b"one")
+    (tmp_path / "room1_1200x630.webp").write_bytes(b"one, smaller")
+    (tmp_path / "room2_1200x630.jpg").write_bytes(b"two")
+    return OgRegistry(tmp_path, "https://ship.example/", "desc")
+
+def _count_hashes(monkeypatch):
+    hashed = []
+    real = og._content_hash
+    monkeypatch.setattr(og, "_content_hash", lambda path: hashed.append(path.name) or real(path))
+    return hashed
+
+def test_rooms_get_their_preferred_variant_with_a_cache_buster(tmp_path):
+    reg = _registry(tmp_path)
+    one = reg.image_for("1")
+    assert one["url"].startswith("https://ship.example/static/og/room1_1200x630.png?v=")
+    assert one["type"] == "image/png" and reg.image_for("2")["type"] == "image/jpeg"
+    assert reg.image_for("9") == reg.default_image()
+
+def test_a_rescan_only_rehashes_changed_banners(tmp_path, monkeypatch):
+    reg = _registry(tmp_path)
+    hashed = _count_hashes(monkeypatch)
+    reg.refresh()
+    assert sorted(hashed) == sorted([DEFAULT_NAME, "room1_1200x630.png", "room2_1200x630.jpg"])
+    generation, hashed[:] = reg.generation, []
+    (tmp_path / "notes.txt").write_text("unrelated")  # the folder's mtime moves
+    reg.refresh()
+    assert hashed == [] and reg.generation == generation  # nothing re-hashed, pages stay cached
+    (tmp_path / "room2_1200x630.jpg").write_bytes(b"two, redrawn")
+    reg.refresh()
+    assert hashed == ["room2_1200x630.jpg"] and reg.generation == generation + 1
+
+def test_a_touched_but_identical_banner_keeps_its_url(tmp_path, monkeypatch):
+    reg = _registry(tmp_path)
+    url = reg.image_for("1")["url"]
+    generation = reg.generation
+    hashed = _count_hashes(monkeypatch)
+    path = tmp_path / "room1_1200x630.png"
+    os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 10 ** 9))
+    reg.refresh()
+    assert hashed == ["room1_1200x630.png"]
+    assert reg.image_for("1")["url"] == url and reg.generation == generation
@@ -0,0 +1,175 @@
+import json, os, time
+import pytest
+import post_queue, post_to_fb
+from post_queue import PostQueue, PENDING, INFLIGHT, SENT, FAILED, UNKNOWN, idempotency_key
+
+def _queue_file(root, name, **payload):
+    qdir = root / "queue"
+    qdir.mkdir(parents=True, exist_ok=True)
+    (qdir / name).write_text(json.dumps(payload), encoding="utf-8")
+
+def test_backoff_doubles_with_jitter_and_caps(monkeypatch):
+    monkeypatch.setattr(post_queue, "BACKOFF_BASE", 100.0)
+    assert 80 <= post_queue.backoff(1) <= 120
+    assert 320 <= post_queue.backoff(3) <= 480
+    assert post_queue.backoff(30) <= post_queue.BACKOFF_CAP * 1.2
+
+def test_failed_delivery_waits_then_gives_up(tmp_path, monkeypatch):
+    monkeypatch.setattr(post_queue, "MAX_ATTEMPTS", 2)
+    _queue_file(tmp_path, "a.json", message="hi")
+    q = PostQueue(str(tmp_path), default_targets=["P"])
+    [(name, _, aliases)] = q.due(5)
+    assert aliases == ["P"]
+    q.mark_inflight(name, "P")
+    q.complete(name, "P", False, "HTTPError 500")
+    d = q.items[name]["deliveries"]["P"]
+    assert d["state"] == PENDING and d["next_at"] > time.time()
+    assert q.due(5) == []
+    assert q.due(5, now=d["next_at"] + 1)[0][0] == name
+    q.mark_inflight(name, "P")
+    q.complete(name, "P", False, "HTTPError 500")
+    assert d["state"] == FAILED and q.finished() == [name]
+
+def test_due_orders_by_priority_and_schedule(tmp_path):
+    _queue_file(tmp_path, "low.json", message="low")
+    _queue_file(tmp_path, "high.json", message="high", priority=5)
+    _queue_file(tmp_path, "later.json", message="later", priority=9, scheduled_at=time.time() + 3600)
+    q = PostQueue(str(tmp_path), default_targets=["P"])
+    assert [name for name, _, _ in q.due(5)] == ["high.json", "low.json"]
+
+def test_idempotency_key_skips_a_requeued_copy(tmp_path):
+    assert idempotency_key({"id": "x1", "message": "a"}) == "x1"
+    assert idempotency_key({"message": "a"}) == idempotency_key({"message": "a", "priority": 3})
+    assert idempotency_key({"message": "a"}) != idempotency_key({"message": "b"})
+    _queue_file(tmp_path, "one.json", message="same")
+    q = PostQueue(str(tmp_path), default_targets=["P"])
+    [(name, _, _)] = q.due(5)
+    q.mark_inflight(name, "P")
+    q.complete(name, "P", True, "OK")
+    q.save()
+    _queue_file(tmp_path, "copy.json", message="same")
+    q = PostQueue(str(tmp_path), default_targets=["P"])
+    assert q.due(5) == []
+    assert q.items["copy.json"]["deliveries"]["P"]["state"] == SENT
+
+def test_inflight_after_a_crash_is_parked_not_reposted(tmp_path):
+    _queue_file(tmp_path, "a.json", message="hi")
+    q = PostQueue(str(tmp_path), default_targets=["P", "Q"])
+    [(name, _, aliases)] = q.due(5)
+    for alias in aliases:
+        q.mark_inflight(name, alias)
+    q.save()  # ...and the run dies here
+    q = PostQueue(str(tmp_path), default_targets=["P", "Q"])
+    deliveries = q.items[name]["deliveries"]
+    assert {d["state"] for d in deliveries.values()} == {UNKNOWN}
+    assert q.due(5) == []
+    q.retry(name, "Q")
+    q.retry(name, "Q")  # a second heap entry must not make it due twice
+    assert deliveries["P"]["state"] == UNKNOWN and deliveries["Q"]["state"] == PENDING
+    assert q.due(5) == [(name, os.path.join(q.queue_dir, "a.json"), ["Q"])]
+
+def test_a_post_without_an_answer_is_parked_not_retried(tmp_path):
+    _queue_file(tmp_path, "a.json", message="hi")
+    q = PostQueue(str(tmp_path), default_targets=["P"])
+    [(name, _, _)] = q.due(5)
+    q.mark_inflight(name, "P")
+    q.complete(name, "P", False, "UNKNOWN timed out", retryable=False, unknown=True)
+    assert q.items[name]["deliveries"]["P"]["state"] == UNKNOWN
+    assert q.due(5, now=time.time() + 10 ** 6) == [] and q.finished() == []
+
+def test_known_queue_files_are_not_reread(tmp_path):
+    _queue_file(tmp_path, "a.json", message="hi")
+    PostQueue(str(tmp_path), default_targets=["P"]).save()
+    _queue_file(tmp_path, "a.json", message="edited", priority=7)
+    _queue_file(tmp_path, "b.json", message="new")
+    q = PostQueue(str(tmp_path), default_targets=["P"])
+    assert q.items["a.json"]["priority"] == 0
+    assert "b.json" in q.items
+
+def test_a_deleted_queue_file_drops_its_record(tmp_path):
+    _queue_file(tmp_path, "a.json", message="a")
+    _queue_file(tmp_path, "b.json", message="b")
+    PostQueue(str(tmp_path), default_targets=["P"]).save()
+    (tmp_path / "queue" / "a.json").unlink()  # an operator cancels it
+    q = PostQueue(str(tmp_path), default_targets=["P"])
+    assert list(q.items) == ["b.json"]
+    assert [name for name, _, _ in q.due(5)] == ["b.json"]
+
+def test_an_unreadable_queue_file_is_skipped(tmp_path):
+    _queue_file(tmp_path, "a.json", message="a")
+    (tmp_path / "queue" / "bad.json").write_text("{half", encoding="utf-8")
+    (tmp_path / "queue" / "list.json").write_text("[]", encoding="utf-8")
+    q = PostQueue(str(tmp_path), default_targets=["P"])
+    assert list(q.items) == ["a.json"]
+
+# ---------------- post_to_fb.main against the stub ----------------
+@pytest.fixture
+def ship_repo(tmp_path, monkeypatch, graph):
+    """A scratch checkout with one destination and GRAPH pointed at the stub."""
+    root = tmp_path / ".github" / "autoposter"
+    root.mkdir(parents=True)
+    (root / "destinations.json").write_text(json.dumps({"destinations": [
+        {"alias": "P", "page_id": "111", "token_env": "FB_TOKEN_TEST"}]}), encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("FB_TOKEN_TEST", "tok")
+    monkeypatch.setattr(post_to_fb, "GRAPH", graph.url)
+    monkeypatch.setattr(post_to_fb, "MIN_INTERVAL", 0.0)
+    return root
+
+def test_main_posts_once_and_moves_the_item(ship_repo, graph):
+    _queue_file(ship_repo, "a.json", message="hello", link="https://example.com/")
+    seen = []
+    graph.on_request = lambda path, form: seen.append(
+        json.loads((ship_repo / "index.json").read_text())["items"]["a.json"]["deliveries"]["P"]["state"])
+    post_to_fb.main([])
+    assert graph.requests == [("/111/feed", {"message": "hello", "link": "https://example.com/",
+                                             "access_token": "tok"})]
+    assert seen == [INFLIGHT]  # saved before the Graph call
+    assert (ship_repo / "sent" / "a.json").exists() and not (ship_repo / "queue" / "a.json").exists()
+    index = json.loads((ship_repo / "index.json").read_text())
+    assert index["items"] == {} and len(index["sent_keys"]) == 1
+    post_to_fb.main([])
+    assert len(graph.requests) == 1
+
+def test_main_retries_a_graph_error_later(ship_repo, graph):
+    _queue_file(ship_repo, "a.json", message="hello")
+    graph.responses.append((500, {}, b'{"error": {"message": "try later"}}'))
+    post_to_fb.main([])
+    d = json.loads((ship_repo / "index.json").read_text())["items"]["a.json"]["deliveries"]["P"]
+    assert d["state"] == PENDING and d["attempts"] == 1 and "try later" in d["last_result"]
+    post_to_fb.main([])  # not due yet
+    assert len(graph.requests) == 1
+
+def test_main_parks_a_post_that_got_no_answer(ship_repo, graph, capsys):
+    _queue_file(ship_repo, "a.json", message="hello")
+    graph.hang_up_on = {1}  # Graph reads the post, then the connection drops
+    post_to_fb.main([])
+    d = json.loads((ship_repo / "index.json").read_text())["items"]["a.json"]["deliveries"]["P"]
+    assert d["state"] == UNKNOWN
+    assert "retry a.json P" in capsys.readouterr().out
+    post_to_fb.main([])
+    assert len(graph.requests) == 1  # never re-sent on its own
+    post_to_fb.main(["retry", "a.json", "P"])
+    post_to_fb.main([])
+    assert len(graph.requests) == 2 and (ship_repo / "sent" / "a.json").exists()
+
+def test_main_retries_when_graph_was_never_reached(ship_repo, monkeypatch):
+    _queue_file(ship_repo, "a.json", message="hello")
+    monkeypatch.setattr(post_to_fb, "GRAPH", "http://127.0.0.1:9")  # nothing listens there
+    post_to_fb.main([])
+    d = json.loads((ship_repo / "index.json").read_text())["items"]["a.json"]["deliveries"]["P"]
+    assert d["state"] == PENDING and "URLError" in d["last_result"]
+
+def test_main_survives_a_cancelled_or_broken_item(ship_repo, graph, monkeypatch):
+    _queue_file(ship_repo, "a.json", message="hello")
+    graph.responses.append((500, {}, b"{}"))
+    post_to_fb.main([])  # indexed, now waiting on a retry
+    (ship_repo / "queue" / "a.json").unlink()
+    post_to_fb.main([])
+    assert json.loads((ship_repo / "index.json").read_text())["items"] == {}
+    _queue_file(ship_repo, "b.json", message="bye")
+    monkeypatch.setattr(post_to_fb, "load_json", lambda path: json.loads("{half") if "queue" in path
+                        else json.loads(open(path, encoding="utf-8").read()))  # broken after indexing
+    post_to_fb.main([])
+    assert len(graph.requests) == 1
+    assert json.loads((ship_repo / "index.json").read_text())["items"] == {}
@@ -0,0 +1,94 @@
+import socket, threading, time
+import pytest
+from pubsub import Hub, StreamServer, stream
+
+def _topic(path):
+    return path.split("/")[2] if path.startswith("/room/") and path.endswith("/events") else None
+
+@pytest.fixture
+def live():
+    server = StreamServer(Hub(), _topic, heartbeat=0.5, max_age=30).start()
+    yield server
+    server.stop()
+
+def _open(server, path="/room/1/events", extra=""):
+    sock = socket.create_connection(("127.0.0.1", server.port), timeout=5)
+    sock.sendall(f"GET {path} HTTP/1.1\r\nHost: x\r\n{extra}\r\n".encode())
+    return sock
+
+def _read_until(sock, marker: bytes) -> bytes:
+    data = b""
+    while marker not in data:
+        chunk = sock.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+def _wait(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+# ---------------- hub ----------------
+def test_hub_catches_up_a_reconnect_and_drops_the_oldest():
+    hub = Hub(queue_size=2)
+    first = hub.publish("1", "video", {"v": 1})
+    sub = hub.subscribe("1", last_id=first - 1)
+    assert [item[2] for item in sub.drain()] == [{"v": 1}]
+    for v in (2, 3, 4):
+        hub.publish("1", "video", {"v": v})
+    assert [item[2] for item in sub.wait(0)] == [{"v": 3}, {"v": 4}] and sub.dropped == 1
+    assert hub.subscribe("1", last_id=hub.publish("1", "video", {})).drain() == []
+
+def test_a_full_hub_asks_for_a_long_retry_instead_of_an_error():
+    hub = Hub(limit=1)
+    held = hub.subscribe("1")
+    assert hub.full() and hub.subscribe("1") is None
+    assert list(stream(hub, "1", retry_ms=100)) == ["retry: 1000\n: busy\n\n"]
+    hub.unsubscribe(held)
+    assert hub.stats()["subscribers"] == 0
+
+# ---------------- stream server ----------------
+def test_many_listeners_share_one_thread(live):
+    threads = threading.active_count()
+    socks = [_open(live) for _ in range(50)]
+    for s in socks:
+        assert _read_until(s, b"retry: 3000\n\n").startswith(b"HTTP/1.1 200 OK")
+    assert live.hub.stats()["subscribers"] == 50 and threading.active_count() == threads
+    event_id = live.hub.publish("1", "video", {"video_id": "x"})
+    for s in socks:
+        assert f"id: {event_id}\nevent: video\n".encode() in _read_until(s, b"\n\n")
+        s.close()
+    _wait(lambda: live.hub.stats()["subscribers"] == 0)  # a closed tab unsubscribes
+
+def test_last_event_id_from_the_redirect_query_catches_up(live):
+    first = live.hub.publish("1", "video", {"video_id": "x"})
+    sock = _open(live, f"/room/1/events?last_event_id={first - 1}")
+    assert b'data: {"video_id":"x"}' in _read_until(sock, b'"x"}\n\n')
+    sock.close()
+    sock = _open(live, extra=f"Last-Event-ID: {first}\r\n")
+    assert _read_until(sock, b": ping").count(b"event: video") == 0  # already seen: a ping comes first
+    sock.close()
+
+def test_unknown_paths_preflight_and_slow_heads(live):
+    sock = _open(live, "/elsewhere")
+    assert _read_until(sock, b"\r\n\r\n").startswith(b"HTTP/1.1 404")
+    sock = socket.create_connection(("127.0.0.1", live.port), timeout=5)
+    sock.sendall(b"OPTIONS /room/1/events HTTP/1.1\r\nHost: x\r\n\r\n")
+    head = _read_until(sock, b"\r\n\r\n")
+    assert head.startswith(b"HTTP/1.1 204") and b"Access-Control-Allow-Origin: *" in head
+    live.head_timeout = 0.0
+    idle = socket.create_connection(("127.0.0.1", live.port), timeout=5)
+    assert idle.recv(1) == b""  # never sent a request: closed on the next tick
+    assert live.hub.stats()["subscribers"] == 0
+
+def test_streams_end_after_max_age():
+    server = StreamServer(Hub(), _topic, heartbeat=30, max_age=0.5).start()
+    try:
+        sock = _open(server)
+        data = _read_until(sock, b"\x00never")
+        assert data.startswith(b"HTTP/1.1 200") and server.hub.stats()["subscribers"] == 0
+    finally:
+        server.stop()
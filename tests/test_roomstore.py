@@ -0,0 +1,94 @@
+import json, threading, time
+import pytest
+from roomstore import RoomStore
+from schema import Room
+
+def _store(tmp_path, n=3):
+    store = RoomStore(tmp_path / "rooms")
+    store.adopt({str(i): Room(f"vid{i:08d}", 0, f"Room {i}") for i in range(1, n + 1)})
+    return store
+
+def test_adopt_writes_shards_and_an_ordered_index(tmp_path):
+    store = _store(tmp_path, 12)
+    assert store.ids() == [str(i) for i in range(1, 13)]  # numeric, not string, order
+    assert json.loads((tmp_path / "rooms" / "10.json").read_text())["video_id"] == "vid00000010"
+    assert store.adopt({"1": Room("other", 0, "x"), "13": Room("", 0, "Room 13")}) == 1
+    assert store.get("1").video_id == "vid00000001"  # files already there win
+    assert store.page(2, 5) == [(str(i), f"Room {i}") for i in range(6, 11)]
+    assert store.pages(5) == 3
+
+def test_get_is_cached_until_the_shard_changes(tmp_path):
+    _store(tmp_path)
+    fresh = RoomStore(tmp_path / "rooms")
+    room = fresh.get("2")
+    reads = fresh.reads
+    assert fresh.get("2") is room and fresh.reads == reads
+    (tmp_path / "rooms" / "2.json").write_text(json.dumps({"video_id": "dQw4w9WgXcQ", "start": 5,
+                                                           "title": "Edited by hand"}))
+    assert fresh.get("2") == Room("dQw4w9WgXcQ", 5, "Edited by hand")
+    assert fresh.get("99") is None
+
+def test_set_videos_rewrites_one_shard_and_the_index_only_for_new_rooms(tmp_path):
+    store = _store(tmp_path)
+    index_before = (tmp_path / "rooms" / "index.json").read_text()
+    v, iv, writes = store.version("2"), store.index_version, store.writes
+    [room] = store.set_videos([("2", "dQw4w9WgXcQ", 42)])
+    assert room == Room("dQw4w9WgXcQ", 42, "Room 2")  # keeps its title
+    assert store.writes == writes + 1 and store.index_version == iv
+    assert store.version("2") > v and store.version("1") == 1
+    assert (tmp_path / "rooms" / "index.json").read_text() == index_before
+    store.set_videos([("7", "dQw4w9WgXcQ", 0)])
+    assert store.ids() == ["1", "2", "3", "7"] and store.index_version > iv
+    assert RoomStore(tmp_path / "rooms").get("7") == Room("dQw4w9WgXcQ", 0, "Room 7")
+
+def test_a_bad_index_is_reported_not_fatal(tmp_path):
+    store = RoomStore(tmp_path / "rooms")
+    assert store.ids() == [] and store.index_error is None  # no index yet: just no rooms
+    (tmp_path / "rooms").mkdir()
+    (tmp_path / "rooms" / "index.json").write_text('{"rooms": [["1", "One"], ["x", "bad"], "junk"]}')
+    assert store.ids() == ["1"] and store.index_error is None
+    (tmp_path / "rooms" / "index.json").write_text("{broken")
+    assert store.ids() == [] and store.index_error.startswith("index.json")
+    store.set_videos([("5", "dQw4w9WgXcQ", 0)])
+    assert store.index_error is None and store.ids() == ["5"]
+
+def test_a_batch_is_visible_only_once_every_shard_is_written(tmp_path, monkeypatch):
+    import roomstore
+    store = _store(tmp_path)
+    other = RoomStore(tmp_path / "rooms")  # another worker on the same files
+    assert other.get("1").video_id == "vid00000001"
+    seen, real = [], roomstore.write_atomic
+
+    def slow_write(path, data, sync_dir=True):
+        real(path, data, sync_dir)
+        if path.name == "1.json":  # room 1 is on disk, room 2 isn't yet
+            reader = threading.Thread(target=lambda: seen.append((other.get("1"), other.get("2"))))
+            reader.start()
+            time.sleep(0.2)
+            assert not seen  # it waits on batch.json instead of reading half the batch
+    monkeypatch.setattr(roomstore, "write_atomic", slow_write)
+    store.set_videos([("1", "dQw4w9WgXcQ", 1), ("2", "dQw4w9WgXcQ", 2)])
+    deadline = time.monotonic() + 5
+    while not seen and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert [room.start for room in seen[0]] == [1, 2]
+    assert not (tmp_path / "rooms" / "batch.json").exists()
+
+def test_a_batch_cut_short_is_finished_by_the_next_reader(tmp_path, monkeypatch):
+    import roomstore
+    store = _store(tmp_path)
+    real = roomstore.write_atomic
+
+    def crash(path, data, sync_dir=True):
+        if path.name == "2.json":
+            raise KeyboardInterrupt  # the process dies between shards
+        real(path, data, sync_dir)
+    monkeypatch.setattr(roomstore, "write_atomic", crash)
+    with pytest.raises(KeyboardInterrupt):
+        store.set_videos([("1", "dQw4w9WgXcQ", 1), ("2", "dQw4w9WgXcQ", 2), ("9", "dQw4w9WgXcQ", 9)])
+    monkeypatch.setattr(roomstore, "write_atomic", real)
+    monkeypatch.setattr(roomstore, "BATCH_WAIT", 0.0)
+    fresh = RoomStore(tmp_path / "rooms")
+    assert fresh.get("1").start == 1 and fresh.get("2").start == 2
+    assert fresh.ids() == ["1", "2", "3", "9"] and fresh.get("9") == Room("dQw4w9WgXcQ", 9, "Room 9")
+    assert not (tmp_path / "rooms" / "batch.json").exists()
@@ -0,0 +1,46 @@
+from schema import SCHEMA_VERSION, Brand, Room, from_dict, migrate_legacy, to_dict
+
+VID = "dQw4w9WgXcQ"
+DEFAULT = {"schema": SCHEMA_VERSION,
+           "rooms": {"1": {"title": "Engine Room"}},
+           "brand": {"site_title": "Ship", "tagline": "hi"}}
+
+def test_legacy_videos_become_rooms():
+    legacy = {"videos": {"1": f"https://youtu.be/{VID}?t=42", "4": "not a link", "5": VID},
+              "marketing": {"5": "Fog"}, "suno": {"2": "https://suno.com/x"}}
+    out = migrate_legacy(legacy, DEFAULT)
+    assert out["rooms"]["1"] == {"title": "Engine Room", "video_id": VID, "start": 42}
+    assert out["rooms"]["4"] == {"title": "Room 4"}  # bad link: room kept, left empty
+    assert out["rooms"]["5"] == {"title": "Room 5 — Fog", "video_id": VID, "start": 0}
+    assert out["suno"] == legacy["suno"] and "videos" not in out
+    assert DEFAULT["rooms"] == {"1": {"title": "Engine Room"}}  # default not mutated
+
+def test_from_dict_migrates_and_asks_for_a_rewrite():
+    state, changed = from_dict({"videos": {"3": VID}, "weather": "fog"}, DEFAULT)
+    assert changed and state.schema == SCHEMA_VERSION
+    assert state.rooms == {"1": Room("", 0, "Engine Room"), "3": Room(VID, 0, "Room 3")}
+    assert state.brand == Brand(site_title="Ship", tagline="hi")
+    assert state.extra == {"weather": "fog"}
+    assert to_dict(state)["weather"] == "fog"
+
+def test_from_dict_repairs_bad_records():
+    raw = {"schema": SCHEMA_VERSION,
+           "rooms": {"10": {"video_id": f"https://www.youtube.com/watch?v={VID}", "start": "x"},
+                     "2": f"https://youtu.be/{VID}", "abc": {}, "3": 7},
+           "brand": {"site_title": 5, "fg": "#000"}}
+    state, changed = from_dict(raw, DEFAULT)
+    assert changed
+    assert list(state.rooms) == ["2", "10"]  # numeric order; bad ids and records dropped
+    assert state.rooms["10"] == Room(VID, 0, "Room 10")
+    assert state.rooms["2"].video_id == VID
+    assert state.brand.site_title == "Ship" and state.brand.fg == "#000"
+
+def test_clean_current_files_are_left_alone():
+    state, changed = from_dict(to_dict(from_dict(DEFAULT, DEFAULT)[0]), DEFAULT)
+    assert not changed
+    assert from_dict(None, DEFAULT) == (from_dict(DEFAULT, DEFAULT)[0], False)
+
+def test_newer_schema_is_never_rewritten():
+    state, changed = from_dict({"schema": SCHEMA_VERSION + 1, "rooms": {"1": 5}, "future": 1}, DEFAULT)
+    assert not changed and state.schema == SCHEMA_VERSION + 1
+    assert to_dict(state)["future"] == 1
@@ -0,0 +1,51 @@
+import importlib.util, json
+from pathlib import Path
+import pytest
+
+VID = "dQw4w9WgXcQ"
+
+@pytest.fixture(scope="module")
+def share():
+    path = Path(__file__).resolve().parents[1] / "share" / "<slug>" / "make_share_page.py"
+    spec = importlib.util.spec_from_file_location("make_share_page", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def _entries(*items):
+    return [(f"test:{i}", item) for i, item in enumerate(items, 1)]
+
+def test_pages_carry_clean_ids_and_og_tags(share, tmp_path):
+    result = share.build_share_pages(_entries(
+        {"url": f"https://youtu.be/{VID}?t=42&si=junk", "title": "Live at Jack’s — Fog", "desc": "fog"},
+        {"url": f"https://www.youtube.com/watch?v={VID}", "slug": "plain"}), tmp_path, workers=1)
+    assert result == {"rendered": ["live-at-jack-s-fog", "plain"], "skipped": 0, "ignored": 0}
+    html = (tmp_path / "live-at-jack-s-fog" / "index.html").read_text()
+    assert f"youtube-nocookie.com/embed/{VID}" in html and "start=42" in html and "junk" not in html
+    assert 'property="og:url" content="' in html and "/share/live-at-jack-s-fog/" in html
+    assert "<title>Video " + VID in (tmp_path / "plain" / "index.html").read_text()
+
+def test_unchanged_entries_are_skipped_and_edits_rerender(share, tmp_path):
+    entry = {"url": f"https://youtu.be/{VID}", "title": "Fog", "slug": "fog"}
+    share.build_share_pages(_entries(entry), tmp_path, workers=1)
+    assert share.build_share_pages(_entries(entry), tmp_path, workers=1)["skipped"] == 1
+    assert share.build_share_pages(_entries(dict(entry, desc="new")), tmp_path, workers=1)["rendered"] == ["fog"]
+    assert share.build_share_pages(_entries(entry), tmp_path, workers=1, force=True)["rendered"] == ["fog"]
+    share.build_share_pages(_entries({"url": f"https://youtu.be/{VID}", "slug": "other"}), tmp_path, workers=1)
+    assert set(json.loads((tmp_path / ".share-pages.json").read_text())) == {"fog", "other"}
+
+def test_bad_entries_and_hand_made_pages_are_left_alone(share, tmp_path):
+    (tmp_path / "mine").mkdir()
+    (tmp_path / "mine" / "index.html").write_text("hand-made")
+    result = share.build_share_pages(_entries(
+        {"url": "https://vimeo.com/1"}, {"title": "no url"}, {"url": VID, "slug": "../up"},
+        {"url": VID, "slug": "mine"}, {"url": VID, "slug": "ok"}, {"url": VID, "slug": "ok"}),
+        tmp_path, workers=1)
+    assert result == {"rendered": ["ok"], "skipped": 0, "ignored": 5}
+    assert (tmp_path / "mine" / "index.html").read_text() == "hand-made"
+
+def test_read_entries_streams_and_skips_junk(share, tmp_path, capsys):
+    src = tmp_path / "requests.jsonl"
+    src.write_text('{"url": "a"}\n\n{half\n[1]\n{"url": "b"}\n')
+    assert [where for where, _ in share.read_entries(src)] == ["requests.jsonl:1", "requests.jsonl:5"]
+    assert "bad JSON" in capsys.readouterr().err
@@ -0,0 +1,75 @@
+import json, os, time
+import pytest
+from statestore import StateStore, write_atomic
+
+def test_write_atomic_text_and_bytes(tmp_path):
+    write_atomic(tmp_path / "a" / "t.json", '{"x": "é"}')
+    write_atomic(tmp_path / "a" / "b.bin", b"\x00\xff")
+    assert (tmp_path / "a" / "t.json").read_text(encoding="utf-8") == '{"x": "é"}'
+    assert (tmp_path / "a" / "b.bin").read_bytes() == b"\x00\xff"
+    assert sorted(os.listdir(tmp_path / "a")) == ["b.bin", "t.json"]  # no temp files left
+    assert os.stat(tmp_path / "a" / "t.json").st_mode & 0o777 == 0o644
+
+def test_write_atomic_keeps_the_old_file_on_failure(tmp_path, monkeypatch):
+    target = tmp_path / "s.json"
+    target.write_text("old")
+    def boom(src, dst):
+        raise OSError("disk full")
+    monkeypatch.setattr(os, "replace", boom)
+    with pytest.raises(OSError):
+        write_atomic(target, "new")
+    assert target.read_text() == "old"
+    assert os.listdir(tmp_path) == ["s.json"]
+
+def test_reads_are_cached_until_the_file_changes(tmp_path):
+    path = tmp_path / "state.json"
+    path.write_text(json.dumps({"n": 1}))
+    store = StateStore(path, default={}, flush_delay=0)
+    assert store.get() == {"n": 1}
+    assert store.get() is store.get()
+    stats = store.stats()
+    assert (stats["misses"], stats["hits"], stats["reloads"]) == (1, 2, 0)
+    path.write_text(json.dumps({"n": 22}))  # a hand edit (different size → new signature)
+    assert store.get() == {"n": 22}
+    assert store.stats()["reloads"] == 1
+
+def test_missing_or_broken_file_gives_the_default(tmp_path):
+    store = StateStore(tmp_path / "none.json", default={"rooms": {}}, flush_delay=0)
+    state = store.get()
+    assert state == {"rooms": {}}
+    state["rooms"]["1"] = "x"
+    assert store.default == {"rooms": {}}  # a copy, not the default itself
+    (tmp_path / "bad.json").write_text("{not json")
+    assert StateStore(tmp_path / "bad.json", default={"d": 1}).get() == {"d": 1}
+
+def test_updates_coalesce_into_one_atomic_write(tmp_path):
+    path = tmp_path / "state.json"
+    store = StateStore(path, default={"n": 0}, flush_delay=0.2)
+    for _ in range(5):
+        store.update(lambda s: s.__setitem__("n", s["n"] + 1))
+    assert store.get() == {"n": 5}
+    assert not path.exists() and store.stats()["pending"]
+    store.flush()
+    assert json.loads(path.read_text()) == {"n": 5}
+    assert store.stats()["writes"] == 1 and not store.stats()["pending"]
+    store.update(lambda s: s.__setitem__("n", 6))
+    time.sleep(0.4)  # the timer flushes on its own
+    assert json.loads(path.read_text()) == {"n": 6}
+    assert store.stats()["writes"] == 2
+
+def test_snapshot_version_bumps_on_every_change(tmp_path):
+    store = StateStore(tmp_path / "state.json", default={}, flush_delay=0)
+    _, v1 = store.snapshot()
+    store.put({"a": 1})
+    state, v2 = store.snapshot()
+    assert state == {"a": 1} and v2 > v1
+    assert store.snapshot()[1] == v2  # our own write doesn't count as a reload
+
+def test_decode_changes_are_written_back(tmp_path):
+    path = tmp_path / "state.json"
+    path.write_text(json.dumps({"old": True}))
+    decode = lambda raw: ({"new": bool(raw and raw.get("old"))}, True)
+    store = StateStore(path, default={}, flush_delay=0, decode=decode)
+    assert store.get() == {"new": True}
+    store.flush()
+    assert json.loads(path.read_text()) == {"new": True}
@@ -0,0 +1,41 @@
+import pytest
+from youtube import extract_many, extract_youtube_id
+
+VID = "dQw4w9WgXcQ"
+
+@pytest.mark.parametrize("raw, expected", [
+    (VID, (VID, 0)),
+    (f"  {VID}\n", (VID, 0)),
+    (f"https://youtu.be/{VID}", (VID, 0)),
+    (f"https://youtu.be/{VID}?t=42", (VID, 42)),
+    (f"https://www.youtube.com/watch?v={VID}", (VID, 0)),
+    (f"https://www.youtube.com/watch?feature=share&v={VID}&t=1m30s", (VID, 90)),
+    (f"https://m.youtube.com/watch?v={VID}&t=1h2m3s", (VID, 3723)),
+    (f"https://music.youtube.com/watch?v={VID}&list=PL1", (VID, 0)),
+    (f"https://youtube.com/shorts/{VID}?si=50v1ISh-D_dU9THH", (VID, 0)),
+    (f"https://www.youtube.com/embed/{VID}?start=12", (VID, 12)),
+    (f"https://www.youtube-nocookie.com/embed/{VID}", (VID, 0)),
+    (f"https://www.youtube.com/live/{VID}?si=x", (VID, 0)),
+    (f"https://www.youtube.com/v/{VID}", (VID, 0)),
+    (f"https://www.youtube.com/watch?v={VID}#t=42s", (VID, 42)),
+])
+def test_accepted_links(raw, expected):
+    assert extract_youtube_id(raw) == expected
+
+@pytest.mark.parametrize("raw", [
+    "", "not a link", "https://vimeo.com/12345678901",
+    "https://youtu.be/short",
+    f"https://youtu.be/{VID}x",  # 12 characters is not an ID
+    f"https://example.com/?video={VID}",
+])
+def test_rejected_links(raw):
+    assert extract_youtube_id(raw) == (None, 0)
+
+def test_start_needs_its_own_parameter():
+    # "t=" inside another parameter's value or name isn't a start time
+    assert extract_youtube_id(f"https://youtu.be/{VID}?list=PLt=5") == (VID, 0)
+    assert extract_youtube_id(f"https://youtu.be/{VID}?at=5") == (VID, 0)
+
+def test_extract_many_keeps_order_and_tolerates_non_text():
+    assert extract_many([f"https://youtu.be/{VID}?t=3", None, 42, "junk", VID]) == [
+        (VID, 3), (None, 0), (None, 0), (None, 0), (VID, 0)]
@@ -0,0 +1,80 @@
+# youtube.py — hard-clean YouTube link parser (ID + optional start seconds).
+# Precompiled, single pass per field, memoized; extract_many() for bulk runs
+# (queue files, state.json migrations).
+import re
+from functools import lru_cache
+
+YOUTUBE_ID_RE = re.compile(r"^[A-Za-z0-9_-]{11}$")
+
+# One pattern covers every link shape we accept:
+#   youtu.be/ID · youtube.com/watch?v=ID (any param order) · /shorts/ID
+#   /embed/ID · /live/ID · /v/ID · m./www./music. hosts · youtube-nocookie.com
+_ID_IN_URL = re.compile(
+    r"(?:youtu\.be/|youtube(?:-nocookie)?\.com/(?:shorts/|embed/|live/|v/)|[?&#]v=)"
+    r"([A-Za-z0-9_-]{11})(?![A-Za-z0-9_-])"
+)
+# t=42 · t=42s · t=1m30s · t=1h2m3s · start=42 (query, fragment, or bare)
+_START = re.compile(
+    r"(?:[?&#]|^)(?:t|start)=(?=\d)(?:(\d+)h)?(?:(\d+)m)?(?:(\d+)s?)?(?![0-9A-Za-z])"
+)
+
+def _start_seconds(s: str) -> int:
+    m = _START.search(s)
+    if not m:
+        return 0
+    h, mi, se = m.groups()
+    return int(h or 0) * 3600 + int(mi or 0) * 60 + int(se or 0)
+
+@lru_cache(maxsize=4096)
+def extract_youtube_id(raw: str):
+    """
+    Accepts:
+      - https://youtu.be/ID
+      - https://www.youtube.com/watch?v=ID  (also m./music. hosts)
+      - https://www.youtube.com/shorts/ID, /embed/ID, /live/ID
+      - raw 11-char ID
+      Optional t= / start= (42, 42s, 1m30s, 1h2m3s)
+    Returns (video_id, start_seconds) or (None, 0)
+    """
+    if not raw:
+        return None, 0
+    s = raw.strip()
+    if YOUTUBE_ID_RE.match(s):
+        return s, 0
+    m = _ID_IN_URL.search(s)
+    if not m:
+        return None, 0
+    return m.group(1), _start_seconds(s)
+
+def extract_many(raws):
+    """Bulk form: list of (video_id, start) in input order; bad entries give (None, 0)."""
+    parse = extract_youtube_id
+    return [parse(r) if isinstance(r, str) else (None, 0) for r in raws]
+
+if __name__ == "__main__":
+    # Micro-benchmark: python youtube.py [N]
+    import sys, time
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    samples = [
+        "https://youtube.com/shorts/BRoTqtY70ZQ?si=50v1ISh-D_dU9THH",
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=1m30s&fbclid=abc",
+        "https://youtu.be/dQw4w9WgXcQ?t=42",
+        "https://m.youtube.com/watch?feature=share&v=dQw4w9WgXcQ",
+        "https://www.youtube.com/live/dQw4w9WgXcQ?si=x",
+        "https://www.youtube.com/embed/dQw4w9WgXcQ?start=12",
+        "dQw4w9WgXcQ",
+        "not a link",
+    ]
+    # Cold: every input unique, so the cache can't help.
+    cold = [f"{samples[i % len(samples)]}&n={i}" for i in range(n)]
+    t0 = time.perf_counter()
+    extract_many(cold)
+    t_cold = time.perf_counter() - t0
+    # Warm: the realistic case — the same few hundred links pasted again and again.
+    warm = [samples[i % len(samples)] for i in range(n)]
+    t0 = time.perf_counter()
+    extract_many(warm)
+    t_warm = time.perf_counter() - t0
+    print(f"cold: {n / t_cold:,.0f} links/s ({t_cold * 1e6 / n:.2f} µs each)")
+    print(f"warm: {n / t_warm:,.0f} links/s ({t_warm * 1e6 / n:.2f} µs each)")
+    print(extract_youtube_id.cache_info())